@@ -36,7 +36,7 @@ setup(name='SQLAlchemy-JSONAPI',
       author_email='cj@coltonprovias.com',
       description='JSONAPI Mixin for SQLAlchemy',
       long_description=__doc__,
-      packages=['sqlalchemy_jsonapi'],
+      packages=['sqlalchemy_jsonapi', 'sqlalchemy_jsonapi.benchmarks'],
       zip_safe=False,
       include_package_data=True,
       platforms='any',
@@ -1,8 +1,9 @@
+from .cache import CacheStore, LRUStore, MemoryStore, ResponseCache  # NOQA
 from .constants import Endpoint, Method  # NOQA
 from .serializer import (  # NOQA
     ALL_PERMISSIONS, INTERACTIVE_PERMISSIONS, JSONAPI, AttributeActions,
-    Permissions, RelationshipActions, attr_descriptor, permission_test,
-    relationship_descriptor)
+    Permissions, RelationshipActions, attr_descriptor, batch_permission_test,
+    permission_test, query_permission_test, relationship_descriptor)
 from ._version import __version__  # NOQA
 
 try:
@@ -0,0 +1,11 @@
+"""
+SQLAlchemy-JSONAPI
+Benchmarks
+Colton J. Provias
+MIT License
+"""
+
+from .runner import (  # NOQA
+    DEFAULTS, Bench, Settings, compare, load_baseline, run, save_baseline,
+    scenario, scenarios)
+from .schema import build_schema, populate  # NOQA
@@ -0,0 +1,77 @@
+"""
+SQLAlchemy-JSONAPI
+Benchmark Command Line
+
+Usage: python -m sqlalchemy_jsonapi.benchmarks [--save FILE] [--compare FILE]
+                                               [--ignore-settings]
+"""
+
+import argparse
+import sys
+
+from .runner import (DEFAULTS, Settings, compare, load_baseline, run,
+                     save_baseline, scenarios)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m sqlalchemy_jsonapi.benchmarks',
+        description='Time the serializer and Flask adapter hot paths.')
+    for field in Settings._fields:
+        parser.add_argument('--' + field, type=int,
+                            default=getattr(DEFAULTS, field))
+    parser.add_argument('--only', action='append', choices=list(scenarios),
+                        help='Scenario to run, may be repeated')
+    parser.add_argument('--save', metavar='FILE',
+                        help='Save the results as a baseline')
+    parser.add_argument('--compare', metavar='FILE',
+                        help='Compare the results against a baseline')
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help='Allowed relative slowdown before failing')
+    parser.add_argument('--ignore-settings', action='store_true',
+                        help='Compare against a baseline taken with '
+                             'different settings')
+    args = parser.parse_args(argv)
+
+    settings = Settings(*[getattr(args, x) for x in Settings._fields])
+    if args.compare:
+        baseline_settings, baseline = load_baseline(args.compare)
+        if baseline_settings != settings:
+            differences = ', '.join(
+                '--{} {} (baseline {})'.format(
+                    field, getattr(settings, field),
+                    getattr(baseline_settings, field))
+                for field in Settings._fields
+                if getattr(settings, field) != getattr(baseline_settings,
+                                                       field))
+            if not args.ignore_settings:
+                sys.stderr.write(
+                    'Refusing to compare against a baseline taken with other '
+                    'settings: {}\n'.format(differences))
+                return 2
+            print('Baseline was taken with other settings: {}'.format(
+                differences))
+
+    results = run(settings, args.only)
+
+    print('{:<28} {:>10} {:>10} {:>10} {:>10}'.format(
+        'scenario', 'ops/sec', 'p50 ms', 'p99 ms', 'queries'))
+    for name, metrics in results.items():
+        print('{:<28} {:>10.1f} {:>10.2f} {:>10.2f} {:>10.1f}'.format(
+            name, *metrics.values()))
+
+    if args.save:
+        save_baseline(args.save, settings, results)
+
+    if args.compare:
+        regressions = compare(results, baseline, args.tolerance)
+        for name, metric, old, new in regressions:
+            print('REGRESSION {} {}: {:.2f} -> {:.2f}'.format(
+                name, metric, old, new))
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,303 @@
+"""
+SQLAlchemy-JSONAPI
+Benchmark Runner
+Colton J. Provias
+MIT License
+"""
+
+import json
+import time
+from collections import OrderedDict, namedtuple
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import scoped_session, sessionmaker
+
+from ..serializer import JSONAPI
+from .schema import build_schema, populate
+
+try:
+    timer = time.perf_counter
+except AttributeError:
+    timer = time.time
+
+#: Settings of a benchmark run
+Settings = namedtuple('Settings', ['rows', 'width', 'fanout', 'depth',
+                                   'iterations', 'warmup'])
+
+#: Default settings
+DEFAULTS = Settings(rows=1000, width=5, fanout=5, depth=2, iterations=50,
+                    warmup=5)
+
+#: Relationships followed by each level of include depth, from articles
+INCLUDE_CHAIN = ['comments', 'author', 'articles']
+
+#: Scenarios by name, in the order they run
+scenarios = OrderedDict()
+
+
+def scenario(name):
+    """
+    Register a scenario.  The function is called with a Bench and returns a
+    function to time, or a pair of functions where the first prepares the
+    arguments of each call outside of the timing.
+
+    :param name: Name of the scenario in results and baselines
+    """
+
+    def wrapper(fn):
+        scenarios[name] = fn
+        return fn
+
+    return wrapper
+
+
+class Bench(object):
+    """ A populated in-memory database with a serializer over it. """
+
+    def __init__(self, settings):
+        """
+        Build and populate the schema.
+
+        :param settings: Settings of the run
+        """
+        self.settings = settings
+        self.engine = create_engine('sqlite://')
+        self.base, self.models = build_schema(settings.width)
+        self.base.metadata.create_all(self.engine)
+        self.session = scoped_session(sessionmaker(bind=self.engine))
+        self.people, self.tags = populate(
+            self.session, self.models, settings.rows, settings.fanout,
+            settings.width)
+        self.serializer = JSONAPI(self.base)
+        self.statements = 0
+        event.listen(self.engine, 'before_cursor_execute', self._count)
+
+    def _count(self, conn, cursor, statement, *args):
+        self.statements += 1
+
+    def include(self):
+        """ Include query arg for the configured depth. """
+        paths = ['.'.join(INCLUDE_CHAIN[:i + 1])
+                 for i in range(min(self.settings.depth, len(INCLUDE_CHAIN)))]
+        return ','.join(['author', 'tags'] + paths)
+
+    def measure(self, fn, prepare=None):
+        """
+        Time calls to a function.  Returns a dict of ops/sec, p50 and p99
+        latency in milliseconds and SQL statements per call.
+
+        :param fn: Function to time
+        :param prepare: Function returning the arguments of each call
+        """
+        for i in range(self.settings.warmup):
+            fn(*(prepare() if prepare else ()))
+            self.session.remove()
+
+        timings = []
+        statements = 0
+        for i in range(self.settings.iterations):
+            args = prepare() if prepare else ()
+            self.statements = 0
+            start = timer()
+            fn(*args)
+            timings.append(timer() - start)
+            statements += self.statements
+            self.session.remove()
+
+        timings.sort()
+        count = len(timings)
+        return OrderedDict([
+            ('ops_per_sec', count / sum(timings) if sum(timings) else 0),
+            ('p50_ms', timings[count // 2] * 1000),
+            ('p99_ms', timings[min(int(count * 0.99), count - 1)] * 1000),
+            ('statements', statements / float(count))
+        ])
+
+
+@scenario('get_collection')
+def get_collection(bench):
+    query = {'page[number]': u'1', 'page[size]': u'50', 'sort': u'-title'}
+    return lambda: bench.serializer.get_collection(bench.session, query,
+                                                   'articles')
+
+
+@scenario('get_collection_sparse')
+def get_collection_sparse(bench):
+    query = {'page[number]': u'1', 'page[size]': u'50',
+             'fields[articles]': u'title,author', 'include': u'author',
+             'fields[people]': u'name'}
+    return lambda: bench.serializer.get_collection(bench.session, query,
+                                                   'articles')
+
+
+@scenario('get_resource_included')
+def get_resource_included(bench):
+    query = {'include': bench.include()}
+    return lambda: bench.serializer.get_resource(bench.session, query,
+                                                 'articles', 1)
+
+
+@scenario('post_collection_linkages')
+def post_collection_linkages(bench):
+    tags = [{'type': 'tags', 'id': tag.id} for tag in bench.tags]
+    payload = {
+        'data': {
+            'type': 'articles',
+            'attributes': {'title': u'New article', 'body': u'Body'},
+            'relationships': {
+                'author': {'data': {'type': 'people',
+                                    'id': bench.people[0].id}},
+                'tags': {'data': tags}
+            }
+        }
+    }
+    return lambda: bench.serializer.post_collection(
+        bench.session, json.loads(json.dumps(payload)), 'articles')
+
+
+@scenario('patch_resource_linkages')
+def patch_resource_linkages(bench):
+    ids = [tag.id for tag in bench.tags]
+    calls = [0]
+
+    def prepare():
+        # Alternate halves so every call changes the relationship.
+        calls[0] += 1
+        half = ids[calls[0] % 2::2]
+        return ({
+            'data': {
+                'type': 'articles',
+                'id': 2,
+                'attributes': {'title': u'Patched {}'.format(calls[0])},
+                'relationships': {
+                    'tags': {'data': [{'type': 'tags', 'id': x}
+                                      for x in half]}
+                }
+            }
+        },)
+
+    def patch(payload):
+        bench.serializer.patch_resource(bench.session, payload, 'articles', 2)
+
+    return prepare, patch
+
+
+@scenario('delete_resource_cascade')
+def delete_resource_cascade(bench):
+    Article = bench.models['Article']
+    Comment = bench.models['Comment']
+
+    def prepare():
+        article = Article(title=u'To delete', body=u'Body')
+        for i in range(bench.settings.fanout):
+            Comment(content=u'Comment {}'.format(i), article=article)
+        bench.session.add(article)
+        bench.session.commit()
+        return (article.id,)
+
+    def delete(obj_id):
+        bench.serializer.delete_resource(bench.session, {}, 'articles',
+                                         obj_id)
+
+    return prepare, delete
+
+
+@scenario('flask_get_collection')
+def flask_get_collection(bench):
+    try:
+        from flask import Flask
+        from ..flaskext import FlaskJSONAPI
+    except ImportError:
+        return None
+
+    class SQLA(object):
+        Model = bench.base
+        session = bench.session
+
+    app = Flask(__name__)
+    app.config['SERVER_NAME'] = 'localhost'
+    FlaskJSONAPI(app, SQLA())
+    client = app.test_client()
+    url = '/api/articles?page[number]=1&page[size]=50&include=author'
+
+    def get():
+        response = client.get(url)
+        assert response.status_code == 200, response.data
+
+    return get
+
+
+def run(settings=DEFAULTS, names=None):
+    """
+    Run scenarios and return their results by name.  Scenarios whose
+    dependencies aren't installed are left out.
+
+    :param settings: Settings of the run
+    :param names: Names of the scenarios to run, or None for all
+    """
+    results = OrderedDict()
+    for name, setup in scenarios.items():
+        if names and name not in names:
+            continue
+        bench = Bench(settings)
+        timed = setup(bench)
+        if timed is None:
+            continue
+        if isinstance(timed, tuple):
+            results[name] = bench.measure(timed[1], timed[0])
+        else:
+            results[name] = bench.measure(timed)
+    return results
+
+
+def save_baseline(path, settings, results):
+    """
+    Write results to a JSON file to compare later runs against.
+
+    :param path: Path of the file
+    :param settings: Settings the results were taken with
+    :param results: Results from run
+    """
+    with open(path, 'w') as f:
+        json.dump({'settings': settings._asdict(), 'results': results}, f,
+                  indent=2)
+
+
+def load_baseline(path):
+    """
+    Read a baseline written by save_baseline.  Returns the settings and
+    results.
+
+    :param path: Path of the file
+    """
+    with open(path) as f:
+        baseline = json.load(f)
+    return Settings(**baseline['settings']), baseline['results']
+
+
+def compare(results, baseline, tolerance=0.2):
+    """
+    Compare results to a baseline.  Returns a list of (scenario, metric,
+    baseline value, new value) for every metric that got worse by more than
+    the tolerance.  Any increase in SQL statements counts as a regression.
+
+    :param results: Results from run
+    :param baseline: Results from load_baseline
+    :param tolerance: Allowed relative change in timings
+    """
+    regressions = []
+    for name, metrics in results.items():
+        old = baseline.get(name)
+        if old is None:
+            continue
+        if metrics['ops_per_sec'] < old['ops_per_sec'] * (1 - tolerance):
+            regressions.append((name, 'ops_per_sec', old['ops_per_sec'],
+                                metrics['ops_per_sec']))
+        for metric in ('p50_ms', 'p99_ms'):
+            if metrics[metric] > old[metric] * (1 + tolerance):
+                regressions.append((name, metric, old[metric],
+                                    metrics[metric]))
+        if metrics['statements'] > old['statements']:
+            regressions.append((name, 'statements', old['statements'],
+                                metrics['statements']))
+    return regressions
@@ -0,0 +1,107 @@
+"""
+SQLAlchemy-JSONAPI
+Benchmark Schema
+Colton J. Provias
+MIT License
+"""
+
+import random
+
+from sqlalchemy import Column, ForeignKey, Integer, Table, Unicode, UnicodeText
+from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.orm import backref, relationship
+
+
+def build_schema(width=5):
+    """
+    Build a fresh set of models along the lines of the test app: people
+    writing articles, which have comments and tags.  Returns the declarative
+    base and a dict of the models by name.
+
+    :param width: Number of extra text columns on each article
+    """
+    Base = declarative_base()
+
+    article_tags = Table(
+        'article_tags', Base.metadata,
+        Column('article_id', Integer, ForeignKey('articles.id')),
+        Column('tag_id', Integer, ForeignKey('tags.id')))
+
+    class Person(Base):
+        __tablename__ = 'people'
+        id = Column(Integer, primary_key=True)
+        name = Column(Unicode(50), nullable=False)
+        email = Column(Unicode(100), nullable=False)
+
+    article_columns = {
+        '__tablename__': 'articles',
+        'id': Column(Integer, primary_key=True),
+        'title': Column(Unicode(100), nullable=False),
+        'body': Column(UnicodeText, nullable=False),
+        'author_id': Column(Integer, ForeignKey('people.id')),
+        'author': relationship(Person, backref=backref('articles',
+                                                       lazy='dynamic')),
+        'tags': relationship('Tag', secondary=article_tags,
+                             back_populates='articles')
+    }
+    for i in range(width):
+        article_columns['field_{}'.format(i)] = Column(Unicode(100))
+    Article = type('Article', (Base,), article_columns)
+
+    class Comment(Base):
+        __tablename__ = 'comments'
+        id = Column(Integer, primary_key=True)
+        content = Column(UnicodeText, nullable=False)
+        article_id = Column(Integer, ForeignKey('articles.id'))
+        author_id = Column(Integer, ForeignKey('people.id'))
+
+        article = relationship(Article, backref=backref(
+            'comments', lazy='dynamic', cascade='all,delete'))
+        author = relationship(Person, backref=backref('comments',
+                                                      lazy='dynamic'))
+
+    class Tag(Base):
+        __tablename__ = 'tags'
+        id = Column(Integer, primary_key=True)
+        slug = Column(Unicode(50), nullable=False)
+
+        articles = relationship(Article, secondary=article_tags,
+                                back_populates='tags')
+
+    return Base, {'Person': Person, 'Article': Article, 'Comment': Comment,
+                  'Tag': Tag}
+
+
+def populate(session, models, rows=1000, fanout=5, width=5, seed=0):
+    """
+    Fill the schema with articles, each with fanout comments and tags, spread
+    over a tenth as many people.
+
+    :param session: SQLAlchemy session
+    :param models: Dict of the models from build_schema
+    :param rows: Number of articles
+    :param fanout: Number of comments and of tags per article
+    :param width: Number of extra text columns on each article
+    :param seed: Seed for picking authors and tags
+    """
+    rng = random.Random(seed)
+    people = [models['Person'](name=u'Person {}'.format(i),
+                               email=u'person{}@example.com'.format(i))
+              for i in range(max(rows // 10, 1))]
+    tags = [models['Tag'](slug=u'tag-{}'.format(i))
+            for i in range(max(fanout * 4, 1))]
+    session.add_all(people + tags)
+
+    for i in range(rows):
+        article = models['Article'](
+            title=u'Article {}'.format(i),
+            body=u'Body of article {}'.format(i),
+            author=rng.choice(people), tags=rng.sample(tags, fanout))
+        for j in range(width):
+            setattr(article, 'field_{}'.format(j), u'Value {}'.format(j))
+        for j in range(fanout):
+            models['Comment'](content=u'Comment {}'.format(j),
+                              article=article, author=rng.choice(people))
+        session.add(article)
+    session.commit()
+    return people, tags
@@ -0,0 +1,292 @@
+"""
+SQLAlchemy-JSONAPI
+Response Caching
+Colton J. Provias
+MIT License
+"""
+
+import copy
+import hashlib
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+
+class CacheStore(object):
+    """
+    Storage for cached responses.  Subclass this to keep responses in a store
+    shared between processes.  Values returned by get_many must be safe for
+    the caller to modify.
+    """
+
+    def get_many(self, keys):
+        """
+        Fetch several values at once.  Missing or expired keys come back as
+        None.
+
+        :param keys: List of keys to fetch
+        """
+        raise NotImplementedError
+
+    def set(self, key, value, ttl):
+        """
+        Store a value.
+
+        :param key: Key to store the value under
+        :param value: The value
+        :param ttl: Seconds to keep the value, or 0 for no limit
+        """
+        raise NotImplementedError
+
+    def incr(self, key):
+        """
+        Increment a counter, starting it at 1 if it doesn't exist.
+
+        :param key: Key of the counter
+        """
+        raise NotImplementedError
+
+
+class LRUStore(CacheStore):
+    """
+    In-process store that keeps up to size values, dropping the least
+    recently used first.  Counters are kept apart and never dropped, as losing
+    one could bring stale responses back.
+    """
+
+    def __init__(self, size=1024):
+        """
+        Start out empty.
+
+        :param size: Number of values to keep
+        """
+        self.size = size
+        self._values = OrderedDict()
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def get_many(self, keys):
+        """
+        Fetch several values at once, copied so cached responses can't be
+        changed through them.
+
+        :param keys: List of keys to fetch
+        """
+        now = time.time()
+        results = []
+        with self._lock:
+            for key in keys:
+                if key in self._counters:
+                    results.append(self._counters[key])
+                    continue
+                entry = self._values.pop(key, None)
+                if entry is None or (entry[0] and entry[0] <= now):
+                    results.append(None)
+                    continue
+                self._values[key] = entry
+                results.append(entry[1])
+        return [copy.deepcopy(value) for value in results]
+
+    def set(self, key, value, ttl):
+        """
+        Store a value.
+
+        :param key: Key to store the value under
+        :param value: The value
+        :param ttl: Seconds to keep the value, or 0 for no limit
+        """
+        expires = time.time() + ttl if ttl else 0
+        with self._lock:
+            self._values.pop(key, None)
+            self._values[key] = (expires, copy.deepcopy(value))
+            while len(self._values) > self.size:
+                self._values.popitem(last=False)
+
+    def incr(self, key):
+        """
+        Increment a counter, starting it at 1 if it doesn't exist.
+
+        :param key: Key of the counter
+        """
+        with self._lock:
+            value = self._counters[key] = self._counters.get(key, 0) + 1
+            return value
+
+
+class MemoryStore(CacheStore):
+    """
+    Stand-in for a shared store such as memcached or Redis.  Values are
+    pickled going in and out, the same as they would be over the network.
+    """
+
+    def __init__(self):
+        """ Start out empty. """
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def get_many(self, keys):
+        """
+        Fetch several values at once.
+
+        :param keys: List of keys to fetch
+        """
+        now = time.time()
+        results = []
+        with self._lock:
+            for key in keys:
+                entry = self._values.get(key)
+                if entry is None or (entry[0] and entry[0] <= now):
+                    results.append(None)
+                else:
+                    results.append(pickle.loads(entry[1]))
+        return results
+
+    def set(self, key, value, ttl):
+        """
+        Store a value.
+
+        :param key: Key to store the value under
+        :param value: The value
+        :param ttl: Seconds to keep the value, or 0 for no limit
+        """
+        expires = time.time() + ttl if ttl else 0
+        with self._lock:
+            self._values[key] = (expires, pickle.dumps(value, -1))
+
+    def incr(self, key):
+        """
+        Increment a counter, starting it at 1 if it doesn't exist.
+
+        :param key: Key of the counter
+        """
+        with self._lock:
+            entry = self._values.get(key)
+            value = pickle.loads(entry[1]) + 1 if entry is not None else 1
+            self._values[key] = (0, pickle.dumps(value, -1))
+            return value
+
+
+class ResponseCache(object):
+    """
+    Cache of rendered GET responses.  Each entry remembers the types it was
+    rendered from along with a generation counter per type.  Invalidating a
+    type bumps its counter, which leaves every entry rendered from it stale
+    without having to find them.
+
+    Invalidating also bumps a counter shared by all types.  Reading it with
+    begin before rendering lets set leave out responses that were rendered
+    while something changed.
+    """
+
+    def __init__(self, store=None, ttl=60, prefix='jsonapi'):
+        """
+        Set up the cache.
+
+        :param store: CacheStore to keep responses in, an LRUStore if None
+        :param ttl: Seconds to keep a response, or 0 for no limit
+        :param prefix: Prefix of every key written to the store
+        """
+        self.store = store if store is not None else LRUStore()
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def _key(self, key):
+        """
+        Turn a cache key into a store key.
+
+        :param key: Tuple identifying the response
+        """
+        digest = hashlib.sha1(repr(key).encode('utf-8')).hexdigest()
+        return '{}:response:{}'.format(self.prefix, digest)
+
+    def _etag_key(self, key):
+        """
+        Turn a cache key into the store key of the response's ETag.
+
+        :param key: Tuple identifying the response
+        """
+        digest = hashlib.sha1(repr(key).encode('utf-8')).hexdigest()
+        return '{}:etag:{}'.format(self.prefix, digest)
+
+    def _generation_key(self, api_type):
+        """
+        Key of the generation counter of a type.
+
+        :param api_type: The type, or None for the counter shared by all
+        """
+        if api_type is None:
+            return '{}:generation'.format(self.prefix)
+        return '{}:generation:{}'.format(self.prefix, api_type)
+
+    def begin(self):
+        """
+        Read the shared generation counter ahead of rendering a response.
+        """
+        return self.store.get_many([self._generation_key(None)])[0] or 0
+
+    def get(self, key):
+        """
+        Fetch a cached response, or None if there isn't a current one.  Returns
+        a tuple of the status code, data and ETag.
+
+        :param key: Tuple identifying the response
+        """
+        return self._current(self.store.get_many([self._key(key)])[0])
+
+    def get_etag(self, key):
+        """
+        Fetch the ETag of a cached response, or None if there isn't a current
+        one.  The tag is stored apart from the response, so checking it
+        doesn't fetch the body.
+
+        :param key: Tuple identifying the response
+        """
+        return self._current(self.store.get_many([self._etag_key(key)])[0])
+
+    def _current(self, entry):
+        """
+        Unpack a stored entry, or return None if any of the types it was
+        rendered from has been invalidated since.
+
+        :param entry: Entry from the store or None
+        """
+        if entry is None:
+            return None
+        types, generations, value = entry
+        current = self.store.get_many(
+            [self._generation_key(x) for x in types])
+        if [x or 0 for x in current] != list(generations):
+            return None
+        return value
+
+    def set(self, key, types, response, started):
+        """
+        Cache a response, unless anything was invalidated since it started
+        rendering.
+
+        :param key: Tuple identifying the response
+        :param types: Types the response was rendered from
+        :param response: Tuple of the status code, data and ETag
+        :param started: Result of begin from before rendering
+        """
+        types = sorted(types)
+        generations = [x or 0 for x in self.store.get_many(
+            [self._generation_key(x) for x in [None] + types])]
+        if generations.pop(0) != started:
+            return
+        self.store.set(self._key(key), (types, generations, response),
+                       self.ttl)
+        if response[2] is not None:
+            self.store.set(self._etag_key(key),
+                           (types, generations, response[2]), self.ttl)
+
+    def invalidate(self, types):
+        """
+        Mark every response rendered from any of the types as stale.
+
+        :param types: Types that changed
+        """
+        for api_type in types:
+            self.store.incr(self._generation_key(api_type))
+        self.store.incr(self._generation_key(None))
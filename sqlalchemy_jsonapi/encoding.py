@@ -0,0 +1,115 @@
+"""
+SQLAlchemy-JSONAPI
+JSON Encoding
+Colton J. Provias
+MIT License
+"""
+
+import datetime
+import json
+import uuid
+from decimal import Decimal
+
+try:
+    from enum import Enum
+except ImportError:
+    from enum34 import Enum
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _isoformat(value):
+    return value.isoformat()
+
+
+def _enum_value(value):
+    return value.value
+
+
+#: Conversions for values that JSON has no type for, by type.  Subclasses are
+#: converted by the entry of their nearest base class.
+CONVERTERS = {
+    uuid.UUID: str,
+    datetime.datetime: _isoformat,
+    datetime.date: _isoformat,
+    datetime.time: _isoformat,
+    Decimal: str,
+    Enum: _enum_value
+}
+
+
+class JSONBackend(object):
+    """
+    Encodes documents to UTF-8 JSON bytes, converting values JSON has no type
+    for with a table of converters.  This one uses the standard library.
+    """
+
+    def __init__(self, converters=None):
+        """
+        Set up the backend.
+
+        :param converters: Dict of conversions by type, CONVERTERS if None
+        """
+        self.converters = dict(CONVERTERS if converters is None
+                               else converters)
+        self._resolved = {}
+
+    def convert(self, value):
+        """
+        Convert a value the encoder couldn't handle.  The converter is looked
+        up by type once and then remembered.  Callables are turned into
+        strings.
+
+        :param value: Value to convert
+        """
+        value_type = type(value)
+        try:
+            converter = self._resolved[value_type]
+        except KeyError:
+            converter = None
+            for base in value_type.__mro__:
+                if base in self.converters:
+                    converter = self.converters[base]
+                    break
+            self._resolved[value_type] = converter
+
+        if converter is not None:
+            return converter(value)
+        if callable(value):
+            return str(value)
+        raise TypeError('{!r} is not JSON serializable'.format(value))
+
+    def dumps(self, value):
+        """
+        Encode a value.
+
+        :param value: Value to encode
+        """
+        return json.dumps(value, default=self.convert,
+                          separators=(',', ':')).encode('utf-8')
+
+
+class OrjsonBackend(JSONBackend):
+    """
+    Encodes with orjson, which handles UUID, datetime, date and Enum values
+    natively and writes bytes directly.
+    """
+
+    def dumps(self, value):
+        """
+        Encode a value.
+
+        :param value: Value to encode
+        """
+        return orjson.dumps(value, default=self.convert,
+                            option=orjson.OPT_NON_STR_KEYS)
+
+
+def default_backend():
+    """ Make the fastest backend that is installed. """
+    if orjson is not None:
+        return OrjsonBackend()
+    return JSONBackend()
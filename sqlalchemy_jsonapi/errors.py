@@ -48,6 +48,16 @@ class NotSortableError(BaseError):
         self.detail = tmpl.format(model.__jsonapi_type__, attr_name)
 
 
+class NotFilterableError(BaseError):
+    title = 'Not Filterable'
+    status_code = 409
+    code = 'not_filterable'
+
+    def __init__(self, model, attr_name):
+        tmpl = 'The requested field {} on type {} is not a filterable field.'
+        self.detail = tmpl.format(attr_name, model.__jsonapi_type__)
+
+
 class PermissionDeniedError(BaseError):
     status_code = 403
     code = 'permission_denied'
@@ -103,6 +113,19 @@ class ResourceNotFoundError(BaseError):
         self.detail = '{}.{} not found'.format(model, instance)
 
 
+class ResourcesNotFoundError(ResourceNotFoundError):
+    def __init__(self, missing):
+        self.errors = [ResourceNotFoundError(model, obj_id)
+                       for model, obj_id in missing]
+        self.detail = ', '.join([e.detail for e in self.errors])
+
+    @property
+    def data(self):
+        return {
+            'errors': [e.data['errors'][0] for e in self.errors]
+        }
+
+
 class RelatedResourceNotFoundError(BaseError):
     status_code = 404
     code = 'related_resource_not_found'
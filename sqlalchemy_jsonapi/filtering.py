@@ -0,0 +1,378 @@
+"""
+SQLAlchemy-JSONAPI
+Filtering
+Colton J. Provias
+MIT License
+"""
+
+import re
+
+from inflection import dasherize
+from sqlalchemy import and_, func, literal, not_, or_
+from sqlalchemy.sql.expression import ClauseElement
+
+from .errors import BadRequestError, NotFilterableError
+
+#: Tokens of the filter language, in order of precedence
+TOKENS = [
+    ('STRING', r"'(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\""),
+    ('FLOAT', r'\d+\.\d+'),
+    ('INTEGER', r'\d+'),
+    ('NAME', r'[a-zA-Z_][a-zA-Z0-9_]*'),
+    ('OPERATOR', r'==|!=|<=|>=|<|>|&&|\|\||!|\+|-|\*|//|/|%'),
+    ('PUNCTUATION', r'[()\[\],.]'),
+    ('WHITESPACE', r'\s+')
+]
+
+TOKENIZER = re.compile('|'.join('(?P<{}>{})'.format(*t) for t in TOKENS))
+
+#: Deepest nesting of parentheses, lists and unary operators in a filter
+MAX_DEPTH = 32
+
+#: Constants that can be used as values
+CONSTANTS = {'null': None, 'true': True, 'false': False}
+
+#: Methods that can be called on a value, such as email.lower()
+METHODS = {
+    'lower': func.lower,
+    'upper': func.upper,
+    'trim': func.trim,
+    'length': func.length
+}
+
+COMPARISONS = {
+    '==': lambda a, b: a == b,
+    '!=': lambda a, b: a != b,
+    '<': lambda a, b: a < b,
+    '<=': lambda a, b: a <= b,
+    '>': lambda a, b: a > b,
+    '>=': lambda a, b: a >= b,
+    'like': lambda a, b: a.like(b),
+    'ilike': lambda a, b: a.ilike(b),
+    'in': lambda a, b: a.in_(b),
+    'not in': lambda a, b: ~a.in_(b)
+}
+
+ARITHMETIC = {
+    '+': lambda a, b: a + b,
+    '-': lambda a, b: a - b,
+    '*': lambda a, b: a * b,
+    '/': lambda a, b: a / b,
+    '//': lambda a, b: func.floor(a / b),
+    '%': lambda a, b: a % b
+}
+
+
+def tokenize(text):
+    """
+    Split a filter expression into (kind, value) tokens.
+
+    :param text: The filter expression
+    """
+    tokens = []
+    pos = 0
+    while pos < len(text):
+        match = TOKENIZER.match(text, pos)
+        if match is None:
+            raise BadRequestError(
+                'Unexpected character in filter at position {}'.format(pos))
+        pos = match.end()
+        kind = match.lastgroup
+        value = match.group(0)
+        if kind == 'WHITESPACE':
+            continue
+        if kind == 'STRING':
+            value = re.sub(r'\\(.)', r'\1', value[1:-1])
+        elif kind == 'INTEGER':
+            value = int(value)
+        elif kind == 'FLOAT':
+            value = float(value)
+        elif kind == 'NAME' and value.lower() in ('and', 'or', 'not', 'in',
+                                                  'like', 'ilike'):
+            kind, value = 'OPERATOR', value.lower()
+        tokens.append((kind, value))
+    return tokens
+
+
+def _is_sql(value):
+    """
+    Check if a parsed value is a SQL expression rather than a Python value.
+
+    :param value: Parsed value
+    """
+    return isinstance(value, ClauseElement)\
+        or hasattr(value, '__clause_element__')
+
+
+def _scalar(value):
+    """
+    Reject a list where a single value is expected.  Lists are only allowed
+    after in and not in.
+
+    :param value: Parsed value
+    """
+    if isinstance(value, list):
+        raise BadRequestError('Lists are only allowed after in or not in')
+    return value
+
+
+def _sql(value, other=None):
+    """
+    Turn a parsed value into a SQL expression, unless other already is one.
+    Python then hands the operator to the expression, so 5 < score and
+    null == published_at come out the same as their mirror images.
+
+    :param value: Parsed value
+    :param other: The other side of the operator
+    """
+    if _is_sql(value) or _is_sql(other):
+        return value
+    return literal(value)
+
+
+class FilterParser(object):
+    """
+    Recursive descent parser that compiles a filter expression straight into
+    a SQLAlchemy criterion for a model.  Supports boolean logic (&&, ||, !),
+    chained comparisons (5 < score <= 10), in, like, ilike, arithmetic,
+    lists, the constants null, true and false, and a few string methods.
+    """
+
+    def __init__(self, model, text):
+        """
+        Prepare the parser.
+
+        :param model: The model the field names belong to
+        :param text: The filter expression
+        """
+        self.model = model
+        self.tokens = tokenize(text)
+        self.pos = 0
+        self.depth = 0
+        self.fields = set()
+
+    def parse(self):
+        """
+        Parse the expression.  Returns the criterion and the names of the
+        fields it references.
+        """
+        try:
+            criterion = _scalar(self.expression())
+        except TypeError:
+            raise BadRequestError('Incompatible values in filter')
+        if self.pos < len(self.tokens):
+            self.fail()
+        return _sql(criterion), self.fields
+
+    def nest(self):
+        """ Go a level deeper, failing past MAX_DEPTH. """
+        self.depth += 1
+        if self.depth > MAX_DEPTH:
+            raise BadRequestError('Filter is nested too deeply')
+
+    def peek(self, offset=0):
+        if self.pos + offset < len(self.tokens):
+            return self.tokens[self.pos + offset]
+        return None, None
+
+    def accept(self, *values):
+        kind, value = self.peek()
+        if kind in ('OPERATOR', 'PUNCTUATION') and value in values:
+            self.pos += 1
+            return value
+        return None
+
+    def expect(self, value):
+        if self.accept(value) is None:
+            self.fail()
+
+    def fail(self):
+        kind, value = self.peek()
+        if kind is None:
+            raise BadRequestError('Unexpected end of filter')
+        raise BadRequestError('Unexpected {} in filter'.format(value))
+
+    def expression(self):
+        self.nest()
+        clauses = [self.conjunction()]
+        while self.accept('||', 'or'):
+            clauses.append(self.conjunction())
+        self.depth -= 1
+        if len(clauses) == 1:
+            return clauses[0]
+        return or_(*[_scalar(x) for x in clauses])
+
+    def conjunction(self):
+        clauses = [self.negation()]
+        while self.accept('&&', 'and'):
+            clauses.append(self.negation())
+        if len(clauses) == 1:
+            return clauses[0]
+        return and_(*[_scalar(x) for x in clauses])
+
+    def negation(self):
+        if self.accept('!', 'not'):
+            self.nest()
+            value = not_(_sql(_scalar(self.negation())))
+            self.depth -= 1
+            return value
+        return self.comparison()
+
+    def comparison_operator(self):
+        if self.peek() == ('OPERATOR', 'not')\
+                and self.peek(1) == ('OPERATOR', 'in'):
+            self.pos += 2
+            return 'not in'
+        return self.accept(*COMPARISONS.keys())
+
+    def comparison(self):
+        left = self.sum()
+        clauses = []
+        op = self.comparison_operator()
+        while op is not None:
+            right = self.sum()
+            _scalar(left)
+            if op in ('in', 'not in'):
+                if not isinstance(right, list):
+                    raise BadRequestError(
+                        'Expected a list after {}'.format(op))
+                for value in right:
+                    _scalar(value)
+            else:
+                _scalar(right)
+            if op in ('in', 'not in', 'like', 'ilike'):
+                clauses.append(COMPARISONS[op](_sql(left), right))
+            else:
+                clauses.append(COMPARISONS[op](_sql(left, right), right))
+            left = right
+            op = self.comparison_operator()
+        if not clauses:
+            return left
+        return clauses[0] if len(clauses) == 1 else and_(*clauses)
+
+    def sum(self):
+        left = self.product()
+        op = self.accept('+', '-')
+        while op is not None:
+            right = _scalar(self.product())
+            left = ARITHMETIC[op](_sql(_scalar(left), right), right)
+            op = self.accept('+', '-')
+        return left
+
+    def product(self):
+        left = self.unary()
+        op = self.accept('*', '/', '//', '%')
+        while op is not None:
+            right = _scalar(self.unary())
+            left = ARITHMETIC[op](_sql(_scalar(left), right), right)
+            op = self.accept('*', '/', '//', '%')
+        return left
+
+    def unary(self):
+        if self.accept('-'):
+            self.nest()
+            value = -_scalar(self.unary())
+            self.depth -= 1
+            return value
+        value = self.primary()
+        while self.accept('.'):
+            kind, name = self.peek()
+            if kind != 'NAME' or name not in METHODS.keys():
+                self.fail()
+            self.pos += 1
+            self.expect('(')
+            self.expect(')')
+            value = METHODS[name](_scalar(value))
+        return value
+
+    def primary(self):
+        if self.accept('('):
+            value = self.expression()
+            self.expect(')')
+            return value
+
+        if self.accept('['):
+            values = []
+            if not self.accept(']'):
+                values.append(self.expression())
+                while self.accept(','):
+                    values.append(self.expression())
+                self.expect(']')
+            return values
+
+        kind, value = self.peek()
+        if kind in ('STRING', 'INTEGER', 'FLOAT'):
+            self.pos += 1
+            return value
+        if kind == 'NAME':
+            self.pos += 1
+            if value in CONSTANTS.keys():
+                return CONSTANTS[value]
+            return self.field(value)
+        self.fail()
+
+    def field(self, name):
+        """
+        Resolve a field name to the attribute of the model.
+
+        :param name: Field name, either the API or the Python name
+        """
+        model = self.model
+        mapper = model.__mapper__
+        key = model.__jsonapi_map_to_py__.get(
+            name, model.__jsonapi_map_to_py__.get(dasherize(name)))
+
+        if key is None or key == '__mapper__'\
+                or key in mapper.relationships.keys():
+            raise NotFilterableError(model, name)
+
+        attr = getattr(model, key)
+        if not hasattr(attr, 'asc'):
+            raise NotFilterableError(model, name)
+
+        self.fields.add(key)
+        return attr
+
+
+def parse_filter(model, text):
+    """
+    Compile a filter expression for a model.  Returns the criterion and the
+    names of the fields it references.
+
+    :param model: The model to filter
+    :param text: The filter expression
+    """
+    return FilterParser(model, text).parse()
+
+
+def parse_field_filter(model, field, text):
+    """
+    Compile a filter[field]=value query arg.  A comma separated list of values
+    matches any of them.  Values are parsed as literals of the filter
+    language where possible and are strings otherwise.
+
+    :param model: The model to filter
+    :param field: The field name between the brackets
+    :param text: The value of the query arg
+    """
+    parser = FilterParser(model, '')
+    attr = parser.field(field)
+    values = []
+
+    for raw in text.split(','):
+        try:
+            tokens = tokenize(raw)
+        except BadRequestError:
+            tokens = []
+        if len(tokens) == 1 and tokens[0][0] in ('STRING', 'INTEGER',
+                                                 'FLOAT'):
+            values.append(tokens[0][1])
+        elif len(tokens) == 1 and tokens[0] in [('NAME', c)
+                                                for c in CONSTANTS.keys()]:
+            values.append(CONSTANTS[tokens[0][1]])
+        else:
+            values.append(raw)
+
+    if len(values) == 1:
+        return attr == values[0], parser.fields
+    return attr.in_(values), parser.fields
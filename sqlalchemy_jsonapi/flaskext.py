@@ -5,35 +5,39 @@ Colton J. Provias
 MIT License
 """
 
-import datetime
+import hashlib
 import json
-import uuid
-from functools import wraps
+import logging
+from functools import partial
+from inspect import isgenerator
 
 from blinker import signal
-from flask import make_response, request
+from flask import Response, make_response, request, stream_with_context
+from werkzeug.http import unquote_etag
 
 from .constants import Endpoint, Method
+from .encoding import JSONBackend, default_backend
 from .errors import BaseError, MissingContentTypeError
 from .serializer import JSONAPI
+from .stats import RequestStats, listen, measure
+
+#: Logger for slow requests
+logger = logging.getLogger(__name__)
 
 
 class JSONAPIEncoder(json.JSONEncoder):
     """ JSONEncoder Implementation that allows for UUID and datetime """
 
+    #: Backend whose converters are used
+    backend = JSONBackend()
+
     def default(self, value):
         """
-        Handle UUID, datetime, and callables.
+        Handle UUID, datetime, date, Decimal, Enum and callables.
 
         :param value: Value to encode
         """
-        if isinstance(value, uuid.UUID):
-            return str(value)
-        elif isinstance(value, datetime.datetime):
-            return value.isoformat()
-        elif callable(value):
-            return str(value)
-        return json.JSONEncoder.default(self, value)
+        return self.backend.convert(value)
 
 
 #: The views to generate
@@ -46,6 +50,10 @@ views = [
 ]
 
 
+#: Events fired while handling a request, each also available as a signal
+events = ['on_request', 'on_success', 'on_error', 'on_response']
+
+
 def override(original, results):
     """
     If a receiver to a signal returns a value, we override the original value
@@ -60,6 +68,18 @@ def override(original, results):
     return overrides[-1]
 
 
+def counted(stats, included):
+    """
+    Count included resources into stats as they are streamed.
+
+    :param stats: RequestStats of the request
+    :param included: Generator of the included resources
+    """
+    for resource in included:
+        stats.included += 1
+        yield resource
+
+
 class FlaskJSONAPI(object):
     """ Flask Adapter """
 
@@ -79,9 +99,36 @@ class FlaskJSONAPI(object):
     #: (sender, method, endpoint, data, req_args, error)
     on_error = signal('jsonapi-on-error')
 
-    #: JSON Encoder to use
+    #: Fires once a request is done, if instrument is set.  A streamed
+    #: response is done once the body has been sent.
+    #: (sender, method, endpoint, req_args, stats)
+    on_stats = signal('jsonapi-on-stats')
+
+    #: JSON Encoder to use.  Setting a subclass of JSONAPIEncoder encodes
+    #: with it instead of json_backend.
     json_encoder = JSONAPIEncoder
 
+    #: Backend encoding responses to bytes.  Uses orjson if it is installed.
+    json_backend = default_backend()
+
+    #: Stream collection responses, encoding one resource at a time, instead
+    #: of rendering the whole document before sending it.
+    stream_collections = False
+
+    #: Tag GET responses with an ETag and answer If-None-Match with 304 Not
+    #: Modified.  The tag comes from the version columns of the resources
+    #: where the serializer can tell it, and from a hash of the body if not.
+    etags = False
+
+    #: Time each request by phase and count the SQL statements, loaded rows,
+    #: included resources and encoded bytes.  The timings are sent in a
+    #: Server-Timing header and the RequestStats through on_stats.
+    instrument = False
+
+    #: If instrument is set, log requests taking at least this many
+    #: milliseconds as warnings along with their stats.  None logs nothing.
+    slow_request_threshold = None
+
     def __init__(self,
                  app=None,
                  sqla=None,
@@ -99,6 +146,8 @@ class FlaskJSONAPI(object):
         self.app = app
         self.sqla = sqla
         self._handler_chains = dict()
+        self._handlers = dict()
+        self._hooks = dict()
 
         if app is not None:
             self._setup_adapter(namespace, route_prefix)
@@ -127,35 +176,220 @@ class FlaskJSONAPI(object):
         """
 
         def wrapper(fn):
-            @wraps(fn)
-            def wrapped(*args, **kwargs):
-                return fn(*args, **kwargs)
-
             for api_type in api_types:
                 for method in methods:
                     for endpoint in endpoints:
                         key = (api_type, method, endpoint)
                         self._handler_chains.setdefault(key, [])
-                        self._handler_chains[key].append(wrapped)
-            return wrapped
+                        self._handler_chains[key].append(fn)
+                        if hasattr(self, 'serializer'):
+                            self._compose_handler(key)
+            return fn
 
         return wrapper
 
-    def _call_next(self, handler_chain):
+    def hook(self, event, methods=None, endpoints=None):
         """
-        Generates an express-like chain for handling requests.
+        Register a function to be called on an event for some methods and
+        endpoints.  Hooks take the same arguments as receivers of the signal
+        of the same name, and can likewise return a value to alter the
+        response.  They are called before the signal's receivers, without the
+        signal machinery.
+
+        :param event: on_request, on_success, on_error or on_response
+        :param methods: Methods to hook, or None for all
+        :param endpoints: Endpoints to hook, or None for all
+        """
+        if event not in events:
+            raise ValueError('Unknown event {}'.format(event))
+
+        def wrapper(fn):
+            for method in methods or list(Method):
+                for endpoint in endpoints or list(Endpoint):
+                    self._view_hooks(method, endpoint)[event].append(fn)
+            return fn
+
+        return wrapper
 
-        :param handler_chain: The current chain of handlers
+    def _view_hooks(self, method, endpoint):
         """
+        Fetch the lists of hooks of a method and endpoint by event.  The lists
+        are created once and shared with the view, so hooks registered later
+        still reach it.
 
-        def wrapped(*args, **kwargs):
-            if len(handler_chain) == 1:
-                return handler_chain[0](*args, **kwargs)
-            else:
-                return handler_chain[0](self._call_next(handler_chain[1:]),
-                                        *args, **kwargs)
+        :param method: HTTP Method
+        :param endpoint: Endpoint
+        """
+        return self._hooks.setdefault(
+            (method, endpoint), {event: [] for event in events})
+
+    def _notify(self, event, hooks, value, event_kwargs, **kwargs):
+        """
+        Fire an event, first to the hooks and then to the signal's receivers.
+        The last value returned by any of them replaces the original.
+
+        :param event: Name of the event
+        :param hooks: Hooks of the view by event
+        :param value: The original value
+        :param event_kwargs: Arguments common to every event of the request
+        :param kwargs: Arguments for this event
+        """
+        kwargs.update(event_kwargs)
+        for hook in hooks[event]:
+            result = hook(self, **kwargs)
+            if result is not None:
+                value = result
+        signal = getattr(self, event)
+        if signal.receivers:
+            value = override(value, signal.send(self, **kwargs))
+        return value
+
+    def _compose_handler(self, key):
+        """
+        Compose the chain of handlers for a type, method and endpoint into a
+        single callable, so requests don't build the chain again.
+
+        :param key: Tuple of the type, method and endpoint
+        """
+        api_type, method, endpoint = key
+        handler = getattr(self.serializer,
+                          '{}_{}'.format(method.name, endpoint.name).lower())
+        self._handlers[key] = self._chain(key, handler)
+
+    def _chain(self, key, handler):
+        """
+        Wrap a handler in the chain of a type, method and endpoint.  Each
+        handler in the chain is called with the next one as its first
+        argument, ending with the given handler.
+
+        :param key: Tuple of the type, method and endpoint
+        :param handler: The innermost handler
+        """
+        for fn in reversed(self._handler_chains.get(key, [])):
+            handler = partial(fn, handler)
+        return handler
+
+    def _encode(self, value):
+        """
+        Encode a value to JSON bytes.
+
+        :param value: Value to encode
+        """
+        with measure('encode'):
+            if self.json_encoder is not JSONAPIEncoder:
+                return json.dumps(value,
+                                  cls=self.json_encoder).encode('utf-8')
+            return self.json_backend.dumps(value)
 
-        return wrapped
+    def _stream_document(self, document):
+        """
+        Encode a document piece by piece.  Members that are generators are
+        written out as arrays one element at a time.  The data and included
+        members go last, followed by meta, so meta can still be updated while
+        the resources are rendered.
+
+        :param document: The response data to encode
+        """
+        trailing = ['data', 'included', 'meta']
+        keys = [k for k in document.keys() if k not in trailing]
+        keys += [k for k in trailing if k in document.keys()]
+
+        yield b'{'
+        for i, key in enumerate(keys):
+            if i > 0:
+                yield b','
+            yield self._encode(key) + b':'
+            value = document[key]
+            if not isgenerator(value):
+                yield self._encode(value)
+                continue
+            yield b'['
+            for j, item in enumerate(value):
+                if j > 0:
+                    yield b','
+                yield self._encode(item)
+            yield b']'
+        yield b'}'
+
+    def _stream_measured(self, chunks, stats, report):
+        """
+        Run stats while each chunk of a streamed body is encoded, then report
+        them once the body has been sent or the client has gone.
+
+        :param chunks: The encoded chunks
+        :param stats: RequestStats of the request
+        :param report: Function reporting the stats
+        """
+        try:
+            stats.start()
+            for chunk in chunks:
+                stats.bytes += len(chunk)
+                stats.stop()
+                yield chunk
+                stats.start()
+        finally:
+            stats.stop()
+            report()
+
+    def _report_stats(self, stats, method, endpoint, req_args):
+        """
+        Send the stats of a finished request to on_stats, and log them if the
+        request was slow.
+
+        :param stats: RequestStats of the request
+        :param method: HTTP Method
+        :param endpoint: Endpoint
+        :param req_args: Arguments of the route
+        """
+        if self.on_stats.receivers:
+            self.on_stats.send(self, method=method, endpoint=endpoint,
+                               req_args=req_args, stats=stats)
+        threshold = self.slow_request_threshold
+        if threshold is None or stats.total * 1000 < threshold:
+            return
+        fields = stats.as_dict()
+        fields.update(method=method.name, endpoint=endpoint.name,
+                      path=request.path)
+        logger.warning(
+            'Slow request %s %s took %.1fms with %d statements, %d rows, '
+            '%d included and %d bytes', method.name, request.path,
+            stats.total * 1000, stats.statements, stats.rows, stats.included,
+            stats.bytes, extra={'jsonapi': fields})
+
+    def _etag_matches(self, etag):
+        """
+        Tell if an ETag matches the If-None-Match header of the request,
+        comparing weakly.
+
+        :param etag: The quoted ETag
+        """
+        return request.if_none_match.contains_weak(unquote_etag(etag)[0])
+
+    def _render_tagged(self, response):
+        """
+        Render a response along with its ETag, or an empty 304 Not Modified
+        if the tag matches If-None-Match.  A tag from the serializer is
+        checked before the data is encoded.  Otherwise the encoded body is
+        hashed into a strong tag.
+
+        :param response: JSONAPIResponse to render
+        """
+        etag = getattr(response, 'etag', None)
+        data = None
+        if etag is None:
+            data = self._encode(response.data)
+            etag = '"{}"'.format(hashlib.sha1(data).hexdigest())
+
+        tag, weak = unquote_etag(etag)
+        if self._etag_matches(etag):
+            rendered_response = make_response('')
+            rendered_response.status_code = 304
+        else:
+            if data is None:
+                data = self._encode(response.data)
+            rendered_response = make_response(data)
+        rendered_response.set_etag(tag, weak)
+        return rendered_response
 
     def _setup_adapter(self, namespace, route_prefix):
         """
@@ -168,6 +402,8 @@ class FlaskJSONAPI(object):
             self.sqla.Model, prefix='{}://{}{}'.format(
                 self.app.config['PREFERRED_URL_SCHEME'],
                 self.app.config['SERVER_NAME'], route_prefix))
+        for key in self._handler_chains.keys():
+            self._compose_handler(key)
         for view in views:
             method, endpoint = view
             pattern = route_prefix + endpoint.value
@@ -187,8 +423,29 @@ class FlaskJSONAPI(object):
         :param method: HTTP Method
         :param endpoint: Pattern
         """
+        default_handler = getattr(self.serializer, '{}_{}'.format(
+            method.name, endpoint.name).lower())
+        hooks = self._view_hooks(method, endpoint)
+        signals = [self.on_request, self.on_success, self.on_error,
+                   self.on_response]
 
         def new_view(**kwargs):
+            if not self.instrument:
+                return handle(None, kwargs)
+            listen()
+            stats = RequestStats()
+            stats.start()
+            try:
+                rendered_response = handle(stats, kwargs)
+            finally:
+                stats.stop()
+            rendered_response.headers['Server-Timing'] = stats.server_timing()
+            if not rendered_response.is_streamed:
+                stats.bytes = rendered_response.calculate_content_length() or 0
+                self._report_stats(stats, method, endpoint, kwargs)
+            return rendered_response
+
+        def handle(stats, kwargs):
             if method == Method.GET:
                 data = request.args
             else:
@@ -197,7 +454,7 @@ class FlaskJSONAPI(object):
                     content_type = request.headers.get('content-type', None)
                     if content_type != 'application/vnd.api+json':
                         data = MissingContentTypeError().data
-                        data = json.dumps(data, cls=JSONAPIEncoder)
+                        data = self._encode(data)
                         response = make_response(data)
                         response.status_code = 409
                         response.content_type = 'application/vnd.api+json'
@@ -206,14 +463,16 @@ class FlaskJSONAPI(object):
                 else:
                     data = None
 
-            event_kwargs = {
-                'method': method,
-                'endpoint': endpoint,
-                'data': data,
-                'req_args': kwargs
-            }
-            results = self.on_request.send(self, **event_kwargs)
-            data = override(data, results)
+            # Without hooks or receivers, no event is built or sent.
+            event_kwargs = None
+            if any(hooks.values()) or any(x.receivers for x in signals):
+                event_kwargs = {
+                    'method': method,
+                    'endpoint': endpoint,
+                    'data': data,
+                    'req_args': kwargs
+                }
+                data = self._notify('on_request', hooks, data, event_kwargs)
 
             args = [self.sqla.session, data, kwargs['api_type']]
             if 'obj_id' in kwargs.keys():
@@ -221,31 +480,63 @@ class FlaskJSONAPI(object):
             if 'relationship' in kwargs.keys():
                 args.append(kwargs['relationship'])
 
+            # Options only go to the serializer, so wrapped handlers keep
+            # being called with the same arguments.
+            handler_kwargs = {}
+            if self.stream_collections and method == Method.GET\
+                    and endpoint == Endpoint.COLLECTION:
+                handler_kwargs['stream'] = True
+            if self.etags and method == Method.GET and request.if_none_match:
+                # Lets the serializer answer from a cached ETag.
+                handler_kwargs['if_none_match'] = self._etag_matches
+
             try:
-                attr = '{}_{}'.format(method.name, endpoint.name).lower()
-                handler = getattr(self.serializer, attr)
-                handler_chain = list(self._handler_chains.get((
-                    kwargs['api_type'], method, endpoint), []))
-                handler_chain.append(handler)
-                chained_handler = self._call_next(handler_chain)
-                response = chained_handler(*args)
-                results = self.on_success.send(self,
-                                               response=response,
-                                               **event_kwargs)
-                response = override(response, results)
+                key = (kwargs['api_type'], method, endpoint)
+                if handler_kwargs:
+                    handler = self._chain(
+                        key, partial(default_handler, **handler_kwargs))
+                else:
+                    handler = self._handlers.get(key, default_handler)
+                response = handler(*args)
+                if event_kwargs is not None:
+                    response = self._notify('on_success', hooks, response,
+                                            event_kwargs, response=response)
             except BaseError as exc:
                 self.sqla.session.rollback()
-                results = self.on_error.send(self, error=exc, **event_kwargs)
-                response = override(exc, results)
+                response = exc
+                if event_kwargs is not None:
+                    response = self._notify('on_error', hooks, exc,
+                                            event_kwargs, error=exc)
+            if stats is not None and response.status_code != 204:
+                included = response.data.get('included')
+                if isgenerator(included):
+                    response.data['included'] = counted(stats, included)
+                elif included is not None:
+                    stats.included = len(included)
+
             rendered_response = make_response('')
-            if response.status_code != 204:
-                data = json.dumps(response.data, cls=self.json_encoder)
-                rendered_response = make_response(data)
-            rendered_response.status_code = response.status_code
+            if response.status_code == 304:
+                rendered_response.set_etag(*unquote_etag(response.etag))
+            elif response.status_code != 204:
+                if any(isgenerator(v) for v in response.data.values()):
+                    chunks = self._stream_document(response.data)
+                    if stats is not None:
+                        chunks = self._stream_measured(chunks, stats, partial(
+                            self._report_stats, stats, method, endpoint,
+                            kwargs))
+                    rendered_response = Response(stream_with_context(chunks))
+                elif self.etags and method == Method.GET\
+                        and response.status_code == 200:
+                    rendered_response = self._render_tagged(response)
+                else:
+                    data = self._encode(response.data)
+                    rendered_response = make_response(data)
+            if rendered_response.status_code != 304:
+                rendered_response.status_code = response.status_code
             rendered_response.content_type = 'application/vnd.api+json'
-            results = self.on_response.send(self,
-                                            response=rendered_response,
-                                            **event_kwargs)
-            return override(rendered_response, results)
+            if event_kwargs is None:
+                return rendered_response
+            return self._notify('on_response', hooks, rendered_response,
+                                event_kwargs, response=rendered_response)
 
         return new_view
@@ -5,12 +5,29 @@ Colton J. Provias
 MIT License
 """
 
+import datetime
+import hashlib
+import json
+import time
+import uuid
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from collections import OrderedDict, namedtuple
+from decimal import Decimal
+from operator import attrgetter
+
 try:
     from enum import Enum
 except ImportError:
     from enum34 import Enum
 
+try:
+    from urllib.parse import urlencode
+except ImportError:
+    from urllib import urlencode
+
 from inflection import dasherize, tableize, underscore
+from sqlalchemy import and_, event, false, func, or_, orm
+from sqlalchemy import inspect as sa_inspect
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm.interfaces import MANYTOONE
 from sqlalchemy.util.langhelpers import iterate_attributes
@@ -18,11 +35,20 @@ from sqlalchemy.util.langhelpers import iterate_attributes
 from .errors import (BadRequestError, InvalidTypeForEndpointError,
                      MissingTypeError, NotSortableError, PermissionDeniedError,
                      RelationshipNotFoundError, ResourceNotFoundError,
-                     ResourceTypeNotFoundError, ToManyExpectedError,
+                     ResourcesNotFoundError, ResourceTypeNotFoundError,
+                     ToManyExpectedError,
                      ValidationError)
+from .filtering import parse_field_filter, parse_filter
+from .stats import measure, timed
 from ._version import __version__
 
 
+#: Loader used to eager load to-many relationships.  selectinload is only
+#: available from SQLAlchemy 1.2.
+TO_MANY_LOADER = 'selectinload' if hasattr(orm, 'selectinload')\
+    else 'subqueryload'
+
+
 class AttributeActions(Enum):
     """ The actions that can be done to an attribute. """
 
@@ -85,13 +111,15 @@ def attr_descriptor(action, *names):
     return wrapped
 
 
-def relationship_descriptor(action, *names):
+def relationship_descriptor(action, *names, **kwargs):
     """
     Wrap a function for modification of a relationship.  This allows for
     specific handling for serialization and deserialization.
 
     :param action: The RelationshipActions that this descriptor performs
     :param names: A list of names of the relationships this references
+    :param eager_load: If False, included relationships are not eager loaded
+                       as the GET descriptor does not read them.
     """
     if isinstance(action, RelationshipActions):
         action = [action]
@@ -102,6 +130,7 @@ def relationship_descriptor(action, *names):
             fn.__jsonapi_desc_for_rels__ = set()
         fn.__jsonapi_desc_for_rels__ |= set(names)
         fn.__jsonapi_action__ |= set(action)
+        fn.__jsonapi_eager_load__ = kwargs.get('eager_load', True)
         return fn
 
     return wrapped
@@ -138,8 +167,94 @@ class PermissionTest(object):
         return fn
 
 
+class BatchPermissionTest(PermissionTest):
+    """
+    Authorize access to a list of resources or fields at once, such as a page
+    of a collection.
+    """
+
+    def __call__(self, fn):
+        """
+        Decorate the function for later processing.  The function is given
+        the model and a list of instances and returns a boolean for each.
+
+        :param fn: Function to decorate
+        """
+        if not hasattr(fn, '__jsonapi_batch_chk_perm_for__'):
+            fn.__jsonapi_batch_check_permission__ = set()
+            fn.__jsonapi_batch_chk_perm_for__ = set()
+        fn.__jsonapi_batch_chk_perm_for__ |= set(self.names)
+        fn.__jsonapi_batch_check_permission__ |= set(self.permission)
+        return fn
+
+
+class QueryPermissionTest(PermissionTest):
+    """ Authorize access to resources with a filter on their query. """
+
+    def __init__(self, permission):
+        """
+        Decorates a function that returns a SQLAlchemy criterion matching the
+        resources that access is allowed to, or None to allow all of them.
+
+        :param permission: The permission to check for
+        """
+        super(QueryPermissionTest, self).__init__(permission)
+
+    def __call__(self, fn):
+        """
+        Decorate the function for later processing.  The function is given
+        the model.
+
+        :param fn: Function to decorate
+        """
+        if not hasattr(fn, '__jsonapi_query_check_permission__'):
+            fn.__jsonapi_query_check_permission__ = set()
+        fn.__jsonapi_query_check_permission__ |= set(self.permission)
+        return fn
+
+
 #: More consistent name for the decorators
 permission_test = PermissionTest
+batch_permission_test = BatchPermissionTest
+query_permission_test = QueryPermissionTest
+
+
+def _parse_datetime(value):
+    """
+    Parse a datetime produced by datetime.isoformat.
+
+    :param value: The formatted datetime
+    """
+    if hasattr(datetime.datetime, 'fromisoformat'):
+        return datetime.datetime.fromisoformat(value)
+    if '.' in value:
+        return datetime.datetime.strptime(value, '%Y-%m-%dT%H:%M:%S.%f')
+    return datetime.datetime.strptime(value, '%Y-%m-%dT%H:%M:%S')
+
+
+#: Precompiled rendering details for a model and sparse fieldset.  version is
+#: the key of the attribute that changes whenever the row does, or None.
+SerializationPlan = namedtuple(
+    'SerializationPlan', ['api_type', 'attributes', 'relationships',
+                          'version'])
+
+#: Attribute entry of a SerializationPlan
+AttributePlan = namedtuple(
+    'AttributePlan', ['key', 'api_key', 'getter', 'view_test'])
+
+#: Relationship entry of a SerializationPlan.  links holds the pieces of the
+#: relationship links that surround the resource id.  With fast_linkage, the
+#: linkage can be rendered from ids alone, taken from the foreign key fk_key
+#: for a to-one relationship or from an id query for a to-many.
+RelationshipPlan = namedtuple(
+    'RelationshipPlan', ['key', 'api_key', 'to_one', 'in_fields', 'getter',
+                         'view_test', 'links', 'target_type', 'fk_key',
+                         'fast_linkage'])
+
+#: Permission checks to make when deleting an instance of a model.
+#: edit_checks are the relationships with EDIT tests and cascades are the
+#: delete cascades that lead to models with tests.
+DeletePlan = namedtuple('DeletePlan', ['edit_checks', 'cascades'])
 
 
 class JSONAPIResponse(object):
@@ -148,6 +263,8 @@ class JSONAPIResponse(object):
     def __init__(self):
         """ Default the status code and data. """
         self.status_code = 200
+        #: ETag of the response if it can be told without encoding the data
+        self.etag = None
         self.data = {
             'jsonapi': {'version': '1.0'},
             'meta': {'sqlalchemy_jsonapi_version': __version__}
@@ -156,15 +273,112 @@ class JSONAPIResponse(object):
 
 def get_permission_test(model, field, permission, instance=None):
     """
-    Fetch a permission test for a field and permission.
+    Fetch a permission test for a field and permission.  Batch and query
+    tests are folded in, checking one instance at a time.
+
+    :param model: The model or instance
+    :param field: Name of the field or None for instance/model-wide
+    :param permission: Permission to check for
+    """
+    test = getattr(model, '__jsonapi_permissions__', {})\
+        .get(field, {})\
+        .get(permission)
+    batch_test = get_batch_permission_test(model, field, permission)
+    query_test = get_query_permission_test(model, field, permission)
+
+    if batch_test is None and query_test is None:
+        return test or (lambda x: True)
+
+    def combined_test(x):
+        if test is not None and not test(x):
+            return False
+        if isinstance(x, type):
+            # Batch and query tests only apply to instances.
+            return True
+        if batch_test is not None and not batch_test(type(x), [x])[0]:
+            return False
+        if query_test is not None:
+            return _check_query_permission(x, query_test)
+        return True
+
+    return combined_test
+
+
+def get_batch_permission_test(model, field, permission):
+    """
+    Fetch a batch permission test for a field and permission, or None.
 
     :param model: The model or instance
     :param field: Name of the field or None for instance/model-wide
     :param permission: Permission to check for
     """
-    return getattr(model, '__jsonapi_permissions__', {})\
+    return getattr(model, '__jsonapi_batch_permissions__', {})\
         .get(field, {})\
-        .get(permission, lambda x: True)
+        .get(permission)
+
+
+def get_query_permission_test(model, field, permission):
+    """
+    Fetch a query permission test for a permission, or None.  Query tests
+    are only registered for the model as a whole.
+
+    :param model: The model or instance
+    :param field: Name of the field or None for instance/model-wide
+    :param permission: Permission to check for
+    """
+    return getattr(model, '__jsonapi_query_permissions__', {})\
+        .get(field, {})\
+        .get(permission)
+
+
+def _check_query_permission(instance, query_test):
+    """
+    Check if a persistent instance matches the criterion of a query test.
+    Instances that aren't in the database yet can't be matched and pass.
+
+    :param instance: The instance to check
+    :param query_test: The query permission test
+    """
+    model = type(instance)
+    criterion = query_test(model)
+    state = sa_inspect(instance)
+    if criterion is None or state.identity is None or state.session is None:
+        return True
+    mapper = model.__mapper__
+    match_pk = [column == value
+                for column, value in zip(mapper.primary_key, state.identity)]
+    session = state.session
+    with session.no_autoflush:
+        return session.query(
+            session.query(model).filter(criterion, *match_pk).exists())\
+            .scalar()
+
+
+def has_permission_test(model, field, permission):
+    """
+    Determine if a permission test of any kind has been registered for a
+    field.
+
+    :param model: The model or instance
+    :param field: Name of the field or None for instance/model-wide
+    :param permission: Permission to check for
+    """
+    return _has_instance_test(model, field, permission)\
+        or get_query_permission_test(model, field, permission) is not None
+
+
+def _has_instance_test(model, field, permission):
+    """
+    Determine if a permission test that needs the instances themselves, being
+    a plain or batch test, has been registered for a field.
+
+    :param model: The model or instance
+    :param field: Name of the field or None for instance/model-wide
+    :param permission: Permission to check for
+    """
+    return permission in getattr(model, '__jsonapi_permissions__', {})\
+        .get(field, {})\
+        or get_batch_permission_test(model, field, permission) is not None
 
 
 def check_permission(instance, field, permission):
@@ -176,10 +390,114 @@ def check_permission(instance, field, permission):
     :param field: The field name to check or None for instance
     :param permission: The permission to check
     """
-    if not get_permission_test(instance, field, permission)(instance):
+    with measure('permissions'):
+        allowed = get_permission_test(instance, field, permission)(instance)
+    if not allowed:
         raise PermissionDeniedError(permission, instance, instance, field)
 
 
+class RequestContext(object):
+    """
+    State that lives for a single request.  Permission test results are
+    remembered by instance, field and permission, so each test is called once
+    per request and gives the same answer every time it is asked.  Included
+    resources are collected here as they are rendered.
+    """
+
+    def __init__(self):
+        """ Start with nothing remembered. """
+        self.permissions = {}
+
+        #: Included resources by type and id, in the order they were added
+        self.included = OrderedDict()
+
+        #: Type, id and nested include paths of every resource rendered into
+        #: included, so a resource is only rendered again when it has
+        #: something different to include
+        self.rendered = set()
+
+        #: To-many linkage ids by model and relationship, then by id
+        self.linkage = {}
+
+        #: Versions of the rendered resources in the order they were
+        #: rendered, or None once a resource without a version is rendered
+        #: or if they aren't needed
+        self.versions = []
+
+    def _memo_key(self, instance, field, permission):
+        """
+        Key a permission test result.  Returns the key and the object to keep
+        along with the result.  Persistent instances are keyed by identity
+        and not kept, so a streamed collection isn't held in memory.  Other
+        instances and models are keyed by id and kept, so the id can't be
+        reused during the request.
+
+        :param instance: The instance or model
+        :param field: The field name or None for instance
+        :param permission: The permission
+        """
+        state = None
+        if not isinstance(instance, type):
+            state = getattr(instance, '_sa_instance_state', None)
+        identity = getattr(state, 'key', None)
+        if identity is not None:
+            return (identity, field, permission), None
+        return (id(instance), field, permission), instance
+
+    def allowed(self, instance, field, permission):
+        """
+        Test a permission for a given instance or field.
+
+        :param instance: The instance to check
+        :param field: The field name to check or None for instance
+        :param permission: The permission to check
+        """
+        key, kept = self._memo_key(instance, field, permission)
+        try:
+            return self.permissions[key][1]
+        except KeyError:
+            with measure('permissions'):
+                allowed = bool(
+                    get_permission_test(instance, field, permission)(instance))
+            self.permissions[key] = (kept, allowed)
+            return allowed
+
+    def remembers(self, instance, field, permission):
+        """
+        Tell if the result of a permission test is known.
+
+        :param instance: The instance to check
+        :param field: The field name to check or None for instance
+        :param permission: The permission to check
+        """
+        return self._memo_key(instance, field, permission)[0]\
+            in self.permissions
+
+    def remember(self, instance, field, permission, allowed):
+        """
+        Record the result of a permission test.
+
+        :param instance: The instance that was checked
+        :param field: The field name checked or None for instance
+        :param permission: The permission checked
+        :param allowed: Result of the test
+        """
+        key, kept = self._memo_key(instance, field, permission)
+        self.permissions[key] = (kept, allowed)
+
+    def check_permission(self, instance, field, permission):
+        """
+        Check a permission for a given instance or field.  Raises an error if
+        denied.
+
+        :param instance: The instance to check
+        :param field: The field name to check or None for instance
+        :param permission: The permission to check
+        """
+        if not self.allowed(instance, field, permission):
+            raise PermissionDeniedError(permission, instance, instance, field)
+
+
 def get_attr_desc(instance, attribute, action):
     """
     Fetch the appropriate descriptor for the attribute.
@@ -222,6 +540,63 @@ def get_rel_desc(instance, key, action):
 class JSONAPI(object):
     """ JSON API Serializer for SQLAlchemy ORM models. """
 
+    #: Number of rows fetched per query when a page has to be filled with
+    #: resources that pass a per-instance VIEW test.
+    page_chunk_size = 100
+
+    #: Number of compiled filter expressions to keep around.
+    filter_cache_size = 256
+
+    #: Number of serialization plans for sparse fieldsets to keep around.
+    plan_cache_size = 256
+
+    #: Largest number of ids to look up in a single IN query.
+    identifier_chunk_size = 500
+
+    #: Render the data of every relationship, not only the included ones.
+    #: To-one linkage comes from foreign keys and to-many linkage from one id
+    #: query per relationship and page where permission tests allow it.
+    always_render_linkage = False
+
+    #: Write to to-many relationships by setting foreign keys or inserting
+    #: association rows directly, so the collection is never loaded.  This
+    #: skips collection events and validators, so set it to False to go
+    #: through the collection instead.  Relationships with descriptors for
+    #: the write always go through them.
+    bulk_relationship_writes = True
+
+    #: How meta.total of a paginated collection is counted.  None, the
+    #: default, leaves the total out.  'query' runs a separate COUNT and
+    #: 'window' adds COUNT(*) OVER () to the page query.  A callable taking
+    #: the model and the filtered query can return an estimate instead, for
+    #: tables too large to count exactly.
+    count_strategy = None
+
+    #: Count the total of cursor paginated collections with count_strategy
+    #: too.  Off by default, as a COUNT scans the rows the cursor skips.
+    count_cursor_pages = False
+
+    #: Seconds to reuse the result of a COUNT query.  0 disables caching.
+    count_cache_ttl = 0
+
+    #: Number of COUNT results to keep around.
+    count_cache_size = 256
+
+    #: Overrides the session's expire_on_commit for the commits of write
+    #: endpoints.  False renders the response from the instance as written,
+    #: only loading the columns the database generated.  None keeps the
+    #: session's setting.
+    expire_on_commit = None
+
+    #: ResponseCache for GET responses, set with use_cache.
+    response_cache = None
+
+    #: Callable returning a hashable value that identifies whose permissions
+    #: apply to the request, such as the id of the current user.  Cached
+    #: responses are only shared between requests with the same value.
+    #: Required by use_cache if any model has a VIEW permission test.
+    cache_scope = None
+
     def __init__(self, base, prefix=''):
         """
         Initialize the serializer.
@@ -232,6 +607,10 @@ class JSONAPI(object):
         self.base = base
         self.prefix = prefix
         self.models = {}
+        self._plans = OrderedDict()
+        self._delete_plans = {}
+        self._filters = OrderedDict()
+        self._counts = OrderedDict()
         for name, model in base._decl_class_registry.items():
             if name.startswith('_'):
                 continue
@@ -246,6 +625,8 @@ class JSONAPI(object):
             model.__jsonapi_attribute_descriptors__ = {}
             model.__jsonapi_rel_desc__ = {}
             model.__jsonapi_permissions__ = {}
+            model.__jsonapi_batch_permissions__ = {}
+            model.__jsonapi_query_permissions__ = {}
             model.__jsonapi_type__ = api_type
             model.__jsonapi_map_to_py__ = {
                 dasherize(underscore(x)): x for x in model_keys}
@@ -293,6 +674,21 @@ class JSONAPI(object):
                         check_perms = prop_value.__jsonapi_check_permission__
                         for check_perm in check_perms:
                             perm_idv[check_perm] = prop_value
+
+                if hasattr(prop_value, '__jsonapi_batch_check_permission__'):
+                    perm_obj = model.__jsonapi_batch_permissions__
+                    check_perms = prop_value.__jsonapi_batch_check_permission__
+                    for check_for in prop_value.__jsonapi_batch_chk_perm_for__:
+                        perm_idv = perm_obj.setdefault(check_for, {})
+                        for check_perm in check_perms:
+                            perm_idv[check_perm] = prop_value
+
+                if hasattr(prop_value, '__jsonapi_query_check_permission__'):
+                    perm_idv = model.__jsonapi_query_permissions__\
+                        .setdefault(None, {})
+                    check_perms = prop_value.__jsonapi_query_check_permission__
+                    for check_perm in check_perms:
+                        perm_idv[check_perm] = prop_value
             self.models[model.__jsonapi_type__] = model
 
     def _api_type_for_model(self, model):
@@ -329,7 +725,8 @@ class JSONAPI(object):
         if 'data' not in json_data.keys():
             raise BadRequestError('Request should contain data key')
 
-    def _fetch_resource(self, session, api_type, obj_id, permission):
+    def _fetch_resource(self, session, api_type, obj_id, permission,
+                        options=(), context=None):
         """
         Fetch a resource by type and id, also doing a permission check.
 
@@ -337,150 +734,644 @@ class JSONAPI(object):
         :param api_type: The type
         :param obj_id: ID for the resource
         :param permission: Permission to check
+        :param options: Loader options for the query
+        :param context: RequestContext to remember the check in
         """
         if api_type not in self.models.keys():
             raise ResourceTypeNotFoundError(api_type)
-        obj = session.query(self.models[api_type]).get(obj_id)
+        obj = session.query(self.models[api_type]).options(*options)\
+            .get(obj_id)
         if obj is None:
             raise ResourceNotFoundError(self.models[api_type], obj_id)
-        check_permission(obj, None, permission)
+        if context is None:
+            check_permission(obj, None, permission)
+        else:
+            context.check_permission(obj, None, permission)
         return obj
 
-    def _render_short_instance(self, instance):
+    def _fetch_resources(self, session, identifiers, permission,
+                         context=None):
+        """
+        Fetch resources by type and id with one query per type, also doing a
+        permission check on each.  Returns the resources in the same order as
+        the identifiers.
+
+        :param session: SQLAlchemy session
+        :param identifiers: List of (type, id) pairs
+        :param permission: Permission to check
+        :param context: RequestContext to remember the checks in
+        """
+        by_type = OrderedDict()
+        for api_type, obj_id in identifiers:
+            if api_type not in self.models.keys():
+                raise ResourceTypeNotFoundError(api_type)
+            by_type.setdefault(api_type, []).append(obj_id)
+
+        found = {}
+        missing = []
+        for api_type, ids in by_type.items():
+            model = self.models[api_type]
+            primary_key = model.__mapper__.primary_key
+            unique_ids = list(OrderedDict.fromkeys(str(x) for x in ids))
+
+            if len(primary_key) == 1:
+                id_key = model.__mapper__\
+                    .get_property_by_column(primary_key[0]).key
+                size = self.identifier_chunk_size
+                for start in range(0, len(unique_ids), size):
+                    chunk = unique_ids[start:start + size]
+                    for obj in session.query(model)\
+                            .filter(primary_key[0].in_(chunk)):
+                        found[(api_type, str(getattr(obj, id_key)))] = obj
+
+            for obj_id in ids:
+                if (api_type, str(obj_id)) in found:
+                    continue
+                # Ids that don't come back as the same string still get a
+                # chance through the identity lookup.
+                obj = session.query(model).get(obj_id)
+                if obj is None:
+                    missing.append((model, obj_id))
+                else:
+                    found[(api_type, str(obj_id))] = obj
+
+        if len(missing) == 1:
+            raise ResourceNotFoundError(*missing[0])
+        if missing:
+            raise ResourcesNotFoundError(missing)
+
+        resources = []
+        for api_type, obj_id in identifiers:
+            obj = found[(api_type, str(obj_id))]
+            if context is None:
+                check_permission(obj, None, permission)
+            else:
+                context.check_permission(obj, None, permission)
+            resources.append(obj)
+        return resources
+
+    def _render_short_instance(self, instance, context):
         """
         For those very short versions of resources, we have this.
 
         :param instance: The instance to render
+        :param context: RequestContext of the request
         """
-        check_permission(instance, None, Permissions.VIEW)
+        context.check_permission(instance, None, Permissions.VIEW)
         return {'type': instance.__jsonapi_type__, 'id': instance.id}
 
-    def _render_full_resource(self, instance, include, fields):
+    def _serialization_plan(self, model, fields):
         """
-        Generate a representation of a full resource to match JSON API spec.
+        Fetch the serialization plan for a model and its sparse fieldset,
+        compiling it on first use.
 
-        :param instance: The instance to serialize
-        :param include: Dictionary of relationships to include
+        :param model: The model to serialize
         :param fields: Dictionary of fields to filter
         """
-        api_type = instance.__jsonapi_type__
-        orm_desc_keys = instance.__mapper__.all_orm_descriptors.keys()
-        to_ret = {
-            'id': instance.id,
-            'type': api_type,
-            'attributes': {},
-            'relationships': {},
-            'included': {}
-        }
+        requested = fields.get(model.__jsonapi_type__)
+        if requested is not None:
+            requested = frozenset(requested)
+        key = (model, requested)
+        plan = self._plans.get(key)
+        if plan is None:
+            plan = self._compile_plan(model, requested)
+            while len(self._plans) >= self.plan_cache_size:
+                try:
+                    self._plans.popitem(last=False)
+                except KeyError:
+                    break
+            self._plans[key] = plan
+        return plan
+
+    def _compile_plan(self, model, requested):
+        """
+        Work out everything about rendering a model that doesn't depend on the
+        instance, so rendering is a loop over the resulting tuples.
+
+        :param model: The model to serialize
+        :param requested: API names of the requested fields or None for all
+        """
+        api_type = model.__jsonapi_type__
+        mapper = model.__mapper__
+        orm_desc_keys = mapper.all_orm_descriptors.keys()
         attrs_to_ignore = {'__mapper__', 'id'}
-        if api_type in fields.keys():
-            local_fields = list(map((
-                lambda x: instance.__jsonapi_map_to_py__[x]),
-                fields[api_type]))
+        if requested is not None:
+            local_fields = {model.__jsonapi_map_to_py__[x] for x in requested}
         else:
-            local_fields = orm_desc_keys
+            local_fields = set(orm_desc_keys)
 
-        for key, relationship in instance.__mapper__.relationships.items():
+        def view_test(key):
+            if has_permission_test(model, key, Permissions.VIEW):
+                return get_permission_test(model, key, Permissions.VIEW)
+            return None
+
+        relationships = []
+        for key, relationship in mapper.relationships.items():
             attrs_to_ignore |= set([c.name for c in relationship.local_columns
                                     ]) | {key}
+            api_key = model.__jsonapi_map_to_api__[key]
+            has_getter = RelationshipActions.GET in\
+                model.__jsonapi_rel_desc__.get(key, {})
+            getter = model.__jsonapi_rel_desc__.get(key, {})\
+                .get(RelationshipActions.GET, attrgetter(key))
+            links = ('{}/{}/'.format(self.prefix, api_type),
+                     '/relationships/{}'.format(api_key),
+                     '/{}'.format(api_key))
+            to_one = relationship.direction == MANYTOONE
+            fk_key = self._linkage_fk_key(relationship)
+            fast_linkage = not has_getter\
+                and self._ids_are_linkage(relationship)\
+                and (fk_key is not None or not to_one)
+            relationships.append(RelationshipPlan(
+                key, api_key, to_one, key in local_fields, getter,
+                view_test(key), links,
+                getattr(relationship.mapper.class_, '__jsonapi_type__', None),
+                fk_key, fast_linkage))
+
+        attributes = []
+        for key in set(orm_desc_keys) - attrs_to_ignore:
+            if key not in local_fields:
+                continue
+            getter = model.__jsonapi_attribute_descriptors__.get(key, {})\
+                .get(AttributeActions.GET, attrgetter(key))
+            attributes.append(AttributePlan(
+                key, model.__jsonapi_map_to_api__[key], getter,
+                view_test(key)))
 
-            api_key = instance.__jsonapi_map_to_api__[key]
+        return SerializationPlan(api_type, tuple(attributes),
+                                 tuple(relationships),
+                                 self._version_key(model))
 
-            try:
-                desc = get_rel_desc(instance, key, RelationshipActions.GET)
-            except PermissionDeniedError:
+    def _version_key(self, model):
+        """
+        Find the attribute that changes whenever a row of a model does.  This
+        is __jsonapi_version__ on the model, or else the version counter of
+        the mapper.  Returns None if there is neither.
+
+        :param model: The model to check
+        """
+        key = getattr(model, '__jsonapi_version__', None)
+        if key is None and model.__mapper__.version_id_col is not None:
+            key = model.__mapper__.get_property_by_column(
+                model.__mapper__.version_id_col).key
+        return key
+
+    def _version_etag(self, query, response, context):
+        """
+        Build a weak ETag for a rendered response from the versions of its
+        resources rather than from the encoded body.  Returns None if any of
+        the resources has no version.
+
+        Besides the versions, the tag covers the query args, the ids, the
+        attributes and linkage of each resource, and the links and meta, so
+        it changes with membership, permissions and relationships too.
+
+        :param query: Dict of query args
+        :param response: The JSONAPIResponse to tag
+        :param context: RequestContext the response was rendered with
+        """
+        if context.versions is None:
+            return None
+
+        data = response.data['data']
+        if data is None:
+            data = []
+        elif isinstance(data, dict):
+            data = [data]
+
+        shape = []
+        for resource in list(data) + list(response.data.get('included', [])):
+            shape.append((
+                resource['type'], resource['id'],
+                sorted(resource['attributes'].keys()),
+                sorted((key, rel.get('data')) for key, rel
+                       in resource['relationships'].items())))
+
+        digest = hashlib.sha1()
+        for part in (sorted(query.items()), context.versions, shape,
+                     sorted(response.data.get('links', {}).items()),
+                     sorted(response.data['meta'].items())):
+            digest.update(repr(part).encode('utf-8'))
+        return 'W/"{}"'.format(digest.hexdigest())
+
+    def _relationship_plan(self, model, key):
+        """
+        Fetch the plan entry for a relationship of a model.
+
+        :param model: The model owning the relationship
+        :param key: Key of the relationship
+        """
+        for rel in self._serialization_plan(model, {}).relationships:
+            if rel.key == key:
+                return rel
+
+    def _linkage_fk_key(self, relationship):
+        """
+        Find the foreign key attribute holding the id of the resource on the
+        other side of a to-one relationship, or None if there isn't one.
+
+        :param relationship: The relationship
+        """
+        if relationship.direction != MANYTOONE\
+                or relationship.secondary is not None\
+                or len(relationship.local_remote_pairs) != 1:
+            return None
+        local, remote = relationship.local_remote_pairs[0]
+        if list(relationship.mapper.primary_key) != [remote]:
+            return None
+        try:
+            return relationship.parent.get_property_by_column(local).key
+        except orm.exc.UnmappedColumnError:
+            return None
+
+    def _ids_are_linkage(self, relationship):
+        """
+        Determine if the ids on the other side of a relationship are enough
+        for its linkage, meaning the resources there never have to be loaded
+        to know their type or whether they can be viewed.
+
+        :param relationship: The relationship
+        """
+        target = relationship.mapper
+        return target.polymorphic_on is None\
+            and len(target.primary_key) == 1\
+            and not has_permission_test(target.class_, None, Permissions.VIEW)
+
+    def _prefetch_linkage(self, model, instances, include, fields, context,
+                          only=None):
+        """
+        Load the ids for the to-many linkage of many instances of a model,
+        with one query per relationship.  Results are kept in the context.
+
+        :param model: The model of the instances
+        :param instances: Instances that are about to be rendered
+        :param include: Dictionary of relationships to include
+        :param fields: Dictionary of fields to filter
+        :param context: RequestContext to keep the linkage in
+        :param only: Key of the one relationship to load, or None for all
+        """
+        if not instances:
+            return
+        session = sa_inspect(instances[0]).session
+        mapper = model.__mapper__
+        parent = orm.aliased(model)
+        parent_pk = getattr(parent, mapper.get_property_by_column(
+            mapper.primary_key[0]).key)
+        ids = [mapper.primary_key_from_instance(x)[0] for x in instances]
+
+        for rel in self._serialization_plan(model, fields).relationships:
+            if rel.to_one or not rel.in_fields or not rel.fast_linkage\
+                    or rel.api_key in include:
+                continue
+            if only is not None and rel.key != only:
                 continue
 
-            if relationship.direction == MANYTOONE:
-                if key in local_fields:
-                    to_ret['relationships'][api_key] = {
-                        'links': self._lazy_relationship(api_type, instance.id,
-                                                         api_key)
-                    }
+            linkage = context.linkage.setdefault((model, rel.key), {})
+            todo = [x for x in ids if x not in linkage]
+            relationship = mapper.relationships[rel.key]
+            target = relationship.mapper
+            target_pk = getattr(target.class_, target.get_property_by_column(
+                target.primary_key[0]).key)
+            query = session.query(parent_pk, target_pk).select_from(parent)\
+                .join(getattr(parent, rel.key))
+            if relationship.order_by:
+                query = query.order_by(*relationship.order_by)
+
+            size = self.identifier_chunk_size
+            for start in range(0, len(todo), size):
+                chunk = todo[start:start + size]
+                for x in chunk:
+                    linkage[x] = []
+                for parent_id, target_id in query.filter(
+                        parent_pk.in_(chunk)):
+                    linkage[parent_id].append(target_id)
+
+    def _prefetch_by_model(self, instances, include, fields, context):
+        """
+        Load the to-many linkage of instances of any models, with one query
+        per model and relationship.
 
-                if api_key in include.keys():
-                    related = desc(instance)
-                    if related is not None:
-                        perm = get_permission_test(
-                            related, None, Permissions.VIEW)
-                    if (key in local_fields
-                            and (related is None or not perm(related))):
-                        to_ret['relationships'][api_key]['data'] = None
+        :param instances: Instances that are about to be rendered
+        :param include: Dictionary of relationships to include
+        :param fields: Dictionary of fields to filter
+        :param context: RequestContext to keep the linkage in
+        """
+        by_model = OrderedDict()
+        for instance in instances:
+            by_model.setdefault(type(instance), []).append(instance)
+        for model, model_instances in by_model.items():
+            self._prefetch_linkage(model, model_instances, include, fields,
+                                   context)
+
+    def _prefetch_tree(self, instances, include, fields, context):
+        """
+        Prepare instances about to be rendered and the resources they
+        include, a level of includes at a time.  The VIEW tests of each level
+        are run together, and with always_render_linkage its to-many linkage
+        is loaded with one query per model and relationship.  Only
+        relationships that are already loaded are followed; anything else is
+        prepared when it is rendered.
+
+        :param instances: Instances that are about to be rendered
+        :param include: Dictionary of relationships to include
+        :param fields: Dictionary of fields to filter
+        :param context: RequestContext to keep the results in
+        """
+        level = OrderedDict()
+        for instance in instances:
+            level.setdefault((type(instance), None), (include, []))[1]\
+                .append(instance)
+
+        seen = set()
+        while level:
+            candidates = []
+            for (model, _), (model_include, group) in level.items():
+                if self.always_render_linkage:
+                    self._prefetch_linkage(model, group, model_include,
+                                           fields, context)
+                for rel in self._serialization_plan(model,
+                                                    fields).relationships:
+                    if rel.api_key not in model_include:
                         continue
-                    if key in local_fields:
-                        to_ret['relationships'][api_key]['data'] = self._render_short_instance(related)  # NOQA
-                    new_include = self._parse_include(include[api_key])
-                    built = self._render_full_resource(
-                        related, new_include, fields)
-                    included = built.pop('included')
-                    to_ret['included'].update(included)
-                    to_ret['included'][(related.__jsonapi_type__, related.id)] = built  # NOQA
+                    paths = tuple(sorted(model_include[rel.api_key]))
+                    new_include = self._parse_include(
+                        model_include[rel.api_key])
+                    for instance in group:
+                        if rel.key in sa_inspect(instance).unloaded:
+                            continue
+                        if rel.view_test is not None and not context.allowed(
+                                instance, rel.key, Permissions.VIEW):
+                            continue
+                        related = getattr(instance, rel.key)
+                        if rel.to_one:
+                            related = [] if related is None else [related]
+                        for item in related:
+                            key = (type(item), item.id, paths)
+                            if key not in seen:
+                                seen.add(key)
+                                candidates.append((item, paths, new_include))
+
+            self._check_viewable([x[0] for x in candidates], context)
+            level = OrderedDict()
+            for item, paths, new_include in candidates:
+                if context.allowed(item, None, Permissions.VIEW):
+                    level.setdefault((type(item), paths), (new_include, []))\
+                        [1].append(item)
+
+    def _render_linkage(self, instance, rel, fields, context):
+        """
+        Render the linkage of a relationship that isn't being included.
 
-            else:
+        :param instance: The instance owning the relationship
+        :param rel: RelationshipPlan of the relationship
+        :param fields: Dictionary of fields to filter
+        :param context: RequestContext of the request
+        """
+        if rel.fast_linkage and rel.to_one:
+            obj_id = getattr(instance, rel.fk_key)
+            if obj_id is None:
+                return None
+            return {'type': rel.target_type, 'id': obj_id}
+
+        if rel.fast_linkage:
+            model = type(instance)
+            obj_id = model.__mapper__.primary_key_from_instance(instance)[0]
+            linkage = context.linkage.get((model, rel.key), {})
+            if obj_id not in linkage:
+                self._prefetch_linkage(model, [instance], {}, fields, context,
+                                       only=rel.key)
+                linkage = context.linkage[(model, rel.key)]
+            return [{'type': rel.target_type, 'id': x}
+                    for x in linkage[obj_id]]
+
+        if rel.to_one:
+            related = rel.getter(instance)
+            if related is None or not context.allowed(
+                    related, None, Permissions.VIEW):
+                return None
+            return self._render_short_instance(related, context)
+
+        related = list(rel.getter(instance))
+        self._check_viewable(related, context)
+        return [self._render_short_instance(item, context)
+                for item in related
+                if context.allowed(item, None, Permissions.VIEW)]
+
+    @timed('render')
+    def _render_full_resource(self, instance, include, fields, context):
+        """
+        Generate a representation of a full resource to match JSON API spec.
+
+        :param instance: The instance to serialize
+        :param include: Dictionary of relationships to include
+        :param fields: Dictionary of fields to filter
+        :param context: RequestContext to add included resources to
+        """
+        plan = self._serialization_plan(instance.__class__, fields)
+        obj_id = str(instance.id)
+        to_ret = {
+            'id': instance.id,
+            'type': plan.api_type,
+            'attributes': {},
+            'relationships': {}
+        }
+
+        for rel in plan.relationships:
+            if not rel.in_fields and rel.api_key not in include:
+                continue
 
-                if key in local_fields:
-                    to_ret['relationships'][api_key] = {
-                        'links': self._lazy_relationship(
-                            api_type, instance.id, api_key),
+            if rel.view_test is not None and not context.allowed(
+                    instance, rel.key, Permissions.VIEW):
+                continue
+
+            if rel.in_fields:
+                head, self_tail, related_tail = rel.links
+                rendered = to_ret['relationships'][rel.api_key] = {
+                    'links': {
+                        'self': head + obj_id + self_tail,
+                        'related': head + obj_id + related_tail
                     }
+                }
 
-                if api_key not in include.keys():
-                    continue
+            if rel.api_key not in include:
+                if rel.in_fields and self.always_render_linkage:
+                    rendered['data'] = self._render_linkage(
+                        instance, rel, fields, context)
+                continue
 
-                if key in local_fields:
-                    to_ret['relationships'][api_key]['data'] = []
+            new_include = self._parse_include(include[rel.api_key])
+            include_paths = tuple(sorted(include[rel.api_key]))
 
-                related = desc(instance)
+            if rel.to_one:
+                related = rel.getter(instance)
+                if related is None or not context.allowed(
+                        related, None, Permissions.VIEW):
+                    if rel.in_fields:
+                        rendered['data'] = None
+                    continue
+                if rel.in_fields:
+                    rendered['data'] = self._render_short_instance(
+                        related, context)
+                related = [related]
+            else:
+                if rel.in_fields:
+                    rendered['data'] = []
+                related = list(rel.getter(instance))
+                self._check_viewable(related, context)
+                if self.always_render_linkage:
+                    self._prefetch_by_model(related, new_include, fields,
+                                            context)
 
-                for item in related:
-                    try:
-                        check_permission(item, None, Permissions.VIEW)
-                    except PermissionDeniedError:
+            for item in related:
+                if not rel.to_one:
+                    if not context.allowed(item, None, Permissions.VIEW):
                         continue
 
-                    if key in local_fields:
-                        to_ret['relationships'][api_key]['data'].append(
-                            self._render_short_instance(item))
+                    if rel.in_fields:
+                        rendered['data'].append(
+                            self._render_short_instance(item, context))
 
-                    new_include = self._parse_include(include[api_key])
-                    built = self._render_full_resource(item, new_include,
-                                                       fields)
-                    included = built.pop('included')
-                    to_ret['included'].update(included)
-                    to_ret['included'][(item.__jsonapi_type__, item.id)] = built  # NOQA
+                key = (item.__jsonapi_type__, item.id)
+                if (key, include_paths) in context.rendered:
+                    continue
+                context.rendered.add((key, include_paths))
+                context.included[key] = self._render_full_resource(
+                    item, new_include, fields, context)
 
-        for key in set(orm_desc_keys) - attrs_to_ignore:
+        attributes = to_ret['attributes']
+        for attr in plan.attributes:
             try:
-                desc = get_attr_desc(instance, key, AttributeActions.GET)
-                if key in local_fields:
-                    to_ret['attributes'][instance.__jsonapi_map_to_api__[key]] = desc(instance)  # NOQA
+                if attr.view_test is None or context.allowed(
+                        instance, attr.key, Permissions.VIEW):
+                    attributes[attr.api_key] = attr.getter(instance)
             except PermissionDeniedError:
                 continue
 
+        if context.versions is not None:
+            if plan.version is None:
+                context.versions = None
+            else:
+                context.versions.append(getattr(instance, plan.version))
+
         return to_ret
 
-    def _check_instance_relationships_for_delete(self, instance):
+    def _has_delete_tests(self, model):
+        """
+        Determine if deleting an instance of a model calls any permission
+        tests of its own.
+
+        :param model: The model to check
+        """
+        if has_permission_test(model, None, Permissions.DELETE):
+            return True
+        return any(has_permission_test(model, key, Permissions.EDIT)
+                   for key in model.__mapper__.relationships.keys())
+
+    def _delete_plan(self, model):
+        """
+        Fetch the checks for deleting an instance of a model, working them
+        out on first use.  A delete cascade is only followed if some model
+        reachable through it has permission tests.
+
+        :param model: The model being deleted
+        """
+        plan = self._delete_plans.get(model)
+        if plan is not None:
+            return plan
+
+        def needs_check(target):
+            seen = set()
+            pending = [target]
+            while pending:
+                current = pending.pop()
+                if current in seen:
+                    continue
+                seen.add(current)
+                if self._has_delete_tests(current):
+                    return True
+                pending.extend(
+                    rel.mapper.class_
+                    for rel in current.__mapper__.relationships.values()
+                    if rel.cascade.delete)
+            return False
+
+        relationships = model.__mapper__.relationships
+        edit_checks = tuple(
+            key for key in relationships.keys()
+            if has_permission_test(model, key, Permissions.EDIT))
+        cascades = tuple(
+            (key, rel) for key, rel in relationships.items()
+            if rel.cascade.delete and needs_check(rel.mapper.class_))
+        plan = self._delete_plans[model] = DeletePlan(edit_checks, cascades)
+        return plan
+
+    def _load_cascade(self, session, model, rel_key, instances):
+        """
+        Load the members of a relationship for many instances at once.
+
+        :param session: SQLAlchemy session
+        :param model: The model of the instances
+        :param rel_key: Key of the relationship
+        :param instances: The instances to load the relationship of
+        """
+        mapper = model.__mapper__
+        target = mapper.relationships[rel_key].mapper.class_
+        parent = orm.aliased(model)
+        primary_key = getattr(parent, mapper.get_property_by_column(
+            mapper.primary_key[0]).key)
+        ids = [mapper.primary_key_from_instance(x)[0] for x in instances]
+
+        loaded = []
+        size = self.identifier_chunk_size
+        for start in range(0, len(ids), size):
+            loaded.extend(
+                session.query(target).select_from(parent)
+                .join(getattr(parent, rel_key))
+                .filter(primary_key.in_(ids[start:start + size])))
+        return loaded
+
+    def _check_instance_relationships_for_delete(self, session, instance,
+                                                 context):
         """
         Ensure we are authorized to delete this and all cascaded resources.
 
+        The cascade is walked a level at a time, loading each relationship
+        for the whole level in one query.  Branches that can't lead to a
+        permission test are never loaded.
+
+        :param session: SQLAlchemy session
         :param instance: The instance to check the relationships of.
+        :param context: RequestContext of the request
         """
-        check_permission(instance, None, Permissions.DELETE)
-        for rel_key, rel in instance.__mapper__.relationships.items():
-            check_permission(instance, rel_key, Permissions.EDIT)
-
-            if rel.cascade.delete:
-                if rel.direction == MANYTOONE:
-                    related = getattr(instance, rel_key)
-                    self._check_instance_relationships_for_delete(related)
-                else:
-                    instances = getattr(instance, rel_key)
-                    for to_check in instances:
-                        self._check_instance_relationships_for_delete(to_check)
+        level = [(type(instance), [instance])]
+        seen = {id(instance)}
+
+        while level:
+            next_level = OrderedDict()
+            for model, instances in level:
+                plan = self._delete_plan(model)
+                for to_check in instances:
+                    context.check_permission(to_check, None,
+                                             Permissions.DELETE)
+                    for rel_key in plan.edit_checks:
+                        context.check_permission(to_check, rel_key,
+                                                 Permissions.EDIT)
+
+                for rel_key, rel in plan.cascades:
+                    for related in self._load_cascade(session, model,
+                                                      rel_key, instances):
+                        if id(related) in seen:
+                            continue
+                        seen.add(id(related))
+                        next_level.setdefault(type(related), [])\
+                            .append(related)
+            level = list(next_level.items())
 
     def _parse_fields(self, query):
         """
-        Parse the querystring args for fields.
+        Parse the querystring args for fields.  Each fieldset is a frozenset,
+        as order and repeats don't change what is rendered.  Unknown fields
+        of a known type are a BadRequestError.
 
         :param query: Dict of query args
         """
@@ -492,7 +1383,15 @@ class JSONAPI(object):
         fields = {}
 
         for k, v in field_args.items():
-            fields[k[7:-1]] = v.split(',')
+            api_type = k[7:-1]
+            requested = frozenset(x for x in v.split(',') if x)
+            model = self.models.get(api_type)
+            if model is not None:
+                unknown = requested - set(model.__jsonapi_map_to_py__.keys())
+                if unknown:
+                    raise BadRequestError('Unknown fields {} for {}'.format(
+                        ', '.join(sorted(unknown)), api_type))
+            fields[api_type] = requested
 
         return fields
 
@@ -507,43 +1406,741 @@ class JSONAPI(object):
             if '.' in item:
                 local, remote = item.split('.', 1)
             else:
-                local = item
-                remote = None
-
-            ret.setdefault(local, [])
-            if remote:
-                ret[local].append(remote)
+                local = item
+                remote = None
+
+            ret.setdefault(local, [])
+            if remote:
+                ret[local].append(remote)
+
+        return ret
+
+    def _eager_load_options(self, model, include, fields, parent=None):
+        """
+        Build loader options for the relationships to be included, so they
+        are loaded along with the query instead of once per instance.
+
+        :param model: The model the includes are relative to
+        :param include: Parsed includes from _parse_include
+        :param fields: Dictionary of fields to filter
+        :param parent: Loader option for the path leading to model
+        """
+        options = []
+
+        for api_key, remote in include.items():
+            py_key = model.__jsonapi_map_to_py__.get(api_key)
+            if py_key not in model.__mapper__.relationships.keys():
+                continue
+
+            relationship = model.__mapper__.relationships[py_key]
+            if relationship.lazy == 'dynamic':
+                continue
+
+            desc = model.__jsonapi_rel_desc__.get(py_key, {})\
+                .get(RelationshipActions.GET)
+            if not getattr(desc, '__jsonapi_eager_load__', True):
+                continue
+
+            if relationship.direction == MANYTOONE:
+                strategy = 'joinedload'
+            else:
+                strategy = TO_MANY_LOADER
+            loader = orm if parent is None else parent
+            option = getattr(loader, strategy)(getattr(model, py_key))
+
+            related_model = relationship.mapper.class_
+            related_include = self._parse_include(remote)
+            options.extend(self._projection_options(
+                related_model, related_include, fields, parent=option))
+            nested = self._eager_load_options(
+                related_model, related_include, fields, option)
+            options.extend(nested or [option])
+
+        return options
+
+    def _projection_options(self, model, include, fields, extra=(),
+                            parent=None):
+        """
+        Build a load_only option from the sparse fieldset of a model, so
+        columns that won't be rendered are left in the database.  Primary keys
+        and the foreign keys of included relationships are always loaded, as
+        are any keys listed in __jsonapi_always_load__ on the model.  Models
+        with VIEW tests or GET descriptors aren't projected unless they list
+        what those read in __jsonapi_always_load__.
+
+        :param model: The model being loaded
+        :param include: Parsed includes from _parse_include
+        :param fields: Dictionary of fields to filter
+        :param extra: Further attribute names that have to be loaded
+        :param parent: Loader option for the path leading to model
+        """
+        requested = fields.get(model.__jsonapi_type__)
+        if requested is None:
+            return []
+        if not hasattr(model, '__jsonapi_always_load__')\
+                and self._reads_instances(model):
+            # Each instance would load what was left out on its own.
+            return []
+
+        mapper = model.__mapper__
+        column_keys = set(mapper.column_attrs.keys())
+        descriptors = model.__jsonapi_attribute_descriptors__
+        keys = {mapper.get_property_by_column(c).key
+                for c in mapper.primary_key}
+        keys |= set(extra) | set(getattr(model, '__jsonapi_always_load__', ()))
+
+        linked = set(include.keys())
+        for api_key in requested:
+            key = model.__jsonapi_map_to_py__.get(api_key)
+            if key in mapper.relationships.keys():
+                if self.always_render_linkage:
+                    linked.add(api_key)
+                continue
+            if key not in column_keys\
+                    or AttributeActions.GET in descriptors.get(key, {}):
+                # Hybrids and descriptors may read any column.
+                return []
+            keys.add(key)
+
+        version = self._version_key(model)
+        if version is not None:
+            keys.add(version)
+
+        for api_key in linked:
+            key = model.__jsonapi_map_to_py__.get(api_key)
+            if key not in mapper.relationships.keys():
+                continue
+            for column in mapper.relationships[key].local_columns:
+                if column in mapper.columns.values():
+                    keys.add(mapper.get_property_by_column(column).key)
+
+        attrs = [getattr(model, key) for key in keys & column_keys]
+        loader = orm if parent is None else parent
+        return [loader.load_only(*attrs)]
+
+    def _reads_instances(self, model):
+        """
+        Check if rendering a model calls code that may read any column of its
+        instances, being a VIEW test that isn't a query test or a GET
+        descriptor.
+
+        :param model: The model to check
+        """
+        for name in ['__jsonapi_permissions__',
+                     '__jsonapi_batch_permissions__']:
+            for tests in getattr(model, name, {}).values():
+                if Permissions.VIEW in tests:
+                    return True
+        if any(AttributeActions.GET in descriptors for descriptors
+               in model.__jsonapi_attribute_descriptors__.values()):
+            return True
+        return any(RelationshipActions.GET in descriptors
+                   for descriptors in model.__jsonapi_rel_desc__.values())
+
+    def _parse_page(self, query):
+        """
+        Parse the querystring args for pagination.
+
+        :param query: Dict of query args
+        """
+        args = {k[5:-1]: v for k, v in query.items() if k.startswith('page[')}
+
+        if {'number', 'size'} == set(args.keys()):
+            if not args['number'].isdecimal() or not args['size'].isdecimal():
+                raise BadRequestError('Page query parameters must be integers')
+
+            number = int(args['number'])
+            size = int(args['size'])
+            start = number * size
+
+            return start, start + size - 1
+
+        if {'limit', 'offset'} == set(args.keys()):
+            if not args['limit'].isdecimal() or not args['offset'].isdecimal():
+                raise BadRequestError('Page query parameters must be integers')
+
+            limit = int(args['limit'])
+            offset = int(args['offset'])
+
+            return offset, offset + limit - 1
+
+        return 0, None
+
+    def _parse_cursor(self, query):
+        """
+        Parse the querystring args for cursor pagination.  Returns None when
+        the page is not requested with a cursor.  An empty page[after] asks
+        for the first page and an empty page[before] for the last.
+
+        :param query: Dict of query args
+        """
+        args = {k[5:-1]: v for k, v in query.items() if k.startswith('page[')}
+
+        if set(args.keys()) not in ({'size', 'after'}, {'size', 'before'}):
+            return None
+
+        if not args['size'].isdecimal() or int(args['size']) < 1:
+            raise BadRequestError('Page size must be a positive integer')
+
+        if 'before' in args.keys():
+            return 'before', args['before'], int(args['size'])
+        return 'after', args['after'], int(args['size'])
+
+    def _parse_filter(self, model, query):
+        """
+        Parse the querystring args for filtering into a list of criteria.
+        filter holds an expression, such as (5<score<=10)||published_at!=null,
+        while filter[field] matches a field against a comma separated list of
+        values.
+
+        :param model: The model being filtered
+        :param query: Dict of query args
+        """
+        criteria = []
+
+        for key, value in query.items():
+            if key == 'filter':
+                compile_filter = parse_filter
+                args = (model, value)
+            elif key.startswith('filter[') and key.endswith(']'):
+                compile_filter = parse_field_filter
+                args = (model, key[7:-1], value)
+            else:
+                continue
+
+            cache_key = (model, key, value)
+            compiled = self._filters.get(cache_key)
+            if compiled is None:
+                compiled = compile_filter(*args)
+                while len(self._filters) >= self.filter_cache_size:
+                    try:
+                        self._filters.popitem(last=False)
+                    except KeyError:
+                        break
+                self._filters[cache_key] = compiled
+
+            criterion, field_names = compiled
+            for field_name in field_names:
+                check_permission(model, field_name, Permissions.VIEW)
+            criteria.append(criterion)
+
+        return criteria
+
+    def _parse_sort(self, model, query):
+        """
+        Parse the querystring args for sorting.  Returns a list of
+        (attribute name, attribute, ascending) tuples.
+
+        :param model: The model being sorted
+        :param query: Dict of query args
+        """
+        sorts = []
+
+        for attr in query.get('sort', '').split(','):
+            if attr == '':
+                break
+
+            attr_name, is_asc = [attr[1:], False]\
+                if attr[0] == '-'\
+                else [attr, True]
+
+            if attr_name not in model.__mapper__.all_orm_descriptors.keys()\
+                    or not hasattr(model, attr_name)\
+                    or attr_name in model.__mapper__.relationships.keys():
+                raise NotSortableError(model, attr_name)
+
+            attr = getattr(model, attr_name)
+            if not hasattr(attr, 'asc'):
+                # pragma: no cover
+                raise NotSortableError(model, attr_name)
+
+            check_permission(model, attr_name, Permissions.VIEW)
+
+            sorts.append((attr_name, attr, is_asc))
+
+        return sorts
+
+    def _encode_cursor(self, values):
+        """
+        Encode the sort key values of a row into an opaque cursor.
+
+        :param values: List of values for the sort keys
+        """
+        encoded = []
+        for value in values:
+            if isinstance(value, datetime.datetime):
+                value = {'datetime': value.isoformat()}
+            elif isinstance(value, datetime.date):
+                value = {'date': value.isoformat()}
+            elif isinstance(value, uuid.UUID):
+                value = {'uuid': str(value)}
+            elif isinstance(value, Decimal):
+                value = {'decimal': str(value)}
+            encoded.append(value)
+        token = json.dumps(encoded, separators=(',', ':')).encode('utf-8')
+        return urlsafe_b64encode(token).decode('ascii').rstrip('=')
+
+    def _cursor_value(self, attr, value):
+        """
+        Check that a value decoded from a cursor is a scalar of the type of
+        the column it is compared to.  Raises ValueError if not.
+
+        :param attr: The attribute of the sort key
+        :param value: The decoded value
+        """
+        if value is None:
+            return value
+        if isinstance(value, (list, dict)):
+            raise ValueError(value)
+        try:
+            python_type = attr.property.columns[0].type.python_type
+        except (AttributeError, IndexError, NotImplementedError):
+            return value
+        if isinstance(value, bool) and python_type is not bool:
+            raise ValueError(value)
+        if python_type in (float, Decimal) and isinstance(value, int):
+            return value
+        if not isinstance(value, python_type):
+            raise ValueError(value)
+        return value
+
+    def _decode_cursor(self, cursor, attrs):
+        """
+        Decode a cursor created by _encode_cursor.
+
+        :param cursor: The opaque cursor from the query string
+        :param attrs: Attributes of the sort keys expected in the cursor
+        """
+        try:
+            token = cursor.encode('ascii')
+            token += b'=' * (-len(token) % 4)
+            encoded = json.loads(urlsafe_b64decode(token).decode('utf-8'))
+            if not isinstance(encoded, list) or len(encoded) != len(attrs):
+                raise ValueError(cursor)
+
+            values = []
+            for attr, value in zip(attrs, encoded):
+                if isinstance(value, dict):
+                    (kind, raw), = value.items()
+                    if kind == 'datetime':
+                        value = _parse_datetime(raw)
+                    elif kind == 'date':
+                        value = datetime.datetime.strptime(
+                            raw, '%Y-%m-%d').date()
+                    elif kind == 'uuid':
+                        value = uuid.UUID(raw)
+                    elif kind == 'decimal':
+                        value = Decimal(raw)
+                    else:
+                        raise ValueError(kind)
+                values.append(self._cursor_value(attr, value))
+            return values
+        except (TypeError, ValueError, UnicodeError):
+            raise BadRequestError('Invalid page cursor')
+
+    def _beyond_cursor(self, attr, is_asc, value):
+        """
+        Build the criterion for rows past a cursor value on one sort key, or
+        None if no row can be.  NULLs sort after every value when ascending
+        and before every value when descending.
+
+        :param attr: The attribute of the sort key
+        :param is_asc: Whether the key is walked in ascending order
+        :param value: The value of the key in the cursor
+        """
+        if is_asc:
+            if value is None:
+                return None
+            return or_(attr > value, attr.is_(None))
+        if value is None:
+            return attr.isnot(None)
+        return attr < value
+
+    def _paginate_keyset(self, collection, model, sorts, cursor, query,
+                         context):
+        """
+        Fetch a page of viewable instances relative to a cursor.  Returns the
+        instances and the pagination links.
+
+        Each page is a range scan on the sort keys, with the primary key added
+        as a tie-breaker, so deep pages cost the same as the first one.
+
+        :param collection: The query for the collection
+        :param model: The model of the collection
+        :param sorts: Parsed sorts from _parse_sort
+        :param cursor: Parsed cursor from _parse_cursor
+        :param query: Dict of query args
+        :param context: RequestContext of the request
+        """
+        direction, token, size = cursor
+        mapper = model.__mapper__
+        keys = [(attr_name, attr, is_asc) for attr_name, attr, is_asc in sorts]
+        for column in mapper.primary_key:
+            attr_name = mapper.get_property_by_column(column).key
+            keys.append((attr_name, getattr(model, attr_name), True))
+
+        if direction == 'before':
+            # Walk backwards from the cursor and flip the page afterwards.
+            keys = [(attr_name, attr, not is_asc)
+                    for attr_name, attr, is_asc in keys]
+
+        if token:
+            values = self._decode_cursor(token, [key[1] for key in keys])
+            ranges = []
+            for i, (attr_name, attr, is_asc) in enumerate(keys):
+                ties = [key[1].is_(None) if value is None
+                        else key[1] == value
+                        for key, value in zip(keys[:i], values[:i])]
+                beyond = self._beyond_cursor(attr, is_asc, values[i])
+                if beyond is not None:
+                    ranges.append(and_(*(ties + [beyond])))
+            collection = collection.filter(
+                or_(*ranges) if ranges else false())
+
+        # NULLs go last ascending and first descending, so walking backwards
+        # is the exact reverse of walking forwards.
+        collection = collection.order_by(
+            *[attr.asc().nullslast() if is_asc else attr.desc().nullsfirst()
+              for attr_name, attr, is_asc in keys])
+
+        # One extra instance tells us whether there is another page.
+        instances = self._paginate(collection, model, 0, size, context)
+        has_more = len(instances) > size
+        instances = instances[:size]
+
+        if direction == 'before':
+            instances.reverse()
+
+        def link(instance, page_direction):
+            return self._collection_link(model, query, {
+                'page[size]': str(size),
+                'page[{}]'.format(page_direction): self._encode_cursor(
+                    [getattr(instance, key[0]) for key in keys])
+            })
+
+        if direction == 'before':
+            has_prev, has_next = has_more, bool(token)
+        else:
+            has_prev, has_next = bool(token), has_more
+
+        links = {'prev': None, 'next': None}
+        if instances and has_next:
+            links['next'] = link(instances[-1], 'after')
+        if instances and has_prev:
+            links['prev'] = link(instances[0], 'before')
+
+        return instances, links
+
+    def _collection_link(self, model, query, page):
+        """
+        Build a link to the collection with the same query args but another
+        page.
+
+        :param model: The model of the collection
+        :param query: Dict of query args
+        :param page: Dict of page[...] args for the link
+        """
+        args = {k: v for k, v in query.items() if not k.startswith('page[')}
+        args.update(page)
+        return '{}/{}?{}'.format(self.prefix, model.__jsonapi_type__,
+                                 urlencode(sorted(args.items())))
+
+    def _page_links(self, model, query, start, size, total, has_next):
+        """
+        Build the first, last, prev and next links of a paginated collection
+        in the style of pagination the request used.  last is None when the
+        total is unknown.
+
+        :param model: The model of the collection
+        :param query: Dict of query args
+        :param start: Position of the first instance of the page
+        :param size: Number of instances per page
+        :param total: Total number of instances or None
+        :param has_next: Whether another page follows
+        """
+        step = max(size, 1)
+
+        def link(position):
+            if 'page[number]' in query:
+                page = {'page[number]': str(position // step),
+                        'page[size]': str(size)}
+            else:
+                page = {'page[offset]': str(position),
+                        'page[limit]': str(size)}
+            return self._collection_link(model, query, page)
+
+        if total is None:
+            last = None
+        elif 'page[number]' in query:
+            last = (max(total, 1) - 1) // step * step
+        else:
+            last = max(total - size, 0)
+
+        links = {'first': link(0), 'last': None, 'prev': None, 'next': None}
+        if last is not None:
+            links['last'] = link(last)
+        if start > 0:
+            prev = start - size if last is None else min(start - size, last)
+            links['prev'] = link(max(prev, 0))
+        if has_next:
+            links['next'] = link(start + size)
+        return links
+
+    def _count_collection(self, collection, model):
+        """
+        Count the instances of a collection with the count strategy.  Returns
+        None if the strategy is disabled or if the model has a VIEW test that
+        only the instances themselves can answer.
+
+        :param collection: The filtered query for the collection
+        :param model: The model of the collection
+        """
+        strategy = self.count_strategy
+        if callable(strategy):
+            return strategy(model, collection)
+        if strategy is None or _has_instance_test(model, None,
+                                                  Permissions.VIEW):
+            return None
+
+        collection = collection.order_by(None)
+        if not self.count_cache_ttl:
+            return collection.count()
+
+        compiled = collection.statement.compile()
+        key = (str(compiled),
+               tuple(sorted((k, repr(v)) for k, v in compiled.params.items())))
+        now = time.time()
+        cached = self._counts.get(key)
+        if cached is not None and cached[0] > now:
+            return cached[1]
+
+        total = collection.count()
+        self._counts.pop(key, None)
+        self._counts[key] = (now + self.count_cache_ttl, total)
+        while len(self._counts) > self.count_cache_size:
+            self._counts.popitem(last=False)
+        return total
+
+    def _paginate_counted(self, collection, model, start, end, context):
+        """
+        Fetch a page of viewable instances along with the total.  Returns the
+        instances, the total or None, and whether another page follows.
+
+        :param collection: The ordered query for the collection
+        :param model: The model of the collection
+        :param start: Position of the first instance of the page
+        :param end: Position of the last instance of the page
+        :param context: RequestContext to remember permission tests in
+        """
+        size = end - start + 1
+
+        if self.count_strategy == 'window'\
+                and not _has_instance_test(model, None, Permissions.VIEW):
+            rows = collection.add_columns(func.count().over())\
+                .offset(start).limit(size).all()
+            instances = [row[0] for row in rows]
+            if rows:
+                total = rows[0][-1]
+            else:
+                # A page past the end has no row to carry the count.
+                total = self._count_collection(collection, model)
+        else:
+            total = self._count_collection(collection, model)
+            # Without a total, one extra instance tells if there is more.
+            instances = self._paginate(collection, model, start,
+                                       end if total is not None else end + 1,
+                                       context)
+
+        if total is None:
+            has_next = len(instances) > size
+            instances = instances[:size]
+        else:
+            has_next = end + 1 < total
+        return instances, total, has_next
 
-        return ret
+    def _query_permission_criteria(self, model, permission):
+        """
+        Fetch the criteria of a model's query permission test for use in a
+        query.
 
-    def _parse_page(self, query):
+        :param model: The model being queried
+        :param permission: The permission to check
         """
-        Parse the querystring args for pagination.
+        query_test = get_query_permission_test(model, None, permission)
+        if query_test is None:
+            return []
+        criterion = query_test(model)
+        return [] if criterion is None else [criterion]
 
-        :param query: Dict of query args
+    def _viewable(self, model, instances, context, queried=True):
         """
-        args = {k[5:-1]: v for k, v in query.items() if k.startswith('page[')}
+        Filter a list of instances down to those that can be viewed, calling
+        a batch VIEW test once for the whole list.
+
+        :param model: The model of the instances
+        :param instances: List of instances to test
+        :param context: RequestContext to remember the results in
+        :param queried: Whether the instances have passed any query
+                        permission test already, such as by being loaded
+                        through a query that includes it
+        """
+        test = getattr(model, '__jsonapi_permissions__', {})\
+            .get(None, {})\
+            .get(Permissions.VIEW)
+        batch_test = get_batch_permission_test(model, None, Permissions.VIEW)
+
+        viewable = []
+        with measure('permissions'):
+            if not queried:
+                mask = self._query_permission_mask(model, instances,
+                                                   Permissions.VIEW)
+                for instance, allowed in zip(instances, mask):
+                    if not allowed:
+                        context.remember(instance, None, Permissions.VIEW,
+                                         False)
+                instances = [instance for instance, allowed
+                             in zip(instances, mask) if allowed]
+
+            if batch_test is not None and instances:
+                mask = batch_test(model, instances)
+            else:
+                mask = [True] * len(instances)
 
-        if {'number', 'size'} == set(args.keys()):
-            if not args['number'].isdecimal() or not args['size'].isdecimal():
-                raise BadRequestError('Page query parameters must be integers')
+            for instance, allowed in zip(instances, mask):
+                allowed = bool(allowed) and (test is None or
+                                             bool(test(instance)))
+                context.remember(instance, None, Permissions.VIEW, allowed)
+                if allowed:
+                    viewable.append(instance)
+        return viewable
 
-            number = int(args['number'])
-            size = int(args['size'])
-            start = number * size
+    def _query_permission_mask(self, model, instances, permission):
+        """
+        Tell which instances match the criterion of a model's query
+        permission test, with one IN query per chunk of ids rather than one
+        query per instance.  Instances that aren't in the database yet can't
+        be matched and pass.
+
+        :param model: The model of the instances
+        :param instances: List of instances to test
+        :param permission: The permission to check
+        """
+        query_test = get_query_permission_test(model, None, permission)
+        criterion = None if query_test is None else query_test(model)
+        if criterion is None or not instances:
+            return [True] * len(instances)
+
+        mapper = model.__mapper__
+        if len(mapper.primary_key) != 1:
+            return [_check_query_permission(x, query_test) for x in instances]
+
+        states = [sa_inspect(x) for x in instances]
+        stored = [state for state in states
+                  if state.identity is not None and state.session is not None]
+        found = set()
+        if stored:
+            session = stored[0].session
+            primary_key = getattr(model, mapper.get_property_by_column(
+                mapper.primary_key[0]).key)
+            ids = list(OrderedDict(
+                (state.identity[0], None) for state in stored))
+            query = session.query(primary_key).filter(criterion)
+            size = self.identifier_chunk_size
+            with session.no_autoflush:
+                for start in range(0, len(ids), size):
+                    found.update(row[0] for row in query.filter(
+                        primary_key.in_(ids[start:start + size])))
+        return [state.identity is None or state.session is None
+                or state.identity[0] in found for state in states]
 
-            return start, start + size - 1
+    def _check_viewable(self, instances, context):
+        """
+        Run the VIEW tests of instances of any models together and remember
+        the results, so rendering them doesn't test them one at a time.  Each
+        model's batch test is called once and its query test takes one IN
+        query per chunk of ids.  Instances tested before are skipped.
 
-        if {'limit', 'offset'} == set(args.keys()):
-            if not args['limit'].isdecimal() or not args['offset'].isdecimal():
-                raise BadRequestError('Page query parameters must be integers')
+        :param instances: Instances that are about to be rendered
+        :param context: RequestContext to remember the results in
+        """
+        by_model = OrderedDict()
+        for instance in instances:
+            model = type(instance)
+            if not has_permission_test(model, None, Permissions.VIEW)\
+                    or context.remembers(instance, None, Permissions.VIEW):
+                continue
+            by_model.setdefault(model, OrderedDict())[id(instance)] = instance
+        for model, unique in by_model.items():
+            self._viewable(model, list(unique.values()), context,
+                           queried=False)
 
-            limit = int(args['limit'])
-            offset = int(args['offset'])
+    def _iter_viewable(self, model, collection, context):
+        """
+        Iterate over the viewable instances of a query, testing them in
+        chunks.
 
-            return offset, offset + limit - 1
+        :param model: The model of the collection
+        :param collection: The query for the collection
+        :param context: RequestContext to remember the results in
+        """
+        chunk = []
+        for instance in collection:
+            chunk.append(instance)
+            if len(chunk) == self.page_chunk_size:
+                for viewable in self._viewable(model, chunk, context):
+                    yield viewable
+                chunk = []
+        for viewable in self._viewable(model, chunk, context):
+            yield viewable
+
+    def _paginate(self, collection, model, start, end, context,
+                  stream=False):
+        """
+        Fetch the viewable instances within the page window.
+
+        The window is sent to the database as LIMIT/OFFSET.  If the model has
+        a VIEW permission test, denied rows still shift the window, so rows
+        are fetched in chunks and tested until the page has been filled.
+        Query permission tests should already be part of the collection.
+
+        :param collection: The ordered query for the collection
+        :param model: The model of the collection
+        :param start: Position of the first instance of the page
+        :param end: Position of the last instance of the page or None
+        :param context: RequestContext to remember permission tests in
+        :param stream: Return an iterator over an unpaginated collection
+                       rather than loading it all at once
+        """
+        if end is None and stream:
+            collection = collection.yield_per(self.page_chunk_size)
+
+        if not _has_instance_test(model, None, Permissions.VIEW):
+            if end is not None:
+                collection = collection.offset(start).limit(end - start + 1)
+            return iter(collection) if stream else collection.all()
+
+        if end is None:
+            if stream:
+                return self._iter_viewable(model, collection, context)
+            return self._viewable(model, collection.all(), context)
+
+        chunk_size = max(self.page_chunk_size, end - start + 1)
+        instances = []
+        offset = 0
+        pos = -1
 
-        return 0, None
+        while True:
+            chunk = collection.offset(offset).limit(chunk_size).all()
+            for instance in self._viewable(model, chunk, context):
+                pos += 1
+                if pos >= start:
+                    instances.append(instance)
+                if pos == end:
+                    return instances
+
+            if len(chunk) < chunk_size:
+                return instances
+            offset += chunk_size
 
     def delete_relationship(self, session, data, api_type, obj_id, rel_key):
         """
@@ -577,10 +2174,11 @@ class JSONAPI(object):
                               RelationshipActions.DELETE)
         reverse_side = relationship.back_populates
 
-        for item in data['data']:
-            item = self._fetch_resource(session, item['type'], item['id'],
-                                        Permissions.EDIT)
+        to_remove = self._fetch_resources(
+            session, [(item['type'], item['id']) for item in data['data']],
+            Permissions.EDIT)
 
+        for item in to_remove:
             if reverse_side:
                 reverse_rel = item.__mapper__.relationships[reverse_side]
 
@@ -594,12 +2192,16 @@ class JSONAPI(object):
             remove(resource, item)
 
         session.commit()
+        self._invalidate_cache(type(resource),
+                               relationship.mapper.class_)
         session.refresh(resource)
 
         get = get_rel_desc(resource, relationship.key, RelationshipActions.GET)
 
+        context = RequestContext()
         for item in get(resource):
-            response.data['data'].append(self._render_short_instance(item))
+            response.data['data'].append(
+                self._render_short_instance(item, context))
 
         return response
 
@@ -612,84 +2214,353 @@ class JSONAPI(object):
         :param api_type: Type of the resource
         :param obj_id: ID of the resource
         """
+        context = RequestContext()
         resource = self._fetch_resource(session, api_type, obj_id,
-                                        Permissions.VIEW)
-        self._check_instance_relationships_for_delete(resource)
+                                        Permissions.VIEW, context=context)
+        self._check_instance_relationships_for_delete(session, resource,
+                                                      context)
 
         session.delete(resource)
         session.commit()
+        self._invalidate_cache(type(resource))
 
         response = JSONAPIResponse()
         response.status_code = 204
 
         return response
 
-    def get_collection(self, session, query, api_key):
+    def _render_collection(self, instances, include, fields, context):
         """
-        Fetch a collection of resources of a specified type.
+        Render each instance of a collection in turn, collecting what they
+        include into the context.
+
+        :param instances: The instances to render
+        :param include: Dictionary of relationships to include
+        :param fields: Dictionary of fields to filter
+        :param context: RequestContext to add included resources to
+        """
+        if not include and not self.always_render_linkage:
+            for instance in instances:
+                yield self._render_full_resource(instance, include, fields,
+                                                 context)
+            return
+
+        chunk = []
+        for instance in instances:
+            chunk.append(instance)
+            if len(chunk) == self.page_chunk_size:
+                for built in self._render_chunk(chunk, include, fields,
+                                                context):
+                    yield built
+                chunk = []
+        for built in self._render_chunk(chunk, include, fields, context):
+            yield built
+
+    def _render_chunk(self, instances, include, fields, context):
+        """
+        Render a list of instances, preparing what they include and their
+        linkage together first.
+
+        :param instances: The instances to render
+        :param include: Dictionary of relationships to include
+        :param fields: Dictionary of fields to filter
+        :param context: RequestContext to add included resources to
+        """
+        self._prefetch_tree(instances, include, fields, context)
+        return [self._render_full_resource(instance, include, fields, context)
+                for instance in instances]
+
+    def _iter_included(self, included):
+        """
+        Iterate over included resources once the data has been rendered.
+
+        :param included: Dictionary of included resources
+        """
+        for resource in included.values():
+            yield resource
+
+    def use_cache(self, cache):
+        """
+        Serve GET responses from a ResponseCache.  Cached responses are
+        invalidated by type whenever a session flushes or commits changes to
+        a model, and by the write endpoints.
+
+        If any model has a VIEW permission test, cache_scope has to be set
+        first, as otherwise a response rendered for one caller would be
+        served to every other.
+
+        :param cache: The ResponseCache, or None to stop caching
+        """
+        if cache is not None and self.cache_scope is None:
+            tested = sorted(
+                api_type for api_type, model in self.models.items()
+                if self._has_view_tests(model))
+            if tested:
+                raise ValueError(
+                    'Set cache_scope before caching responses, as {} have '
+                    'VIEW permission tests'.format(', '.join(tested)))
+        listeners = [('after_flush', self._track_flush),
+                     ('after_commit', self._invalidate_commit),
+                     ('after_soft_rollback', self._forget_rollback)]
+        if self.response_cache is None and cache is not None:
+            for name, fn in listeners:
+                event.listen(orm.Session, name, fn)
+        elif self.response_cache is not None and cache is None:
+            for name, fn in listeners:
+                event.remove(orm.Session, name, fn)
+        self.response_cache = cache
+
+    def _has_view_tests(self, model):
+        """
+        Check if a model has a VIEW permission test of any kind, for itself or
+        any of its fields.
+
+        :param model: The model to check
+        """
+        names = ['__jsonapi_permissions__', '__jsonapi_batch_permissions__',
+                 '__jsonapi_query_permissions__']
+        for name in names:
+            for tests in getattr(model, name, {}).values():
+                if Permissions.VIEW in tests:
+                    return True
+        return False
+
+    def _track_flush(self, session, flush_context):
+        """
+        Invalidate the types of the instances in a flush, and remember them to
+        invalidate again once the transaction commits, as responses may have
+        been cached from the old rows in between.
+
+        :param session: The session being flushed
+        :param flush_context: Unused
+        """
+        types = set()
+        for instance in list(session.new) + list(session.dirty)\
+                + list(session.deleted):
+            api_type = getattr(instance, '__jsonapi_type__', None)
+            if self.models.get(api_type) is not None:
+                types.add(api_type)
+        if types:
+            session.info.setdefault((__name__, id(self)), set()).update(types)
+            self.response_cache.invalidate(types)
+
+    def _invalidate_commit(self, session):
+        """
+        Invalidate the types flushed during a transaction that committed.
+
+        :param session: The session that committed
+        """
+        types = session.info.pop((__name__, id(self)), None)
+        if types:
+            self.response_cache.invalidate(types)
+
+    def _forget_rollback(self, session, previous_transaction):
+        """
+        Forget the types flushed during a transaction that rolled back.
+
+        :param session: The session that rolled back
+        :param previous_transaction: Unused
+        """
+        session.info.pop((__name__, id(self)), None)
+
+    def _commit(self, session):
+        """
+        Commit a write, expiring instances according to expire_on_commit.
 
         :param session: SQLAlchemy session
-        :param query: Dict of query args
-        :param api_type: The type of the model
         """
-        model = self._fetch_model(api_key)
-        include = self._parse_include(query.get('include', '').split(','))
-        fields = self._parse_fields(query)
-        included = {}
-        sorts = query.get('sort', '').split(',')
-        order_by = []
+        if self.expire_on_commit is None:
+            session.commit()
+            return
+        if isinstance(session, orm.scoped_session):
+            session = session.registry()
+        expire = session.expire_on_commit
+        session.expire_on_commit = self.expire_on_commit
+        try:
+            session.commit()
+        finally:
+            session.expire_on_commit = expire
 
-        collection = session.query(model)
+    def _render_written(self, resource):
+        """
+        Render the response to a write from the instance in the session,
+        rather than fetching it again.  Expired columns, such as those the
+        database generated, are loaded together on first access.
 
-        for attr in sorts:
-            if attr == '':
-                break
+        :param resource: The instance that was written
+        """
+        context = RequestContext()
+        context.check_permission(resource, None, Permissions.VIEW)
+        response = JSONAPIResponse()
+        response.data['data'] = self._render_full_resource(
+            resource, {}, {}, context)
+        response.data['included'] = list(context.included.values())
+        response.etag = self._version_etag({}, response, context)
+        return response
 
-            attr_name, is_asc = [attr[1:], False]\
-                if attr[0] == '-'\
-                else [attr, True]
+    def _invalidate_cache(self, *models):
+        """
+        Invalidate cached responses rendered from any of the models.
 
-            if attr_name not in model.__mapper__.all_orm_descriptors.keys()\
-                    or not hasattr(model, attr_name)\
-                    or attr_name in model.__mapper__.relationships.keys():
-                return NotSortableError(model, attr_name)
+        :param models: The models that changed
+        """
+        if self.response_cache is not None:
+            self.response_cache.invalidate(
+                set(model.__jsonapi_type__ for model in models))
 
-            attr = getattr(model, attr_name)
-            if not hasattr(attr, 'asc'):
-                # pragma: no cover
-                return NotSortableError(model, attr_name)
+    def _cached_response(self, query, if_none_match, *key):
+        """
+        Look up a cached GET response.  Returns the response or None, and a
+        token to pass to _cache_response, which is None if caching is off.
+        If the ETag of the cached response matches, an empty 304 response is
+        returned without fetching the cached body.
 
-            check_permission(model, attr_name, Permissions.VIEW)
+        :param query: Dict of query args
+        :param if_none_match: Callable telling if an ETag matches or None
+        :param key: Name of the endpoint method and its arguments
+        """
+        cache = self.response_cache
+        if cache is None:
+            return None, None
+        scope = self.cache_scope() if self.cache_scope is not None else None
+        key = key + (scope, tuple(sorted(query.items())))
+        if if_none_match is not None:
+            etag = cache.get_etag(key)
+            if etag is not None and if_none_match(etag):
+                response = JSONAPIResponse()
+                response.status_code = 304
+                response.etag = etag
+                return response, None
+        cached = cache.get(key)
+        if cached is None:
+            return None, (key, cache.begin())
+        response = JSONAPIResponse()
+        response.status_code, response.data, response.etag = cached
+        return response, None
+
+    def _cache_response(self, token, model, response):
+        """
+        Cache a rendered GET response.  It depends on the types of the model
+        and of every rendered resource, and the types they relate to.
+
+        :param token: Token from _cached_response
+        :param model: Model of the endpoint
+        :param response: The JSONAPIResponse
+        """
+        if token is None:
+            return
+        key, started = token
+
+        data = response.data['data']
+        if data is None:
+            data = []
+        elif isinstance(data, dict):
+            data = [data]
+        models = {model}
+        for resource in list(data) + list(response.data.get('included', [])):
+            models.add(self.models.get(resource['type'], model))
+
+        types = set()
+        for rendered_model in models:
+            types.add(rendered_model.__jsonapi_type__)
+            for relationship in rendered_model.__mapper__.relationships:
+                api_type = getattr(relationship.mapper.class_,
+                                   '__jsonapi_type__', None)
+                if api_type is not None:
+                    types.add(api_type)
+
+        self.response_cache.set(
+            key, types, (response.status_code, response.data, response.etag),
+            started)
+
+    def get_collection(self, session, query, api_key, stream=False,
+                       if_none_match=None):
+        """
+        Fetch a collection of resources of a specified type.
 
-            order_by.append(attr.asc() if is_asc else attr.desc())
+        :param session: SQLAlchemy session
+        :param query: Dict of query args
+        :param api_type: The type of the model
+        :param stream: Leave data and included as generators that render
+                       resources as they are consumed, data first
+        :param if_none_match: Callable telling if an ETag matches the
+                              client's, to answer 304 from the cache
+        """
+        model = self._fetch_model(api_key)
+        if stream:
+            cached, token = None, None
+        else:
+            cached, token = self._cached_response(
+                query, if_none_match, 'get_collection', api_key)
+            if cached is not None:
+                return cached
+        include = self._parse_include(query.get('include', '').split(','))
+        fields = self._parse_fields(query)
+        context = RequestContext()
+        if stream:
+            # Streamed responses aren't tagged, so versions aren't kept.
+            context.versions = None
 
-        if len(order_by) > 0:
-            collection = collection.order_by(*order_by)
+        try:
+            sorts = self._parse_sort(model, query)
+        except NotSortableError as e:
+            return e
 
-        pos = -1
-        start, end = self._parse_page(query)
+        options = self._eager_load_options(model, include, fields)
+        options.extend(self._projection_options(
+            model, include, fields, [attr_name for attr_name, _, _ in sorts]))
+        collection = session.query(model).options(*options)\
+            .filter(*self._query_permission_criteria(model, Permissions.VIEW))\
+            .filter(*self._parse_filter(model, query))
 
         response = JSONAPIResponse()
-        response.data['data'] = []
+        cursor = self._parse_cursor(query)
 
-        for instance in collection:
-            try:
-                check_permission(instance, None, Permissions.VIEW)
-            except PermissionDeniedError:
-                continue
+        if cursor is None:
+            order_by = [attr.asc() if is_asc else attr.desc()
+                        for attr_name, attr, is_asc in sorts]
+            start, end = self._parse_page(query)
 
-            pos += 1
-            if end is not None and (pos < start or pos > end):
-                continue
+            if end is not None:
+                # Paging needs a stable order, so the primary key breaks ties.
+                order_by.extend(model.__mapper__.primary_key)
 
-            built = self._render_full_resource(instance, include, fields)
-            included.update(built.pop('included'))
-            response.data['data'].append(built)
+            if len(order_by) > 0:
+                collection = collection.order_by(*order_by)
 
-        response.data['included'] = list(included.values())
+            if end is None:
+                instances = self._paginate(collection, model, start, end,
+                                           context, stream)
+            else:
+                instances, total, has_next = self._paginate_counted(
+                    collection, model, start, end, context)
+                response.data['links'] = self._page_links(
+                    model, query, start, end - start + 1, total, has_next)
+                if total is not None:
+                    response.data['meta']['total'] = total
+        else:
+            if self.count_cursor_pages:
+                total = self._count_collection(collection, model)
+                if total is not None:
+                    response.data['meta']['total'] = total
+            instances, response.data['links'] = self._paginate_keyset(
+                collection, model, sorts, cursor, query, context)
+
+        rendered = self._render_collection(instances, include, fields,
+                                           context)
+
+        if stream:
+            response.data['data'] = rendered
+            response.data['included'] = self._iter_included(context.included)
+        else:
+            response.data['data'] = list(rendered)
+            response.data['included'] = list(context.included.values())
+            response.etag = self._version_etag(query, response, context)
+            self._cache_response(token, model, response)
         return response
 
-    def get_resource(self, session, query, api_type, obj_id):
+    def get_resource(self, session, query, api_type, obj_id,
+                     if_none_match=None):
         """
         Fetch a resource.
 
@@ -697,22 +2568,36 @@ class JSONAPI(object):
         :param query: Dict of query args
         :param api_type: Type of the resource
         :param obj_id: ID of the resource
+        :param if_none_match: Callable telling if an ETag matches the
+                              client's, to answer 304 from the cache
         """
-        resource = self._fetch_resource(session, api_type, obj_id,
-                                        Permissions.VIEW)
+        model = self._fetch_model(api_type)
+        cached, token = self._cached_response(
+            query, if_none_match, 'get_resource', api_type, obj_id)
+        if cached is not None:
+            return cached
         include = self._parse_include(query.get('include', '').split(','))
         fields = self._parse_fields(query)
+        options = self._eager_load_options(model, include, fields)
+        options.extend(self._projection_options(model, include, fields))
+        context = RequestContext()
+        resource = self._fetch_resource(session, api_type, obj_id,
+                                        Permissions.VIEW, options, context)
+        if include or self.always_render_linkage:
+            self._prefetch_tree([resource], include, fields, context)
 
         response = JSONAPIResponse()
 
-        built = self._render_full_resource(resource, include, fields)
-
-        response.data['included'] = list(built.pop('included').values())
-        response.data['data'] = built
+        response.data['data'] = self._render_full_resource(
+            resource, include, fields, context)
+        response.data['included'] = list(context.included.values())
+        response.etag = self._version_etag(query, response, context)
+        self._cache_response(token, model, response)
 
         return response
 
-    def get_related(self, session, query, api_type, obj_id, rel_key):
+    def get_related(self, session, query, api_type, obj_id, rel_key,
+                    if_none_match=None):
         """
         Fetch a collection of related resources.
 
@@ -721,41 +2606,71 @@ class JSONAPI(object):
         :param api_type: Type of the resource
         :param obj_id: ID of the resource
         :param rel_key: Key of the relationship to fetch
+        :param if_none_match: Callable telling if an ETag matches the
+                              client's, to answer 304 from the cache
         """
+        cached, token = self._cached_response(
+            query, if_none_match, 'get_related', api_type, obj_id, rel_key)
+        if cached is not None:
+            return cached
+        context = RequestContext()
         resource = self._fetch_resource(session, api_type, obj_id,
-                                        Permissions.VIEW)
+                                        Permissions.VIEW, context=context)
         if rel_key not in resource.__jsonapi_map_to_py__.keys():
             raise RelationshipNotFoundError(resource, resource, rel_key)
         py_key = resource.__jsonapi_map_to_py__[rel_key]
         relationship = self._get_relationship(resource, py_key,
                                               Permissions.VIEW)
+        fields = self._parse_fields(query)
         response = JSONAPIResponse()
 
-        related = get_rel_desc(resource, relationship.key,
-                               RelationshipActions.GET)(resource)
+        getter = get_rel_desc(resource, relationship.key,
+                              RelationshipActions.GET)
 
         if relationship.direction == MANYTOONE:
+            related = getter(resource)
             try:
                 if related is None:
                     response.data['data'] = None
                 else:
-                    response.data['data'] = self._render_full_resource(related,
-                                                                       {}, {})
+                    response.data['data'] = self._render_full_resource(
+                        related, {}, fields, context)
             except PermissionDeniedError:
                 response.data['data'] = None
         else:
             response.data['data'] = []
 
+            related_model = relationship.mapper.class_
+            projection = self._projection_options(related_model, {}, fields)
+            has_getter = RelationshipActions.GET in\
+                resource.__jsonapi_rel_desc__.get(relationship.key, {})
+            if not projection or has_getter:
+                related = getter(resource)
+            elif relationship.lazy == 'dynamic':
+                related = getter(resource).options(*projection)
+            else:
+                related = session.query(related_model)\
+                    .options(*projection)\
+                    .with_parent(resource, relationship.key)
+                if relationship.order_by:
+                    related = related.order_by(*relationship.order_by)
+            if self.always_render_linkage:
+                related = list(related)
+                self._prefetch_by_model(related, {}, fields, context)
+
             for item in related:
                 try:
                     response.data['data'].append(
-                        self._render_full_resource(item, {}, {}))
+                        self._render_full_resource(item, {}, fields, context))
                 except PermissionDeniedError:
                     continue
 
+        response.etag = self._version_etag(query, response, context)
+        self._cache_response(token, type(resource), response)
         return response
 
-    def get_relationship(self, session, query, api_type, obj_id, rel_key):
+    def get_relationship(self, session, query, api_type, obj_id, rel_key,
+                         if_none_match=None):
         """
         Fetch a collection of related resource types and ids.
 
@@ -764,9 +2679,17 @@ class JSONAPI(object):
         :param api_type: Type of the resource
         :param obj_id: ID of the resource
         :param rel_key: Key of the relationship to fetch
+        :param if_none_match: Callable telling if an ETag matches the
+                              client's, to answer 304 from the cache
         """
+        cached, token = self._cached_response(
+            query, if_none_match, 'get_relationship', api_type, obj_id,
+            rel_key)
+        if cached is not None:
+            return cached
+        context = RequestContext()
         resource = self._fetch_resource(session, api_type, obj_id,
-                                        Permissions.VIEW)
+                                        Permissions.VIEW, context=context)
         if rel_key not in resource.__jsonapi_map_to_py__.keys():
             raise RelationshipNotFoundError(resource, resource, rel_key)
         py_key = resource.__jsonapi_map_to_py__[rel_key]
@@ -774,6 +2697,13 @@ class JSONAPI(object):
                                               Permissions.VIEW)
         response = JSONAPIResponse()
 
+        rel = self._relationship_plan(type(resource), relationship.key)
+        if rel.fast_linkage:
+            response.data['data'] = self._render_linkage(resource, rel, {},
+                                                         context)
+            self._cache_response(token, type(resource), response)
+            return response
+
         related = get_rel_desc(resource, relationship.key,
                                RelationshipActions.GET)(resource)
 
@@ -783,7 +2713,7 @@ class JSONAPI(object):
             else:
                 try:
                     response.data['data'] = self._render_short_instance(
-                        related)
+                        related, context)
                 except PermissionDeniedError:
                     response.data['data'] = None
         else:
@@ -791,34 +2721,25 @@ class JSONAPI(object):
             for item in related:
                 try:
                     response.data['data'].append(
-                        self._render_short_instance(item))
+                        self._render_short_instance(item, context))
                 except PermissionDeniedError:
                     continue
 
+        self._cache_response(token, type(resource), response)
         return response
 
-    def patch_relationship(self, session, json_data, api_type, obj_id,
-                           rel_key):
+    def _apply_relationship(self, session, resource, relationship,
+                            json_data):
         """
-        Replacement of relationship values.
+        Replace the members of a relationship with those in a relationship
+        payload, checking permissions on everything that comes and goes.
+        Nothing is committed or rendered.
 
         :param session: SQLAlchemy session
-        :param json_data: Request JSON Data
-        :param api_type: Type of the resource
-        :param obj_id: ID of the resource
-        :param rel_key: Key of the relationship to fetch
+        :param resource: The instance owning the relationship
+        :param relationship: The relationship to replace
+        :param json_data: Relationship payload with a data key
         """
-        model = self._fetch_model(api_type)
-        resource = self._fetch_resource(session, api_type, obj_id,
-                                        Permissions.EDIT)
-        if rel_key not in resource.__jsonapi_map_to_py__.keys():
-            raise RelationshipNotFoundError(resource, resource, rel_key)
-        py_key = resource.__jsonapi_map_to_py__[rel_key]
-        relationship = self._get_relationship(resource, py_key,
-                                              Permissions.EDIT)
-        self._check_json_data(json_data)
-
-        session.add(resource)
         remote_side = relationship.back_populates
         try:
             if relationship.direction == MANYTOONE:
@@ -845,24 +2766,48 @@ class JSONAPI(object):
                 if not isinstance(json_data['data'], list):
                     raise ValidationError('Provided data must be an array.')
 
-                related = getattr(resource, relationship.key)
-
                 remover = get_rel_desc(resource, relationship.key,
                                        RelationshipActions.DELETE)
                 appender = get_rel_desc(resource, relationship.key,
                                         RelationshipActions.APPEND)
-                for item in related:
-                    check_permission(item, None, Permissions.EDIT)
+                descriptors = resource.__jsonapi_rel_desc__.get(
+                    relationship.key, {})
+                bulk = self.bulk_relationship_writes\
+                    and RelationshipActions.DELETE not in descriptors\
+                    and RelationshipActions.APPEND not in descriptors\
+                    and not relationship.cascade.delete_orphan
+
+                # Only the members that come or go are loaded.  Without bulk
+                # writes, the collection is loaded to change it.
+                related_type = relationship.mapper.class_.__jsonapi_type__
+                current = OrderedDict(
+                    (str(x), x) for x in self._related_ids(
+                        session, resource, relationship))
+                requested = OrderedDict(
+                    ((item['type'], str(item['id'])),
+                     (item['type'], item['id']))
+                    for item in json_data['data'])
+                to_remove = [(related_type, obj_id)
+                             for key, obj_id in current.items()
+                             if (related_type, key) not in requested]
+                to_add = [identifier for key, identifier in requested.items()
+                          if key[0] != related_type or key[1] not in current]
+
+                to_unrelate_all = self._fetch_resources(session, to_remove,
+                                                        Permissions.EDIT)
+                for item in to_unrelate_all:
                     remote = item.__mapper__.relationships[remote_side]
                     if remote.direction == MANYTOONE:
                         check_permission(item, remote_side, Permissions.EDIT)
                     else:
                         check_permission(item, remote_side, Permissions.DELETE)
-                    remover(resource, item)
+                    if not bulk:
+                        remover(resource, item)
 
-                for item in json_data['data']:
-                    to_relate = self._fetch_resource(
-                        session, item['type'], item['id'], Permissions.EDIT)
+                to_relate_all = self._fetch_resources(session, to_add,
+                                                      Permissions.EDIT)
+
+                for to_relate in to_relate_all:
                     remote = to_relate.__mapper__.relationships[remote_side]
 
                     if remote.direction == MANYTOONE:
@@ -871,11 +2816,43 @@ class JSONAPI(object):
                     else:
                         check_permission(to_relate, remote_side,
                                          Permissions.CREATE)
-                    appender(resource, to_relate)
-            session.commit()
+                    if not bulk:
+                        appender(resource, to_relate)
+
+                if bulk:
+                    self._bulk_remove(session, resource, relationship,
+                                      to_unrelate_all)
+                    self._bulk_append(session, resource, relationship,
+                                      to_relate_all)
         except KeyError:
             raise ValidationError('Incompatible Type')
 
+    def patch_relationship(self, session, json_data, api_type, obj_id,
+                           rel_key):
+        """
+        Replacement of relationship values.
+
+        :param session: SQLAlchemy session
+        :param json_data: Request JSON Data
+        :param api_type: Type of the resource
+        :param obj_id: ID of the resource
+        :param rel_key: Key of the relationship to fetch
+        """
+        model = self._fetch_model(api_type)
+        resource = self._fetch_resource(session, api_type, obj_id,
+                                        Permissions.EDIT)
+        if rel_key not in resource.__jsonapi_map_to_py__.keys():
+            raise RelationshipNotFoundError(resource, resource, rel_key)
+        py_key = resource.__jsonapi_map_to_py__[rel_key]
+        relationship = self._get_relationship(resource, py_key,
+                                              Permissions.EDIT)
+        self._check_json_data(json_data)
+
+        session.add(resource)
+        self._apply_relationship(session, resource, relationship, json_data)
+        session.commit()
+        self._invalidate_cache(type(resource), relationship.mapper.class_)
+
         return self.get_relationship(session, {}, model.__jsonapi_type__,
                                      resource.id, rel_key)
 
@@ -916,36 +2893,45 @@ class JSONAPI(object):
                     model.__jsonapi_type__, resource.id))
 
         attrs_to_ignore = {'__mapper__', 'id'}
+        relationships = resource.__mapper__.relationships
+        for key, relationship in relationships.items():
+            attrs_to_ignore |= set(relationship.local_columns) | {key}
 
-        session.add(resource)
-
-        try:
-            for key, relationship in resource.__mapper__.relationships.items():
-                api_key = resource.__jsonapi_map_to_api__[key]
-                attrs_to_ignore |= set(relationship.local_columns) | {key}
+        data_keys = set(map((
+            lambda x: resource.__jsonapi_map_to_py__.get(x, None)),
+            json_data['data']['attributes'].keys()))
+        model_keys = set(orm_desc_keys) - attrs_to_ignore
 
-                if api_key not in json_data['data']['relationships'].keys():
-                    continue
+        if not data_keys <= model_keys:
+            raise BadRequestError(
+                '{} not attributes for {}.{}'.format(
+                    ', '.join(list(data_keys - model_keys)),
+                    model.__jsonapi_type__, resource.id))
 
-                self.patch_relationship(
-                    session, json_data['data']['relationships'][api_key],
-                    model.__jsonapi_type__, resource.id, api_key)
+        to_patch = []
+        for api_key, rel_data in json_data['data']['relationships'].items():
+            relationship = self._get_relationship(
+                resource, resource.__jsonapi_map_to_py__[api_key],
+                Permissions.EDIT)
+            self._check_json_data(rel_data)
+            to_patch.append((relationship, rel_data))
 
-            data_keys = set(map((
-                lambda x: resource.__jsonapi_map_to_py__.get(x, None)),
-                json_data['data']['attributes'].keys()))
-            model_keys = set(orm_desc_keys) - attrs_to_ignore
+        session.add(resource)
 
-            if not data_keys <= model_keys:
-                raise BadRequestError(
-                    '{} not attributes for {}.{}'.format(
-                        ', '.join(list(data_keys - model_keys)),
-                        model.__jsonapi_type__, resource.id))
+        try:
+            # Everything is applied before one flush and commit at the end.
+            with session.no_autoflush:
+                for relationship, rel_data in to_patch:
+                    self._apply_relationship(session, resource, relationship,
+                                             rel_data)
 
-            for key in data_keys & model_keys:
-                setter = get_attr_desc(resource, key, AttributeActions.SET)
-                setter(resource, json_data['data']['attributes'][resource.__jsonapi_map_to_api__[key]])  # NOQA
-            session.commit()
+                for key in data_keys:
+                    setter = get_attr_desc(resource, key,
+                                           AttributeActions.SET)
+                    setter(resource, json_data['data']['attributes'][resource.__jsonapi_map_to_api__[key]])  # NOQA
+            self._commit(session)
+            self._invalidate_cache(
+                model, *[rel.mapper.class_ for rel, _ in to_patch])
         except IntegrityError as e:
             session.rollback()
             raise ValidationError(str(e.orig))
@@ -956,8 +2942,7 @@ class JSONAPI(object):
         except TypeError as e:
             session.rollback()
             raise ValidationError('Incompatible data type')
-        return self.get_resource(
-            session, {}, model.__jsonapi_type__, resource.id)
+        return self._render_written(resource)
 
     def post_collection(self, session, data, api_type):
         """
@@ -999,6 +2984,8 @@ class JSONAPI(object):
         attrs_to_ignore = {'__mapper__', 'id'}
 
         setters = []
+        pending = []
+        identifiers = []
 
         try:
             if 'id' in data['data'].keys():
@@ -1031,17 +3018,8 @@ class JSONAPI(object):
                         if not {'type', 'id'} == set(data_rel.keys()):
                             raise BadRequestError(
                                 '{} must have type and id keys'.format(key))
-                        to_relate = self._fetch_resource(
-                            session, data_rel['type'], data_rel['id'],
-                            Permissions.EDIT)
-                        rem = to_relate.__mapper__.relationships[remote_side]
-                        if rem.direction == MANYTOONE:
-                            check_permission(to_relate, remote_side,
-                                             Permissions.EDIT)
-                        else:
-                            check_permission(to_relate, remote_side,
-                                             Permissions.CREATE)
-                        setters.append([setter, to_relate])
+                        pending.append((setter, remote_side))
+                        identifiers.append((data_rel['type'], data_rel['id']))
                 else:
                     setter = get_rel_desc(resource, key,
                                           RelationshipActions.APPEND)
@@ -1052,18 +3030,20 @@ class JSONAPI(object):
                         if 'type' not in item.keys() or 'id' not in item.keys():
                             raise BadRequestError(
                                 '{} must have type and id keys'.format(key))
-                        # pragma: no cover
-                        to_relate = self._fetch_resource(session, item['type'],
-                                                         item['id'],
-                                                         Permissions.EDIT)
-                        rem = to_relate.__mapper__.relationships[remote_side]
-                        if rem.direction == MANYTOONE:
-                            check_permission(to_relate, remote_side,
-                                             Permissions.EDIT)
-                        else:
-                            check_permission(to_relate, remote_side,
-                                             Permissions.CREATE)
-                        setters.append([setter, to_relate])
+                        pending.append((setter, remote_side))
+                        identifiers.append((item['type'], item['id']))
+
+            to_relate_all = self._fetch_resources(session, identifiers,
+                                                  Permissions.EDIT)
+            for (setter, remote_side), to_relate in zip(pending,
+                                                        to_relate_all):
+                rem = to_relate.__mapper__.relationships[remote_side]
+                if rem.direction == MANYTOONE:
+                    check_permission(to_relate, remote_side, Permissions.EDIT)
+                else:
+                    check_permission(to_relate, remote_side,
+                                     Permissions.CREATE)
+                setters.append([setter, to_relate])
 
             data_keys = set(map((
                 lambda x: resource.__jsonapi_map_to_py__.get(x, None)),
@@ -1086,7 +3066,8 @@ class JSONAPI(object):
                     setter(resource, data['data']['attributes'][api_key])
 
                 session.add(resource)
-                session.commit()
+                self._commit(session)
+                self._invalidate_cache(type(resource))
 
         except IntegrityError as e:
             session.rollback()
@@ -1098,12 +3079,141 @@ class JSONAPI(object):
         except TypeError as e:
             session.rollback()
             raise ValidationError('Incompatible data type')
-        session.refresh(resource)
-        response = self.get_resource(
-            session, {}, model.__jsonapi_type__, resource.id)
+        response = self._render_written(resource)
         response.status_code = 201
         return response
 
+    def _not_yet_related(self, session, resource, relationship, instances):
+        """
+        Filter out the instances that are already in a to-many relationship,
+        along with any repeats, without loading the relationship.
+
+        :param session: SQLAlchemy session
+        :param resource: The resource that owns the relationship
+        :param relationship: The to-many relationship
+        :param instances: Instances about to be appended
+        """
+        unique = list(OrderedDict((id(x), x) for x in instances).values())
+        related_mapper = relationship.mapper
+        if not unique or len(related_mapper.primary_key) != 1:
+            return unique
+
+        ids = [related_mapper.primary_key_from_instance(x)[0] for x in unique]
+        existing = set(self._related_ids(session, resource, relationship, ids))
+        return [x for x, x_id in zip(unique, ids) if x_id not in existing]
+
+    def _related_ids(self, session, resource, relationship, ids=None):
+        """
+        Fetch the ids of the members of a to-many relationship without
+        loading the members themselves.
+
+        :param session: SQLAlchemy session
+        :param resource: The resource that owns the relationship
+        :param relationship: The to-many relationship
+        :param ids: Only look for these ids, or None for all of them
+        """
+        related_mapper = relationship.mapper
+        primary_key = getattr(related_mapper.class_,
+                              related_mapper.get_property_by_column(
+                                  related_mapper.primary_key[0]).key)
+        query = session.query(primary_key)\
+            .with_parent(resource, relationship.key)
+        if ids is None:
+            if relationship.order_by:
+                query = query.order_by(*relationship.order_by)
+            return [row[0] for row in query]
+
+        found = []
+        size = self.identifier_chunk_size
+        for start in range(0, len(ids), size):
+            found.extend(row[0] for row in query.filter(
+                primary_key.in_(ids[start:start + size])))
+        return found
+
+    def _bulk_append(self, session, resource, relationship, instances):
+        """
+        Append instances to a to-many relationship by inserting association
+        rows in one batch, or by setting the foreign keys on the instances,
+        so the collection is never loaded.
+
+        :param session: SQLAlchemy session
+        :param resource: The resource that owns the relationship
+        :param relationship: The to-many relationship
+        :param instances: Instances to append
+        """
+        if not instances:
+            return
+
+        def column_value(instance, column):
+            prop = instance.__mapper__.get_property_by_column(column)
+            return getattr(instance, prop.key)
+
+        remote_side = relationship.back_populates
+        if relationship.secondary is not None:
+            session.flush()
+            rows = []
+            for instance in instances:
+                row = {}
+                for local, remote in relationship.synchronize_pairs:
+                    row[remote.key] = column_value(resource, local)
+                for local, remote in relationship.secondary_synchronize_pairs:
+                    row[remote.key] = column_value(instance, local)
+                rows.append(row)
+            session.execute(relationship.secondary.insert(), rows)
+        else:
+            for instance in instances:
+                for local, remote in relationship.synchronize_pairs:
+                    prop = instance.__mapper__.get_property_by_column(remote)
+                    setattr(instance, prop.key,
+                            column_value(resource, local))
+
+        session.expire(resource, [relationship.key])
+        if remote_side:
+            for instance in instances:
+                session.expire(instance, [remote_side])
+
+    def _bulk_remove(self, session, resource, relationship, instances):
+        """
+        Remove instances from a to-many relationship by deleting their
+        association rows, or by clearing the foreign keys on the instances,
+        so the collection is never loaded.
+
+        :param session: SQLAlchemy session
+        :param resource: The resource that owns the relationship
+        :param relationship: The to-many relationship
+        :param instances: Instances to remove
+        """
+        if not instances:
+            return
+
+        def column_value(instance, column):
+            prop = instance.__mapper__.get_property_by_column(column)
+            return getattr(instance, prop.key)
+
+        remote_side = relationship.back_populates
+        if relationship.secondary is not None:
+            session.flush()
+            owner = [remote == column_value(resource, local)
+                     for local, remote in relationship.synchronize_pairs]
+            rows = [and_(*[remote == column_value(instance, local)
+                           for local, remote
+                           in relationship.secondary_synchronize_pairs])
+                    for instance in instances]
+            size = self.identifier_chunk_size
+            for start in range(0, len(rows), size):
+                session.execute(relationship.secondary.delete().where(
+                    and_(or_(*rows[start:start + size]), *owner)))
+        else:
+            for instance in instances:
+                for local, remote in relationship.synchronize_pairs:
+                    prop = instance.__mapper__.get_property_by_column(remote)
+                    setattr(instance, prop.key, None)
+
+        session.expire(resource, [relationship.key])
+        if remote_side:
+            for instance in instances:
+                session.expire(instance, [remote_side])
+
     def post_relationship(self, session, json_data, api_type, obj_id, rel_key):
         """
         Append to a relationship.
@@ -1131,37 +3241,46 @@ class JSONAPI(object):
         remote_side = relationship.back_populates
 
         try:
-            for item in json_data['data']:
-                setter = get_rel_desc(resource, relationship.key,
-                                      RelationshipActions.APPEND)
+            setter = get_rel_desc(resource, relationship.key,
+                                  RelationshipActions.APPEND)
 
-                if not isinstance(json_data['data'], list):
+            for item in json_data['data']:
+                if {'type', 'id'} != set(item.keys()):
                     raise BadRequestError(
-                        '{} must be an array'.format(relationship.key))
-
-                for item in json_data['data']:
-                    if {'type', 'id'} != set(item.keys()):
-                        raise BadRequestError(
-                            '{} must have type and id keys'
-                            .format(relationship.key))
-
-                    to_relate = self._fetch_resource(
-                        session, item['type'], item['id'], Permissions.EDIT)
+                        '{} must have type and id keys'
+                        .format(relationship.key))
 
-                    rem = to_relate.__mapper__.relationships[remote_side]
+            to_relate_all = self._fetch_resources(
+                session,
+                [(item['type'], item['id']) for item in json_data['data']],
+                Permissions.EDIT)
+            to_relate_all = self._not_yet_related(session, resource,
+                                                  relationship, to_relate_all)
 
-                    if rem.direction == MANYTOONE:
-                        check_permission(to_relate, remote_side,
-                                         Permissions.EDIT)
+            for to_relate in to_relate_all:
+                rem = to_relate.__mapper__.relationships[remote_side]
 
-                    else:
-                        check_permission(to_relate, remote_side,
-                                         Permissions.CREATE)
+                if rem.direction == MANYTOONE:
+                    check_permission(to_relate, remote_side,
+                                     Permissions.EDIT)
 
+                else:
+                    check_permission(to_relate, remote_side,
+                                     Permissions.CREATE)
+
+            has_appender = RelationshipActions.APPEND in\
+                resource.__jsonapi_rel_desc__.get(relationship.key, {})
+            if self.bulk_relationship_writes and not has_appender:
+                self._bulk_append(session, resource, relationship,
+                                  to_relate_all)
+            else:
+                for to_relate in to_relate_all:
                     setter(resource, to_relate)
 
             session.add(resource)
             session.commit()
+            self._invalidate_cache(type(resource),
+                                   relationship.mapper.class_)
 
         except KeyError:
             raise ValidationError('Incompatible type provided')
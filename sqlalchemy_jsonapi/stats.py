@@ -0,0 +1,247 @@
+"""
+SQLAlchemy-JSONAPI
+Request Statistics
+Colton J. Provias
+MIT License
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from sqlalchemy import event, orm
+from sqlalchemy.engine import Engine
+
+try:
+    timer = time.perf_counter
+except AttributeError:
+    timer = time.time
+
+_local = threading.local()
+_listening = []
+
+
+def current_stats():
+    """ Fetch the RequestStats running in this thread, or None. """
+    return getattr(_local, 'stats', None)
+
+
+class RequestStats(object):
+    """
+    Timings and counts for a single request.  Time is split into phases by
+    name.  A phase started within another pauses the outer one, so every
+    moment is counted once, in the innermost phase.  Statements run while
+    rendering are counted as sql, not render.
+    """
+
+    def __init__(self):
+        """ Start with nothing counted. """
+        #: Seconds spent in each phase, in the order they were first entered
+        self.phases = OrderedDict()
+
+        #: Seconds the stats were running
+        self.total = 0.0
+
+        #: SQL statements executed
+        self.statements = 0
+
+        #: Instances loaded from rows by the ORM
+        self.rows = 0
+
+        #: Resources in included
+        self.included = 0
+
+        #: Bytes of the encoded body
+        self.bytes = 0
+
+        self._stack = []
+        self._mark = None
+        self._resumed = None
+        self._previous = None
+
+    def start(self):
+        """
+        Make these the stats of this thread and start the clock.  Stats can
+        be stopped and started again, such as around each chunk of a streamed
+        response.
+        """
+        if self._mark is not None:
+            return
+        self._previous = current_stats()
+        _local.stats = self
+        self._mark = timer()
+        self._resumed = self._mark
+
+    def stop(self):
+        """ Stop the clock and give the thread back to the previous stats. """
+        if self._mark is None:
+            return
+        now = timer()
+        self._charge(now)
+        self.total += now - self._resumed
+        self._mark = None
+        _local.stats = self._previous
+        self._previous = None
+
+    def _charge(self, now):
+        """
+        Add the time since the last mark to the innermost phase.
+
+        :param now: The current time
+        """
+        if self._stack:
+            name = self._stack[-1]
+            self.phases[name] = self.phases.get(name, 0.0) + now - self._mark
+        self._mark = now
+
+    def enter(self, name):
+        """
+        Start a phase, pausing the one it is within.
+
+        :param name: Name of the phase
+        """
+        self._charge(timer())
+        self._stack.append(name)
+
+    def exit(self, name):
+        """
+        End a phase, resuming the one it was within.
+
+        :param name: Name of the phase
+        """
+        if self._stack and self._stack[-1] == name:
+            self._charge(timer())
+            self._stack.pop()
+
+    def server_timing(self):
+        """ Format the timings as the value of a Server-Timing header. """
+        metrics = []
+        for name, seconds in self.phases.items():
+            metric = '{};dur={:.3f}'.format(name, seconds * 1000)
+            if name == 'sql':
+                metric += ';desc="{} statements"'.format(self.statements)
+            metrics.append(metric)
+        metrics.append('total;dur={:.3f}'.format(self.total * 1000))
+        return ', '.join(metrics)
+
+    def as_dict(self):
+        """ The timings in milliseconds along with the counts. """
+        return OrderedDict([
+            ('total_ms', round(self.total * 1000, 3)),
+            ('phases_ms', OrderedDict(
+                (name, round(seconds * 1000, 3))
+                for name, seconds in self.phases.items())),
+            ('statements', self.statements),
+            ('rows', self.rows),
+            ('included', self.included),
+            ('bytes', self.bytes)
+        ])
+
+
+class _Phase(object):
+    """ Context manager timing a phase of running stats. """
+
+    __slots__ = ('stats', 'name')
+
+    def __init__(self, stats, name):
+        self.stats = stats
+        self.name = name
+
+    def __enter__(self):
+        self.stats.enter(self.name)
+
+    def __exit__(self, *exc_info):
+        self.stats.exit(self.name)
+
+
+class _NoPhase(object):
+    """ Context manager that does nothing, for when no stats are running. """
+
+    def __enter__(self):
+        pass
+
+    def __exit__(self, *exc_info):
+        pass
+
+
+_no_phase = _NoPhase()
+
+
+def measure(name):
+    """
+    Time a block as a phase of the stats running in this thread, if any.
+
+    :param name: Name of the phase
+    """
+    stats = getattr(_local, 'stats', None)
+    if stats is None:
+        return _no_phase
+    return _Phase(stats, name)
+
+
+def timed(name):
+    """
+    Time every call to a function as a phase of the stats running in the
+    thread, if any.
+
+    :param name: Name of the phase
+    """
+
+    def wrapper(fn):
+        @wraps(fn)
+        def wrapped(*args, **kwargs):
+            stats = getattr(_local, 'stats', None)
+            if stats is None:
+                return fn(*args, **kwargs)
+            stats.enter(name)
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                stats.exit(name)
+
+        return wrapped
+
+    return wrapper
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context,
+                           executemany):
+    stats = getattr(_local, 'stats', None)
+    if stats is not None:
+        stats.statements += 1
+        stats.enter('sql')
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context,
+                          executemany):
+    stats = getattr(_local, 'stats', None)
+    if stats is not None:
+        stats.exit('sql')
+
+
+def _handle_error(exception_context):
+    stats = getattr(_local, 'stats', None)
+    if stats is not None:
+        stats.exit('sql')
+
+
+def _load(target, context):
+    stats = getattr(_local, 'stats', None)
+    if stats is not None:
+        stats.rows += 1
+
+
+def listen():
+    """
+    Listen to every engine and mapper for statements and loaded rows.  The
+    listeners only count for threads with stats running.  Calling this again
+    does nothing.
+    """
+    if _listening:
+        return
+    event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+    event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+    event.listen(Engine, 'handle_error', _handle_error)
+    event.listen(orm.Mapper, 'load', _load)
+    _listening.append(True)
@@ -152,6 +152,9 @@ class BlogComment(Timestamp, db.Model):
 
     __tablename__ = 'comments'
 
+    #: Timestamp keeps updated current, so it can version ETags.
+    __jsonapi_version__ = 'updated'
+
     id = Column(UUIDType, default=uuid4, primary_key=True)
     post_id = Column(UUIDType, ForeignKey('posts.id'))
     author_id = Column(UUIDType, ForeignKey('users.id'), nullable=False)
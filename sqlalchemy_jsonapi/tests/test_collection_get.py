@@ -1,5 +1,12 @@
+from inspect import isgenerator
+
+from sqlalchemy import event
+
+from app import api
+from sqlalchemy_jsonapi import Endpoint, Method
 from sqlalchemy_jsonapi.errors import (
     BadRequestError, NotSortableError)
+from conftest import fake
 
 
 def test_200_with_no_querystring(bunch_of_posts, client):
@@ -109,3 +116,151 @@ def test_200_when_pagination_is_out_of_range(bunch_of_posts, client):
 def test_400_when_provided_crap_data_for_pagination(bunch_of_posts, client):
     client.get('/api/blog-posts/?page[offset]=5&page[limit]=crap').validate(
         400, BadRequestError)
+
+
+def test_200_paginated_response_skips_hidden_resources(bunch_of_posts,
+                                                       client):
+    everything = client.get('/api/blog-posts/?sort=title').validate(200)
+    expected = [x['id'] for x in everything.json_data['data']][5:10]
+    response = client.get(
+        '/api/blog-posts/?sort=title&page[offset]=5&page[limit]=5').validate(
+            200)
+    assert [x['id'] for x in response.json_data['data']] == expected
+
+
+def test_200_with_included_to_many_is_eager_loaded(db, session, user,
+                                                   client):
+    from app import BlogPost, BlogTag
+    tags = [BlogTag(slug=fake.word() + str(x)) for x in range(3)]
+    for x in range(10):
+        session.add(BlogPost(
+            author=user, title=fake.sentence(), content=fake.paragraph(),
+            is_published=True, tags=tags))
+    session.commit()
+    # selectinload fetches related rows for up to 500 parents per query.
+    expected = 1 + (session.query(BlogPost).count() + 499) // 500
+
+    statements = []
+
+    def count_statements(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(db.engine, 'before_cursor_execute', count_statements)
+    try:
+        response = client.get(
+            '/api/blog-posts/?include=tags').validate(200)
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', count_statements)
+
+    included = {x['id'] for x in response.json_data['included']}
+    assert {str(tag.id) for tag in tags} <= included
+    assert len(statements) == expected
+
+
+def test_200_with_single_field_skips_other_columns(db, bunch_of_tags, client):
+    statements = []
+
+    def count_statements(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(db.engine, 'before_cursor_execute', count_statements)
+    try:
+        client.get('/api/blog-tags/?fields[blog-tags]=slug').validate(200)
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', count_statements)
+
+    assert len(statements) == 1
+    assert 'tags.slug' in statements[0]
+    assert 'tags.description' not in statements[0]
+
+
+def test_200_with_single_field_of_tested_model_in_one_statement(
+        db, bunch_of_posts, client):
+    statements = []
+
+    def count_statements(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(db.engine, 'before_cursor_execute', count_statements)
+    try:
+        client.get('/api/blog-posts/?fields[blog-posts]=title').validate(200)
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', count_statements)
+
+    assert len(statements) == 1
+
+
+def test_200_with_streamed_response(bunch_of_posts, client):
+    from app import api
+    url = '/api/blog-posts/?include=author&sort=title'
+    expected = client.get(url).validate(200).json_data
+    api.stream_collections = True
+    try:
+        response = client.get(url).validate(200)
+    finally:
+        api.stream_collections = False
+    assert 'Content-Length' not in response.headers
+    assert response.json_data == expected
+
+
+def test_200_with_streamed_response_through_wrapped_handler(
+        bunch_of_posts, client, monkeypatch):
+    streamed = []
+
+    @api.wrap_handler(['blog-comments'], [Method.GET], [Endpoint.COLLECTION])
+    def positional_only(next, *args):
+        response = next(*args)
+        streamed.append(isgenerator(response.data['data']))
+        return response
+
+    monkeypatch.setattr(api, 'stream_collections', True)
+    try:
+        response = client.get('/api/blog-comments').validate(200)
+    finally:
+        key = ('blog-comments', Method.GET, Endpoint.COLLECTION)
+        del api._handler_chains[key]
+        del api._handlers[key]
+    assert streamed == [True]
+    assert len(response.json_data['data']) == 30
+
+
+def test_wrapped_handlers_run_in_order(client):
+    calls = []
+
+    @api.wrap_handler(['users'], [Method.GET], [Endpoint.COLLECTION])
+    def outer(next, *args):
+        calls.append('outer')
+        return next(*args)
+
+    @api.wrap_handler(['users'], [Method.GET], [Endpoint.COLLECTION])
+    def inner(next, *args):
+        calls.append('inner')
+        return next(*args)
+
+    try:
+        client.get('/api/users').validate(200)
+    finally:
+        key = ('users', Method.GET, Endpoint.COLLECTION)
+        del api._handler_chains[key]
+        del api._handlers[key]
+    assert calls == ['outer', 'inner']
+
+
+def test_wrapped_handlers_get_no_serializer_options(client, monkeypatch):
+    calls = []
+
+    @api.wrap_handler(['users'], [Method.GET], [Endpoint.COLLECTION])
+    def positional_only(next, *args):
+        calls.append(len(args))
+        return next(*args)
+
+    monkeypatch.setattr(api, 'stream_collections', True)
+    monkeypatch.setattr(api, 'etags', True)
+    try:
+        client.get('/api/users',
+                   headers={'If-None-Match': '"stale"'}).validate(200)
+    finally:
+        key = ('users', Method.GET, Endpoint.COLLECTION)
+        del api._handler_chains[key]
+        del api._handlers[key]
+    assert calls == [3]
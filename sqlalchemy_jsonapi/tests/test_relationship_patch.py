@@ -1,6 +1,8 @@
 import json
 from uuid import uuid4
 
+from sqlalchemy import event
+
 from sqlalchemy_jsonapi.errors import (PermissionDeniedError,
                                        RelationshipNotFoundError,
                                        ResourceNotFoundError, ValidationError)
@@ -34,6 +36,31 @@ def test_200_on_to_many_set_to_resources(post, comment, client):
     assert len(response.json_data['data']) == 1
 
 
+def test_200_on_to_many_only_loads_changed_members(post, session, client):
+    from app import BlogTag
+    tags = [BlogTag(slug='tag-{}'.format(x)) for x in range(21)]
+    post.tags = tags[:20]
+    session.add_all(tags)
+    session.commit()
+    kept = [str(tag.id) for tag in tags[2:]]
+    payload = {'data': [{'type': 'blog-tags', 'id': x} for x in kept]}
+    loaded = []
+
+    def load(target, context):
+        loaded.append(target)
+
+    event.listen(BlogTag, 'load', load)
+    try:
+        response = client.patch(
+            '/api/blog-posts/{}/relationships/tags/'.format(post.id),
+            data=json.dumps(payload),
+            content_type='application/vnd.api+json').validate(200)
+    finally:
+        event.remove(BlogTag, 'load', load)
+    assert sorted(x['id'] for x in response.json_data['data']) == sorted(kept)
+    assert len(loaded) == 3
+
+
 def test_200_on_to_many_set_to_empty(post, client):
     payload = {'data': []}
     response = client.patch(
@@ -54,3 +54,19 @@ def test_404_on_relationship_not_found(post, client):
         data='{}',
         content_type='application/vnd.api+json').validate(
         404, RelationshipNotFoundError)
+
+
+def test_200_on_to_many_skips_existing_members(post, bunch_of_tags, client):
+    url = '/api/blog-posts/{}/relationships/tags/'.format(post.id)
+    first, second, third = [str(tag.id) for tag in bunch_of_tags]
+    client.post(url, data=json.dumps({'data': [
+        {'type': 'blog-tags', 'id': first},
+        {'type': 'blog-tags', 'id': second},
+        {'type': 'blog-tags', 'id': first}]}),
+        content_type='application/vnd.api+json').validate(200)
+    response = client.post(url, data=json.dumps({'data': [
+        {'type': 'blog-tags', 'id': second},
+        {'type': 'blog-tags', 'id': third}]}),
+        content_type='application/vnd.api+json').validate(200)
+    ids = [x['id'] for x in response.json_data['data']]
+    assert sorted(ids) == sorted([first, second, third])
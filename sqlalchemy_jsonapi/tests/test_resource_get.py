@@ -1,3 +1,7 @@
+import datetime
+
+from app import api
+from sqlalchemy_jsonapi import Endpoint, Method, ResponseCache
 from sqlalchemy_jsonapi.errors import (
     ResourceNotFoundError, PermissionDeniedError)
 from uuid import uuid4
@@ -70,3 +74,89 @@ def test_200_with_single_field_across_a_relationship(post, client):
         assert {'title', 'content'} == set(item['attributes'].keys())
         assert len(item['attributes']) == 0
         assert {'author'} == set(item['relationships'].keys())
+
+
+def test_304_when_body_hash_matches(post, client, monkeypatch):
+    monkeypatch.setattr(api, 'etags', True)
+    url = '/api/blog-posts/{}/'.format(post.id)
+    etag = client.get(url).validate(200).headers['ETag']
+    assert not etag.startswith('W/')
+    response = client.get(url, headers={'If-None-Match': etag})
+    assert response.status_code == 304
+    assert response.headers['ETag'] == etag
+    assert response.data == b''
+
+
+def test_etag_from_version_changes_with_resource(comment, client, session,
+                                                 monkeypatch):
+    monkeypatch.setattr(api, 'etags', True)
+    url = '/api/blog-comments/{}/'.format(comment.id)
+    etag = client.get(url).validate(200).headers['ETag']
+    assert etag.startswith('W/')
+    assert client.get(
+        url, headers={'If-None-Match': etag}).status_code == 304
+
+    comment.content = 'Edited'
+    comment.updated = comment.updated + datetime.timedelta(seconds=1)
+    session.commit()
+    response = client.get(url, headers={'If-None-Match': etag}).validate(200)
+    assert response.headers['ETag'] != etag
+
+
+def test_on_success_hook_alters_response(post, client):
+    @api.hook('on_success', [Method.GET], [Endpoint.RESOURCE])
+    def add_meta(sender, method, endpoint, data, req_args, response):
+        response.data['meta']['hooked'] = req_args['api_type']
+
+    try:
+        response = client.get(
+            '/api/blog-posts/{}/'.format(post.id)).validate(200)
+    finally:
+        hooks = api._view_hooks(Method.GET, Endpoint.RESOURCE)
+        hooks['on_success'].remove(add_meta)
+    assert response.json_data['meta']['hooked'] == 'blog-posts'
+
+
+def test_instrumented_request_reports_stats(post, client, monkeypatch,
+                                            caplog):
+    monkeypatch.setattr(api, 'instrument', True)
+    monkeypatch.setattr(api, 'slow_request_threshold', 0)
+    reported = []
+
+    def on_stats(sender, method, endpoint, req_args, stats):
+        reported.append(stats)
+
+    api.on_stats.connect(on_stats)
+    try:
+        response = client.get('/api/blog-posts/{}/?include=author'.format(
+            post.id)).validate(200)
+    finally:
+        api.on_stats.disconnect(on_stats)
+    stats, = reported
+    assert 'sql;dur=' in response.headers['Server-Timing']
+    assert 'total;dur=' in response.headers['Server-Timing']
+    assert stats.statements > 0
+    assert stats.included == 1
+    assert stats.bytes == len(response.data)
+    assert 'render' in stats.phases
+    assert caplog.records[-1].jsonapi['included'] == 1
+
+
+def test_304_from_cached_etag_skips_rendering(comment, client, monkeypatch):
+    monkeypatch.setattr(api, 'etags', True)
+    monkeypatch.setattr(api.serializer, 'cache_scope', lambda: 'everyone')
+    api.serializer.use_cache(ResponseCache())
+    try:
+        url = '/api/blog-comments/{}/'.format(comment.id)
+        etag = client.get(url).validate(200).headers['ETag']
+
+        def fetch_resource(*args, **kwargs):
+            raise AssertionError('The resource was fetched')
+
+        monkeypatch.setattr(api.serializer, '_fetch_resource', fetch_resource)
+        response = client.get(url, headers={'If-None-Match': etag})
+    finally:
+        api.serializer.use_cache(None)
+    assert response.status_code == 304
+    assert response.headers['ETag'] == etag
+    assert response.data == b''
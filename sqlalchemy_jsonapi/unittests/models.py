@@ -1,12 +1,13 @@
 """Model file for unit testing."""
 
-from sqlalchemy import Column, String, Integer, Text, ForeignKey
+from sqlalchemy import Boolean, Column, String, Integer, Text, ForeignKey
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import backref, relationship, validates
 
 from sqlalchemy_jsonapi import (
     Permissions, permission_test, ALL_PERMISSIONS,
-    JSONAPI, AttributeActions, attr_descriptor
+    JSONAPI, AttributeActions, attr_descriptor,
+    batch_permission_test, query_permission_test
 )
 
 
@@ -99,4 +100,27 @@ class Log(Base):
         return False
 
 
+class Note(Base):
+    """Note that is only visible once published and until flagged."""
+
+    __tablename__ = 'notes'
+    id = Column(Integer, primary_key=True)
+    content = Column(Text, nullable=False)
+    is_published = Column(Boolean, default=False)
+    is_flagged = Column(Boolean, default=False)
+    parent_id = Column(Integer, ForeignKey('notes.id'))
+
+    replies = relationship('Note')
+
+    @query_permission_test(Permissions.VIEW)
+    def view_published(cls):
+        """Unpublished notes are left in the database."""
+        return cls.is_published.is_(True)
+
+    @batch_permission_test(Permissions.VIEW)
+    def view_unflagged(cls, notes):
+        """Flagged notes are hidden a page at a time."""
+        return [not note.is_flagged for note in notes]
+
+
 serializer = JSONAPI(Base)
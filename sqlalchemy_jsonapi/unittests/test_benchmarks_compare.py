@@ -0,0 +1,65 @@
+"""Test for comparing benchmark results to a baseline."""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from sqlalchemy_jsonapi.benchmarks import DEFAULTS, compare, save_baseline
+from sqlalchemy_jsonapi.benchmarks.__main__ import main
+
+
+class CompareBaseline(unittest.TestCase):
+    """Tests for benchmarks.compare."""
+
+    baseline = {
+        'get_collection': {'ops_per_sec': 100.0, 'p50_ms': 10.0,
+                           'p99_ms': 20.0, 'statements': 3.0}
+    }
+
+    def test_within_tolerance(self):
+        """Small changes in timing aren't regressions."""
+        results = {
+            'get_collection': {'ops_per_sec': 90.0, 'p50_ms': 11.0,
+                               'p99_ms': 22.0, 'statements': 3.0}
+        }
+        self.assertEqual([], compare(results, self.baseline))
+
+    def test_slower_and_more_statements(self):
+        """Slower timings and extra statements are regressions."""
+        results = {
+            'get_collection': {'ops_per_sec': 50.0, 'p50_ms': 20.0,
+                               'p99_ms': 20.0, 'statements': 4.0}
+        }
+        self.assertEqual(
+            ['ops_per_sec', 'p50_ms', 'statements'],
+            [metric for name, metric, old, new
+             in compare(results, self.baseline)])
+
+    def test_new_scenarios_are_skipped(self):
+        """Scenarios missing from the baseline aren't compared."""
+        results = {
+            'get_resource': {'ops_per_sec': 1.0, 'p50_ms': 1.0,
+                             'p99_ms': 1.0, 'statements': 1.0}
+        }
+        self.assertEqual([], compare(results, self.baseline))
+
+
+class CompareSettings(unittest.TestCase):
+    """Tests for comparing against a baseline from the command line."""
+
+    def setUp(self):
+        """Save a baseline taken with more rows than the defaults."""
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'baseline.json')
+        save_baseline(self.path, DEFAULTS._replace(rows=DEFAULTS.rows * 2),
+                      {})
+
+    def tearDown(self):
+        """Remove the baseline."""
+        shutil.rmtree(self.directory)
+
+    def test_refuses_baseline_with_other_settings(self):
+        """A baseline taken with other settings fails without running."""
+        self.assertEqual(2, main(['--compare', self.path, '--only',
+                                  'get_collection']))
@@ -0,0 +1,165 @@
+"""Test for the response cache."""
+
+from sqlalchemy import event
+
+from sqlalchemy_jsonapi.cache import (LRUStore, MemoryStore, ResponseCache)
+
+from sqlalchemy_jsonapi.unittests.utils import testcases
+from sqlalchemy_jsonapi.unittests import models
+
+
+class CachedResponses(testcases.SqlalchemyJsonapiTestCase):
+    """Tests for serializer responses served from a ResponseCache."""
+
+    def setUp(self):
+        """Cache responses in a fresh store."""
+        super(CachedResponses, self).setUp()
+        models.serializer.cache_scope = lambda: 'everyone'
+        models.serializer.use_cache(ResponseCache(MemoryStore()))
+
+    def tearDown(self):
+        """Stop caching."""
+        models.serializer.use_cache(None)
+        del models.serializer.cache_scope
+        super(CachedResponses, self).tearDown()
+
+    def count_statements(self, fn, *args):
+        """Call fn and return its result with the number of statements."""
+        statements = []
+
+        def before_cursor_execute(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        event.listen(self.engine, 'before_cursor_execute',
+                     before_cursor_execute)
+        try:
+            return fn(*args), len(statements)
+        finally:
+            event.remove(self.engine, 'before_cursor_execute',
+                         before_cursor_execute)
+
+    def test_get_resource_served_from_cache(self):
+        """Get resource a second time doesn't query the database."""
+        user = models.User(
+            first='Sally', last='Smith',
+            password='password', username='SallySmith1')
+        self.session.add(user)
+        self.session.commit()
+
+        first = models.serializer.get_resource(
+            self.session, {}, 'users', user.id)
+        second, statements = self.count_statements(
+            models.serializer.get_resource, self.session, {}, 'users',
+            user.id)
+
+        self.assertEqual(0, statements)
+        self.assertEqual(first.data, second.data)
+
+    def test_cached_response_is_a_copy(self):
+        """Changing a cached response doesn't change the cache."""
+        user = models.User(
+            first='Sally', last='Smith',
+            password='password', username='SallySmith1')
+        self.session.add(user)
+        self.session.commit()
+
+        first = models.serializer.get_resource(
+            self.session, {}, 'users', user.id)
+        first.data['data']['attributes']['first'] = 'Changed'
+        second = models.serializer.get_resource(
+            self.session, {}, 'users', user.id)
+
+        self.assertEqual('Sally', second.data['data']['attributes']['first'])
+
+    def test_commit_invalidates_type(self):
+        """Committing a change to a model invalidates its responses."""
+        user = models.User(
+            first='Sally', last='Smith',
+            password='password', username='SallySmith1')
+        self.session.add(user)
+        self.session.commit()
+
+        models.serializer.get_collection(self.session, {}, 'users')
+        user.first = 'Sal'
+        self.session.commit()
+        response = models.serializer.get_collection(
+            self.session, {}, 'users')
+
+        self.assertEqual(
+            'Sal', response.data['data'][0]['attributes']['first'])
+
+    def test_commit_to_related_type_invalidates_relationship(self):
+        """Adding to the other side of a relationship invalidates it."""
+        user = models.User(
+            first='Sally', last='Smith',
+            password='password', username='SallySmith1')
+        self.session.add(user)
+        blog_post = models.Post(
+            title='This Is A Title', content='This is the content',
+            author=user)
+        self.session.add(blog_post)
+        self.session.commit()
+
+        before = models.serializer.get_relationship(
+            self.session, {}, 'posts', blog_post.id, 'comments')
+        self.session.add(models.Comment(
+            content='This is a comment', author=user, post=blog_post))
+        self.session.commit()
+        after = models.serializer.get_relationship(
+            self.session, {}, 'posts', blog_post.id, 'comments')
+
+        self.assertEqual([], before.data['data'])
+        self.assertEqual(1, len(after.data['data']))
+
+    def test_query_args_are_part_of_key(self):
+        """Get collection with other query args isn't served the same."""
+        for name in ['Sally', 'Bob']:
+            self.session.add(models.User(
+                first=name, last='Smith',
+                password='password', username=name + 'Smith1'))
+        self.session.commit()
+
+        everyone = models.serializer.get_collection(
+            self.session, {}, 'users')
+        sorted_users = models.serializer.get_collection(
+            self.session, {'sort': 'first'}, 'users')
+
+        self.assertEqual(['Sally', 'Bob'], [
+            x['attributes']['first'] for x in everyone.data['data']])
+        self.assertEqual(['Bob', 'Sally'], [
+            x['attributes']['first'] for x in sorted_users.data['data']])
+
+
+class CacheScopeRequired(testcases.SqlalchemyJsonapiTestCase):
+    """Tests for use_cache with models that have VIEW tests."""
+
+    def test_use_cache_without_scope_is_refused(self):
+        """Caching without cache_scope is refused if there are VIEW tests."""
+        with self.assertRaises(ValueError) as error:
+            models.serializer.use_cache(ResponseCache())
+
+        self.assertIn('users', str(error.exception))
+        self.assertIsNone(models.serializer.response_cache)
+
+
+class LRUStoreTest(testcases.SqlalchemyJsonapiTestCase):
+    """Tests for LRUStore."""
+
+    def test_least_recently_used_dropped(self):
+        """Storing past the size drops the least recently used value."""
+        store = LRUStore(size=2)
+        store.set('a', 1, 0)
+        store.set('b', 2, 0)
+        store.get_many(['a'])
+        store.set('c', 3, 0)
+
+        self.assertEqual([1, None, 3], store.get_many(['a', 'b', 'c']))
+
+    def test_counters_are_never_dropped(self):
+        """Counters survive values being dropped."""
+        store = LRUStore(size=1)
+        store.incr('counter')
+        store.set('a', 1, 0)
+        store.set('b', 2, 0)
+
+        self.assertEqual(2, store.incr('counter'))
@@ -0,0 +1,54 @@
+"""Test for the JSON encoding backends."""
+
+import datetime
+import unittest
+import uuid
+from decimal import Decimal
+from enum import Enum
+
+from sqlalchemy_jsonapi import encoding
+
+
+class Color(Enum):
+    RED = 'red'
+
+
+class JSONBackends(unittest.TestCase):
+    """Tests for JSONBackend and OrjsonBackend."""
+
+    document = {
+        'id': uuid.UUID('a8f3b9a2-5a4e-4b44-8f5c-07d9e4cc1b2f'),
+        'created': datetime.datetime(2016, 4, 2, 10, 30, 5, 12),
+        'day': datetime.date(2016, 4, 2),
+        'price': Decimal('10.50'),
+        'color': Color.RED,
+        'count': 3
+    }
+
+    expected = (b'{"id":"a8f3b9a2-5a4e-4b44-8f5c-07d9e4cc1b2f",'
+                b'"created":"2016-04-02T10:30:05.000012",'
+                b'"day":"2016-04-02","price":"10.50","color":"red",'
+                b'"count":3}')
+
+    def test_stdlib_backend_converts_by_type(self):
+        """JSONBackend converts values through the converter table."""
+        self.assertEqual(
+            self.expected, encoding.JSONBackend().dumps(self.document))
+
+    @unittest.skipIf(encoding.orjson is None, 'orjson is not installed')
+    def test_orjson_backend_matches_stdlib(self):
+        """OrjsonBackend encodes the same bytes as JSONBackend."""
+        self.assertEqual(
+            self.expected, encoding.OrjsonBackend().dumps(self.document))
+
+    def test_custom_converter(self):
+        """Converters can be replaced per backend."""
+        converters = dict(encoding.CONVERTERS)
+        converters[Decimal] = float
+        backend = encoding.JSONBackend(converters)
+        self.assertEqual(b'10.5', backend.dumps(Decimal('10.50')))
+
+    def test_unknown_type_raises(self):
+        """Values without a converter raise TypeError."""
+        with self.assertRaises(TypeError):
+            encoding.JSONBackend().dumps(object())
@@ -156,6 +156,32 @@ class DeleteRelationship(testcases.SqlalchemyJsonapiTestCase):
 
         self.assertEquals(error.exception.status_code, 404)
 
+    def test_delete_one_to_many_relationship_of_nonexistant_resources(self):
+        """Delete many nonexistant resources from a relationship returns 404.
+
+        A ResourcesNotFoundError lists each of them.
+        """
+        user = models.User(
+            first='Sally', last='Smith',
+            password='password', username='SallySmith1')
+        self.session.add(user)
+        blog_post = models.Post(
+            title='This Is A Title', content='This is the content',
+            author_id=user.id, author=user)
+        self.session.add(blog_post)
+        self.session.commit()
+        payload = {
+            'data': [{'type': 'comments', 'id': 5},
+                     {'type': 'comments', 'id': 6}]
+        }
+
+        with self.assertRaises(errors.ResourcesNotFoundError) as error:
+            models.serializer.delete_relationship(
+                self.session, payload, 'posts', blog_post.id, 'comments')
+
+        self.assertEqual(error.exception.status_code, 404)
+        self.assertEqual(len(error.exception.data['errors']), 2)
+
     def test_delete_one_to_many_relationship_with_unknown_relationship(self):
         """Delete a one-to-many relationship with unknown relationship returns 404.
 
@@ -1,5 +1,7 @@
 """Test for serializer's delete_resource."""
 
+from sqlalchemy import event
+
 from sqlalchemy_jsonapi import errors
 
 from sqlalchemy_jsonapi.unittests.utils import testcases
@@ -69,3 +71,63 @@ class DeleteResource(testcases.SqlalchemyJsonapiTestCase):
         comment = self.session.query(models.Comment).get(1)
         self.assertEqual(post, None)
         self.assertEqual(comment, None)
+
+    def test_delete_resource_checks_cascade_a_level_at_a_time(self):
+        """Delete a resource loads each level of the cascade in one query.
+
+        Levels without permission tests below them aren't loaded at all.
+        """
+        user = models.User(
+            first='Sally', last='Smith',
+            password='password', username='SallySmith1')
+        self.session.add(user)
+        for i in range(3):
+            blog_post = models.Post(
+                title='Title {}'.format(i), content='This is the content',
+                author=user)
+            self.session.add(blog_post)
+            for j in range(2):
+                self.session.add(models.Comment(
+                    content='Comment {}'.format(j), author=user,
+                    post=blog_post))
+        self.session.commit()
+
+        selects = []
+        selects_per_check = []
+
+        def before_cursor_execute(conn, cursor, statement, *args):
+            if statement.startswith('SELECT comments.'):
+                selects.append(statement)
+
+        def can_delete(comment):
+            selects_per_check.append(len(selects))
+            return True
+
+        models.Comment.__jsonapi_permissions__[None] = {
+            models.Permissions.DELETE: can_delete}
+        models.serializer._delete_plans.clear()
+        event.listen(self.engine, 'before_cursor_execute',
+                     before_cursor_execute)
+        try:
+            models.serializer.delete_resource(
+                self.session, {}, 'users', user.id)
+        finally:
+            event.remove(self.engine, 'before_cursor_execute',
+                         before_cursor_execute)
+            del models.Comment.__jsonapi_permissions__[None]
+            models.serializer._delete_plans.clear()
+
+        self.assertEqual([1] * 6, selects_per_check)
+        self.assertEqual(0, self.session.query(models.Comment).count())
+
+    def test_delete_resource_skips_cascade_without_permission_tests(self):
+        """Delete a resource doesn't load cascades that have no tests."""
+        user = models.User(
+            first='Sally', last='Smith',
+            password='password', username='SallySmith1')
+        self.session.add(user)
+        self.session.commit()
+
+        plan = models.serializer._delete_plan(models.User)
+
+        self.assertEqual((), plan.cascades)
@@ -1,6 +1,17 @@
 """Test for serializer's get_collection."""
 
+import json
+from base64 import urlsafe_b64encode
+
+try:
+    from urllib.parse import parse_qsl, urlparse
+except ImportError:
+    from urlparse import parse_qsl, urlparse
+
+from sqlalchemy import event
+
 from sqlalchemy_jsonapi import errors
+from sqlalchemy_jsonapi.serializer import RequestContext
 
 from sqlalchemy_jsonapi.unittests.utils import testcases
 from sqlalchemy_jsonapi.unittests import models
@@ -373,6 +384,8 @@ class GetCollection(testcases.SqlalchemyJsonapiTestCase):
 
     def test_get_collection_paginated_response_by_page(self):
         """Get collection with pagination by page returns 200."""
+        models.serializer.count_strategy = 'query'
+        self.addCleanup(delattr, models.serializer, 'count_strategy')
         user = models.User(
             first='Sally', last='Smith',
             password='password', username='SallySmith1')
@@ -435,8 +448,15 @@ class GetCollection(testcases.SqlalchemyJsonapiTestCase):
                 }
             }],
             'included': [],
+            'links': {
+                'first': '/comments?page%5Bnumber%5D=0&page%5Bsize%5D=2',
+                'last': '/comments?page%5Bnumber%5D=9&page%5Bsize%5D=2',
+                'prev': '/comments?page%5Bnumber%5D=0&page%5Bsize%5D=2',
+                'next': '/comments?page%5Bnumber%5D=2&page%5Bsize%5D=2'
+            },
             'meta': {
-                'sqlalchemy_jsonapi_version': __version__
+                'sqlalchemy_jsonapi_version': __version__,
+                'total': 20
             },
             'jsonapi': {
                 'version': '1.0'
@@ -446,6 +466,668 @@ class GetCollection(testcases.SqlalchemyJsonapiTestCase):
         self.assertEquals(expected, actual)
         self.assertEquals(200, response.status_code)
 
+    def test_get_collection_paginated_response_limits_query(self):
+        """Get collection with pagination only fetches the page rows."""
+        user = models.User(
+            first='Sally', last='Smith',
+            password='password', username='SallySmith1')
+        self.session.add(user)
+        blog_post = models.Post(
+            title='This Is A Title', content='This is the content',
+            author_id=user.id, author=user)
+        self.session.add(blog_post)
+        for x in range(20):
+            comment = models.Comment(
+                content='This is comment {0}'.format(x+1), author_id=user.id,
+                post_id=blog_post.id, author=user, post=blog_post)
+            self.session.add(comment)
+        self.session.commit()
+
+        statements = []
+
+        @event.listens_for(self.engine, 'before_cursor_execute')
+        def count_statements(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        response = models.serializer.get_collection(
+            self.session,
+            {'page[number]': u'2', 'page[size]': u'3'}, 'comments')
+
+        event.remove(self.engine, 'before_cursor_execute', count_statements)
+
+        self.assertEqual(
+            [7, 8, 9], [item['id'] for item in response.data['data']])
+        page_statements = [statement for statement in statements
+                           if statement.startswith('SELECT comments.')]
+        self.assertEqual(1, len(page_statements))
+        self.assertIn('LIMIT', page_statements[0])
+
+    def test_get_collection_paginated_response_by_cursor(self):
+        """Get collection with a cursor walks pages through links."""
+        user = models.User(
+            first='Sally', last='Smith',
+            password='password', username='SallySmith1')
+        self.session.add(user)
+        blog_post = models.Post(
+            title='This Is A Title', content='This is the content',
+            author_id=user.id, author=user)
+        self.session.add(blog_post)
+        for x in range(7):
+            comment = models.Comment(
+                content='This is comment {0}'.format(x+1), author_id=user.id,
+                post_id=blog_post.id, author=user, post=blog_post)
+            self.session.add(comment)
+        self.session.commit()
+
+        def page(args):
+            response = models.serializer.get_collection(
+                self.session, args, 'comments')
+            ids = [item['id'] for item in response.data['data']]
+            return ids, response.data['links']
+
+        def args_from(link):
+            return dict(parse_qsl(urlparse(link).query))
+
+        ids, links = page(
+            {'page[size]': u'3', 'page[after]': u'', 'sort': '-content'})
+        self.assertEqual([7, 6, 5], ids)
+        self.assertIsNone(links['prev'])
+
+        ids, links = page(args_from(links['next']))
+        self.assertEqual([4, 3, 2], ids)
+
+        ids, last_links = page(args_from(links['next']))
+        self.assertEqual([1], ids)
+        self.assertIsNone(last_links['next'])
+
+        ids, links = page(args_from(links['prev']))
+        self.assertEqual([7, 6, 5], ids)
+        self.assertIsNone(links['prev'])
+
+    def test_get_collection_paginated_by_cursor_runs_no_count(self):
+        """Get collection with a cursor doesn't count the collection."""
+        user = models.User(
+            first='Sally', last='Smith',
+            password='password', username='SallySmith1')
+        self.session.add(user)
+        for x in range(5):
+            self.session.add(models.Comment(
+                content='This is comment {0}'.format(x+1), author=user))
+        self.session.commit()
+
+        statements = []
+
+        def before_cursor_execute(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        models.serializer.count_strategy = 'query'
+        event.listen(self.engine, 'before_cursor_execute',
+                     before_cursor_execute)
+        try:
+            response = models.serializer.get_collection(
+                self.session, {'page[size]': u'2', 'page[after]': u''},
+                'comments')
+        finally:
+            event.remove(self.engine, 'before_cursor_execute',
+                         before_cursor_execute)
+            del models.serializer.count_strategy
+
+        self.assertEqual(2, len(response.data['data']))
+        self.assertNotIn('total', response.data['meta'])
+        self.assertFalse([x for x in statements if 'count(' in x.lower()])
+
+    def test_get_collection_paginated_counts_with_window_function(self):
+        """Get collection with the window count strategy uses one query."""
+        user = models.User(
+            first='Sally', last='Smith',
+            password='password', username='SallySmith1')
+        self.session.add(user)
+        for x in range(5):
+            self.session.add(models.Comment(
+                content='This is comment {0}'.format(x+1), author=user))
+        self.session.commit()
+
+        statements = []
+
+        def before_cursor_execute(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        models.serializer.count_strategy = 'window'
+        event.listen(self.engine, 'before_cursor_execute',
+                     before_cursor_execute)
+        try:
+            response = models.serializer.get_collection(
+                self.session, {'page[number]': u'1', 'page[size]': u'2'},
+                'comments')
+        finally:
+            event.remove(self.engine, 'before_cursor_execute',
+                         before_cursor_execute)
+            del models.serializer.count_strategy
+
+        self.assertEqual(
+            [3, 4], [item['id'] for item in response.data['data']])
+        self.assertEqual(5, response.data['meta']['total'])
+        self.assertIn('page%5Bnumber%5D=2', response.data['links']['last'])
+        self.assertEqual(1, len(statements))
+        self.assertIn('OVER ()', statements[0])
+
+    def test_get_collection_paginated_counts_with_estimator(self):
+        """Get collection with a callable count strategy uses its estimate."""
+        user = models.User(
+            first='Sally', last='Smith',
+            password='password', username='SallySmith1')
+        self.session.add(user)
+        for x in range(3):
+            self.session.add(models.Comment(
+                content='This is comment {0}'.format(x+1), author=user))
+        self.session.commit()
+
+        estimates = []
+
+        def estimate(model, query):
+            estimates.append(model)
+            return 1000
+
+        models.serializer.count_strategy = estimate
+        try:
+            response = models.serializer.get_collection(
+                self.session, {'page[offset]': u'0', 'page[limit]': u'2'},
+                'comments')
+        finally:
+            del models.serializer.count_strategy
+
+        self.assertEqual([models.Comment], estimates)
+        self.assertEqual(1000, response.data['meta']['total'])
+        self.assertIn('page%5Boffset%5D=998', response.data['links']['last'])
+
+    def test_get_collection_paginated_caches_count(self):
+        """Get collection reuses a COUNT within the cache TTL."""
+        user = models.User(
+            first='Sally', last='Smith',
+            password='password', username='SallySmith1')
+        self.session.add(user)
+        for x in range(3):
+            self.session.add(models.Comment(
+                content='This is comment {0}'.format(x+1), author=user))
+        self.session.commit()
+
+        args = {'page[number]': u'0', 'page[size]': u'2'}
+        models.serializer.count_strategy = 'query'
+        models.serializer.count_cache_ttl = 60
+        try:
+            first = models.serializer.get_collection(
+                self.session, args, 'comments')
+            self.session.add(models.Comment(content='Another', author=user))
+            self.session.commit()
+            second = models.serializer.get_collection(
+                self.session, args, 'comments')
+        finally:
+            del models.serializer.count_strategy
+            del models.serializer.count_cache_ttl
+            models.serializer._counts.clear()
+
+        self.assertEqual(3, first.data['meta']['total'])
+        self.assertEqual(3, second.data['meta']['total'])
+
+    def test_get_collection_paginated_without_total_for_view_tests(self):
+        """Get collection of a model with a VIEW test leaves the total out.
+
+        Whether another page follows comes from fetching one extra row.
+        """
+        for i in range(6):
+            self.session.add(models.Note(
+                content='Note {}'.format(i), is_published=True,
+                is_flagged=i == 1))
+        self.session.commit()
+
+        response = models.serializer.get_collection(
+            self.session, {'page[number]': u'1', 'page[size]': u'2'}, 'notes')
+
+        contents = [note['attributes']['content']
+                    for note in response.data['data']]
+        self.assertEqual(['Note 3', 'Note 4'], contents)
+        self.assertNotIn('total', response.data['meta'])
+        self.assertIsNone(response.data['links']['last'])
+        self.assertIn('page%5Bnumber%5D=2', response.data['links']['next'])
+
+    def test_get_collection_paginated_by_cursor_on_nullable_sort(self):
+        """Get collection with a cursor pages past NULL sort values."""
+        user = models.User(
+            first='Sally', last='Smith',
+            password='password', username='SallySmith1')
+        self.session.add(user)
+        blog_post = models.Post(
+            title='This Is A Title', content='This is the content',
+            author=user)
+        self.session.add(blog_post)
+        for x in range(7):
+            self.session.add(models.Comment(
+                content='This is comment {0}'.format(x+1), author=user,
+                post=blog_post if x % 2 else None))
+        self.session.commit()
+
+        def walk(args, rel):
+            ids = []
+            while True:
+                response = models.serializer.get_collection(
+                    self.session, args, 'comments')
+                ids += [item['id'] for item in response.data['data']]
+                if response.data['links'][rel] is None:
+                    return ids
+                args = dict(parse_qsl(urlparse(
+                    response.data['links'][rel]).query))
+
+        first = {'page[size]': u'3', 'page[after]': u''}
+        forwards = walk(dict(first, sort='post_id'), 'next')
+        self.assertEqual([2, 4, 6, 1, 3, 5, 7], forwards)
+        backwards = walk(dict(first, sort='-post_id'), 'next')
+        self.assertEqual([1, 3, 5, 7, 2, 4, 6], backwards)
+
+    def test_get_collection_given_only_page_size(self):
+        """Get collection given only a page size returns every resource.
+
+        A cursor page starts with page[after] or page[before], so a size
+        alone leaves the collection unpaginated.
+        """
+        user = models.User(
+            first='Sally', last='Smith',
+            password='password', username='SallySmith1')
+        self.session.add(user)
+        for x in range(5):
+            self.session.add(models.Comment(
+                content='This is comment {0}'.format(x+1), author=user))
+        self.session.commit()
+
+        response = models.serializer.get_collection(
+            self.session, {'page[size]': u'2'}, 'comments')
+
+        self.assertEqual(5, len(response.data['data']))
+        self.assertNotIn('links', response.data)
+
+    def test_get_collection_given_cursor_of_wrong_types(self):
+        """Get collection given cursor values of the wrong type returns 400."""
+        for values in ([True, 1], [[1], 1], [{'x': 1}, 1]):
+            token = urlsafe_b64encode(json.dumps(values).encode('utf-8'))
+            with self.assertRaises(errors.BadRequestError) as error:
+                models.serializer.get_collection(
+                    self.session,
+                    {'page[after]': token.decode('ascii'),
+                     'page[size]': u'2', 'sort': 'post_id'}, 'comments')
+            self.assertEqual(error.exception.detail, 'Invalid page cursor')
+
+    def test_get_collection_given_invalid_cursor_for_pagination(self):
+        """Get collection given a malformed cursor returns 400."""
+        with self.assertRaises(errors.BadRequestError) as error:
+            models.serializer.get_collection(
+                self.session,
+                {'page[after]': u'crap', 'page[size]': u'2'}, 'comments')
+
+        self.assertEqual(error.exception.detail, 'Invalid page cursor')
+
+    def test_get_collection_with_query_and_batch_permission_tests(self):
+        """Get collection of a model with query and batch tests returns 200.
+
+        Denied rows are filtered in the query and the batch test is called
+        once per page.
+        """
+        for i in range(6):
+            self.session.add(models.Note(
+                content='Note {}'.format(i), is_published=i % 3 != 0,
+                is_flagged=i == 4))
+        self.session.commit()
+
+        batches = []
+        batch_test = models.Note.__jsonapi_batch_permissions__[None][
+            models.Permissions.VIEW]
+
+        def counting_batch_test(cls, notes):
+            batches.append(len(notes))
+            return batch_test(cls, notes)
+
+        models.Note.__jsonapi_batch_permissions__[None][
+            models.Permissions.VIEW] = counting_batch_test
+        statements = []
+
+        def before_cursor_execute(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        event.listen(self.engine, 'before_cursor_execute',
+                     before_cursor_execute)
+        try:
+            response = models.serializer.get_collection(
+                self.session, {'page[number]': u'0', 'page[size]': u'2'},
+                'notes')
+        finally:
+            event.remove(self.engine, 'before_cursor_execute',
+                         before_cursor_execute)
+            models.Note.__jsonapi_batch_permissions__[None][
+                models.Permissions.VIEW] = batch_test
+
+        contents = [note['attributes']['content']
+                    for note in response.data['data']]
+        self.assertEqual(['Note 1', 'Note 2'], contents)
+        self.assertEqual([4], batches)
+        self.assertEqual(1, len(statements))
+        self.assertIn('is_published IS 1', statements[0])
+
+    def test_get_collection_including_resources_with_query_tests(self):
+        """Get collection including resources with a query test returns 200.
+
+        The included resources are tested together with a single query.
+        """
+        for i in range(3):
+            note = models.Note(content='Note {}'.format(i), is_published=True)
+            note.replies = [
+                models.Note(content='Reply {}'.format(i), is_published=True),
+                models.Note(content='Draft {}'.format(i))]
+            self.session.add(note)
+        self.session.commit()
+        self.session.expunge_all()
+        statements = []
+
+        def before_cursor_execute(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        event.listen(self.engine, 'before_cursor_execute',
+                     before_cursor_execute)
+        try:
+            response = models.serializer.get_collection(
+                self.session,
+                {'filter[parent_id]': u'null', 'include': 'replies'}, 'notes')
+        finally:
+            event.remove(self.engine, 'before_cursor_execute',
+                         before_cursor_execute)
+
+        self.assertEqual(
+            ['Reply 0', 'Reply 1', 'Reply 2'],
+            sorted(note['attributes']['content']
+                   for note in response.data['included']))
+        self.assertEqual(3, len(statements))
+
+    def test_get_collection_tests_permissions_once_per_request(self):
+        """Get collection calls each permission test once per instance.
+
+        The author of both comments is rendered twice but tested once.
+        """
+        user = models.User(
+            first='Sally', last='Smith',
+            password='password', username='SallySmith1')
+        self.session.add(user)
+        for i in range(2):
+            self.session.add(models.Comment(
+                content='Comment {}'.format(i), author=user))
+        self.session.commit()
+
+        calls = []
+        permissions = models.User.__jsonapi_permissions__['password']
+        view_password = permissions[models.Permissions.VIEW]
+
+        def counting_view_password(instance):
+            calls.append(instance)
+            return view_password(instance)
+
+        permissions[models.Permissions.VIEW] = counting_view_password
+        try:
+            response = models.serializer.get_collection(
+                self.session, {'include': 'author'}, 'comments')
+        finally:
+            permissions[models.Permissions.VIEW] = view_password
+
+        self.assertEqual(1, len(response.data['included']))
+        self.assertEqual(1, len(calls))
+
+    def test_get_collection_renders_each_included_resource_once(self):
+        """Get collection with a shared nested include returns 200.
+
+        Each included resource is listed and rendered only once.
+        """
+        user = models.User(
+            first='Sally', last='Smith',
+            password='password', username='SallySmith1')
+        self.session.add(user)
+        blog_post = models.Post(
+            title='This Is A Title', content='This is the content',
+            author=user)
+        self.session.add(blog_post)
+        for i in range(3):
+            self.session.add(models.Comment(
+                content='Comment {}'.format(i), author=user, post=blog_post))
+        self.session.commit()
+
+        rendered = []
+        render = models.serializer._render_full_resource
+
+        def counting_render(instance, *args):
+            rendered.append((instance.__jsonapi_type__, instance.id))
+            return render(instance, *args)
+
+        models.serializer._render_full_resource = counting_render
+        try:
+            response = models.serializer.get_collection(
+                self.session, {'include': 'post.author,author'}, 'comments')
+        finally:
+            del models.serializer._render_full_resource
+
+        included = [(resource['type'], resource['id'])
+                    for resource in response.data['included']]
+        self.assertEqual([('users', 1), ('posts', 1)], included)
+        self.assertEqual(3 + 2, len(rendered))
+
+    def test_get_collection_with_linkage_for_every_relationship(self):
+        """Get collection rendering all linkage returns 200.
+
+        To-many linkage takes one query per relationship for the page, unless
+        the related resources have a VIEW test.
+        """
+        for i in range(3):
+            user = models.User(
+                first='Sally', last='Smith',
+                password='password', username='SallySmith{}'.format(i))
+            self.session.add(user)
+            blog_post = models.Post(
+                title='This Is A Title', content='This is the content',
+                author=user)
+            self.session.add(blog_post)
+            self.session.add(models.Comment(
+                content='This is a comment', author=user, post=blog_post))
+        self.session.commit()
+        self.session.expunge_all()
+        statements = []
+
+        def before_cursor_execute(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        models.serializer.always_render_linkage = True
+        event.listen(self.engine, 'before_cursor_execute',
+                     before_cursor_execute)
+        try:
+            response = models.serializer.get_collection(
+                self.session, {'sort': 'id'}, 'users')
+        finally:
+            event.remove(self.engine, 'before_cursor_execute',
+                         before_cursor_execute)
+            models.serializer.always_render_linkage = False
+
+        relationships = response.data['data'][2]['relationships']
+        self.assertEqual([{'type': 'posts', 'id': 3}],
+                         relationships['posts']['data'])
+        self.assertEqual([{'type': 'comments', 'id': 3}],
+                         relationships['comments']['data'])
+        self.assertEqual([], relationships['logs']['data'])
+        self.assertEqual(1 + 2 + 3, len(statements))
+
+    def test_get_collection_with_linkage_of_included_resources(self):
+        """Get collection rendering all linkage with includes returns 200.
+
+        The linkage of included resources takes one query per relationship
+        for the whole level of includes, however many resources it has.
+        """
+        user = models.User(
+            first='Sally', last='Smith',
+            password='password', username='SallySmith1')
+        self.session.add(user)
+        self.session.commit()
+
+        def get_comments():
+            self.session.expunge_all()
+            statements = []
+
+            def before_cursor_execute(conn, cursor, statement, *args):
+                statements.append(statement)
+
+            event.listen(self.engine, 'before_cursor_execute',
+                         before_cursor_execute)
+            try:
+                response = models.serializer.get_collection(
+                    self.session, {'sort': 'id', 'include': 'post'},
+                    'comments')
+            finally:
+                event.remove(self.engine, 'before_cursor_execute',
+                             before_cursor_execute)
+            return response, len(statements)
+
+        models.serializer.always_render_linkage = True
+        self.addCleanup(delattr, models.serializer, 'always_render_linkage')
+        for i in range(3):
+            blog_post = models.Post(
+                title='This Is A Title', content='This is the content',
+                author_id=user.id)
+            self.session.add(blog_post)
+            self.session.add(models.Comment(
+                content='This is a comment', author_id=user.id,
+                post=blog_post))
+            self.session.commit()
+            response, statements = get_comments()
+            self.assertEqual(1 + 1, statements)
+
+        included = response.data['included']
+        self.assertEqual(
+            [[{'type': 'comments', 'id': x}] for x in (1, 2, 3)],
+            [post['relationships']['comments']['data'] for post in included])
+
+    def test_get_collection_given_filter_expression(self):
+        """Get collection given a filter expression returns 200.
+
+        Only matching resources are returned.
+        """
+        for first in ('Sally', 'Sam', 'Bob'):
+            user = models.User(
+                first=first, last='Smith',
+                password='password', username=first + 'Smith')
+            self.session.add(user)
+        self.session.commit()
+
+        response = models.serializer.get_collection(
+            self.session,
+            {'filter': 'first.lower() like "s%" && id > 1 || first == "Bob"'},
+            'users')
+
+        names = [user['attributes']['first'] for user in response.data['data']]
+        self.assertEqual(['Sam', 'Bob'], names)
+        self.assertEqual(200, response.status_code)
+
+    def test_get_collection_given_field_filter(self):
+        """Get collection given filter[field] returns 200.
+
+        A comma separated list of values matches any of them.
+        """
+        for first in ('Sally', 'Sam', 'Bob'):
+            user = models.User(
+                first=first, last='Smith',
+                password='password', username=first + 'Smith')
+            self.session.add(user)
+        self.session.commit()
+
+        response = models.serializer.get_collection(
+            self.session, {'filter[first]': 'Sally,Bob'}, 'users')
+
+        names = [user['attributes']['first'] for user in response.data['data']]
+        self.assertEqual(['Sally', 'Bob'], names)
+
+    def test_get_collection_given_invalid_filter(self):
+        """Get collection given a malformed filter returns 400."""
+        with self.assertRaises(errors.BadRequestError) as error:
+            models.serializer.get_collection(
+                self.session, {'filter': 'first == '}, 'users')
+
+        self.assertEqual(error.exception.detail, 'Unexpected end of filter')
+
+    def test_get_collection_given_deeply_nested_filter(self):
+        """Get collection given a filter nested too deeply returns 400."""
+        with self.assertRaises(errors.BadRequestError) as error:
+            models.serializer.get_collection(
+                self.session, {'filter': '(' * 300 + '1' + ')' * 300},
+                'users')
+
+        self.assertEqual(error.exception.detail,
+                         'Filter is nested too deeply')
+
+    def test_get_collection_given_list_outside_of_in(self):
+        """Get collection given a list not after in returns 400."""
+        for text in ['[1, 2] == 1', 'first == [1]', 'first in [[1]]',
+                     '[1].length() > 1', '[1] + 1']:
+            with self.assertRaises(errors.BadRequestError) as error:
+                models.serializer.get_collection(
+                    self.session, {'filter': text}, 'users')
+
+            self.assertEqual(error.exception.detail,
+                             'Lists are only allowed after in or not in')
+
+    def test_get_collection_given_filter_on_relationship(self):
+        """Get collection filtering on a relationship returns 409."""
+        with self.assertRaises(errors.NotFilterableError) as error:
+            models.serializer.get_collection(
+                self.session, {'filter': 'author == 1'}, 'posts')
+
+        expected = ('The requested field author on type posts is not a '
+                    'filterable field.')
+        self.assertEqual(expected, error.exception.detail)
+        self.assertEqual(409, error.exception.status_code)
+
+    def test_get_collection_given_filter_on_hidden_field(self):
+        """Get collection filtering on a field that can't be viewed is 403."""
+        with self.assertRaises(errors.PermissionDeniedError):
+            models.serializer.get_collection(
+                self.session, {'filter[password]': 'password'}, 'users')
+
+    def test_request_context_keys_persistent_instances_by_identity(self):
+        """Permission results of persistent instances don't keep them."""
+        user = models.User(
+            first='Sally', last='Smith',
+            password='password', username='SallySmith1')
+        context = RequestContext()
+        context.allowed(user, None, models.Permissions.VIEW)
+        self.session.add(user)
+        self.session.commit()
+        context.allowed(user, None, models.Permissions.VIEW)
+
+        kept = [value[0] for value in context.permissions.values()]
+        self.assertEqual(2, len(kept))
+        self.assertIn(user, kept)
+        self.assertIn(None, kept)
+
+    def test_get_collection_fieldsets_share_plans(self):
+        """Get collection with reordered or repeated fields reuses a plan."""
+        self.session.add(models.User(
+            first='Sally', last='Smith',
+            password='password', username='SallySmith1'))
+        self.session.commit()
+        models.serializer._plans.clear()
+        for value in ['first,last', 'last,first', 'first,first,last']:
+            models.serializer.get_collection(
+                self.session, {'fields[users]': value}, 'users')
+
+        self.assertEqual(1, len(models.serializer._plans))
+
+    def test_get_collection_given_unknown_field(self):
+        """Get collection with an unknown field in a fieldset returns 400."""
+        with self.assertRaises(errors.BadRequestError) as error:
+            models.serializer.get_collection(
+                self.session, {'fields[users]': 'first,nope'}, 'users')
+
+        self.assertEqual('Unknown fields nope for users',
+                         error.exception.detail)
+
     def test_get_collection_with_single_field(self):
         """Get collection with specific field returns 200.
 
@@ -758,6 +1440,8 @@ class GetCollection(testcases.SqlalchemyJsonapiTestCase):
 
     def test_get_collection_given_pagination_with_offset(self):
         """Get collection given pagination with offset 200."""
+        models.serializer.count_strategy = 'query'
+        self.addCleanup(delattr, models.serializer, 'count_strategy')
         user = models.User(
             first='Sally', last='Smith',
             password='password', username='SallySmith1')
@@ -782,7 +1466,14 @@ class GetCollection(testcases.SqlalchemyJsonapiTestCase):
                 'version': '1.0'
             },
             'meta': {
-                'sqlalchemy_jsonapi_version': __version__
+                'sqlalchemy_jsonapi_version': __version__,
+                'total': 10
+            },
+            'links': {
+                'first': '/comments?page%5Blimit%5D=2&page%5Boffset%5D=0',
+                'last': '/comments?page%5Blimit%5D=2&page%5Boffset%5D=8',
+                'prev': '/comments?page%5Blimit%5D=2&page%5Boffset%5D=3',
+                'next': '/comments?page%5Blimit%5D=2&page%5Boffset%5D=7'
             },
             'included': [],
             'data': [{
@@ -891,6 +1582,8 @@ class GetCollection(testcases.SqlalchemyJsonapiTestCase):
 
     def test_get_collection_when_pagnation_is_out_of_range(self):
         """Get collection when pagination is out of range returns 200."""
+        models.serializer.count_strategy = 'query'
+        self.addCleanup(delattr, models.serializer, 'count_strategy')
         user = models.User(
             first='Sally', last='Smith',
             password='password', username='SallySmith1')
@@ -913,8 +1606,15 @@ class GetCollection(testcases.SqlalchemyJsonapiTestCase):
         expected = {
             'data': [],
             'included': [],
+            'links': {
+                'first': '/comments?page%5Blimit%5D=2&page%5Boffset%5D=0',
+                'last': '/comments?page%5Blimit%5D=2&page%5Boffset%5D=8',
+                'prev': '/comments?page%5Blimit%5D=2&page%5Boffset%5D=8',
+                'next': None
+            },
             'meta': {
-                'sqlalchemy_jsonapi_version': __version__
+                'sqlalchemy_jsonapi_version': __version__,
+                'total': 10
             },
             'jsonapi': {
                 'version': '1.0'
@@ -1,5 +1,7 @@
 """Test for serializer's get_related."""
 
+from sqlalchemy import event
+
 from sqlalchemy_jsonapi import errors
 
 from sqlalchemy_jsonapi.unittests.utils import testcases
@@ -37,7 +39,6 @@ class GetRelated(testcases.SqlalchemyJsonapiTestCase):
             'data': {
                 'id': 1,
                 'type': 'users',
-                'included': {},
                 'relationships': {
                     'comments': {
                         'links': {
@@ -75,6 +76,37 @@ class GetRelated(testcases.SqlalchemyJsonapiTestCase):
         self.assertEqual(expected, actual)
         self.assertEqual(200, response.status_code)
 
+    def test_get_related_of_to_many_with_single_field(self):
+        """Get many related resources with a field only loads that field."""
+        user = models.User(
+            first='Sally', last='Smith',
+            password='password', username='SallySmith1')
+        self.session.add(user)
+        blog_post = models.Post(
+            title='This Is A Title', content='This is the content',
+            author_id=user.id, author=user)
+        self.session.add(blog_post)
+        self.session.commit()
+        user_id = user.id
+        self.session.expunge_all()
+
+        statements = []
+
+        @event.listens_for(self.engine, 'before_cursor_execute')
+        def count_statements(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        response = models.serializer.get_related(
+            self.session, {'fields[posts]': 'title'}, 'users', user_id,
+            'posts')
+
+        event.remove(self.engine, 'before_cursor_execute', count_statements)
+
+        self.assertEqual(
+            [{'title': 'This Is A Title'}],
+            [item['attributes'] for item in response.data['data']])
+        self.assertNotIn('posts.content', statements[-1])
+
     def test_get_related_of_to_many(self):
         """Get many related resource returns a 200."""
         user = models.User(
@@ -99,7 +131,6 @@ class GetRelated(testcases.SqlalchemyJsonapiTestCase):
             'data': [{
                 'id': 1,
                 'type': 'comments',
-                'included': {},
                 'relationships': {
                     'post': {
                         'links': {
@@ -120,7 +151,6 @@ class GetRelated(testcases.SqlalchemyJsonapiTestCase):
             }, {
                 'id': 2,
                 'type': 'comments',
-                'included': {},
                 'relationships': {
                     'post': {
                         'links': {
@@ -1,5 +1,7 @@
 """Test for serializer's get_relationship."""
 
+from sqlalchemy import event
+
 from sqlalchemy_jsonapi import errors
 
 from sqlalchemy_jsonapi.unittests.utils import testcases
@@ -50,6 +52,41 @@ class GetRelationship(testcases.SqlalchemyJsonapiTestCase):
         self.assertEqual(expected, actual)
         self.assertEqual(200, response.status_code)
 
+    def test_get_relationship_on_to_many_queries_only_its_ids(self):
+        """Get a relationship to many resources returns 200.
+
+        Only the ids of the requested relationship are queried.
+        """
+        user = models.User(
+            first='Sally', last='Smith',
+            password='password', username='SallySmith1')
+        self.session.add(user)
+        blog_post = models.Post(
+            title='This Is A Title', content='This is the content',
+            author=user)
+        self.session.add(blog_post)
+        self.session.add(models.Comment(
+            content='This is a comment', author=user, post=blog_post))
+        self.session.commit()
+        self.session.expunge_all()
+        statements = []
+
+        def before_cursor_execute(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        event.listen(self.engine, 'before_cursor_execute',
+                     before_cursor_execute)
+        try:
+            response = models.serializer.get_relationship(
+                self.session, {}, 'users', user.id, 'posts')
+        finally:
+            event.remove(self.engine, 'before_cursor_execute',
+                         before_cursor_execute)
+
+        self.assertEqual([{'type': 'posts', 'id': 1}], response.data['data'])
+        self.assertEqual(2, len(statements))
+        self.assertNotIn('comments', statements[1])
+
     def test_get_relationship_on_to_one(self):
         """Get a relationship of on to one returns 200."""
         user = models.User(
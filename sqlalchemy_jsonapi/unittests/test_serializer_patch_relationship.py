@@ -1,5 +1,7 @@
 """Test for serializer's patch_relationship."""
 
+from sqlalchemy import event
+
 from sqlalchemy_jsonapi import errors
 
 from sqlalchemy_jsonapi.unittests.utils import testcases
@@ -207,6 +209,85 @@ class GPatchRelationship(testcases.SqlalchemyJsonapiTestCase):
         self.assertEqual(new_comment.post.id, blog_post.id)
         self.assertEqual(new_comment.post, blog_post)
 
+    def test_patch_relationship_on_to_many_fetches_resources_at_once(self):
+        """Patch relationships on many loads the new resources in one query."""
+        user = models.User(
+            first='Sally', last='Smith',
+            password='password', username='SallySmith1')
+        self.session.add(user)
+        blog_post = models.Post(
+            title='This Is A Title', content='This is the content',
+            author_id=user.id, author=user)
+        self.session.add(blog_post)
+        comments = [models.Comment(
+            content='This is comment {}'.format(i), author=user)
+            for i in range(5)]
+        self.session.add_all(comments)
+        self.session.commit()
+        payload = {
+            'data': [{'type': 'comments', 'id': str(comment.id)}
+                     for comment in comments]
+        }
+        lookups = []
+
+        def before_cursor_execute(conn, cursor, statement, *args):
+            if 'comments.id IN' in statement:
+                lookups.append(statement)
+
+        event.listen(self.engine, 'before_cursor_execute',
+                     before_cursor_execute)
+        try:
+            models.serializer.patch_relationship(
+                self.session, payload, 'posts', blog_post.id, 'comments')
+        finally:
+            event.remove(self.engine, 'before_cursor_execute',
+                         before_cursor_execute)
+
+        self.assertEqual(1, len(lookups))
+        self.assertEqual(5, blog_post.comments.count())
+
+    def test_patch_relationship_on_to_many_only_touches_changes(self):
+        """Patch relationships on many only updates added and removed ones."""
+        user = models.User(
+            first='Sally', last='Smith',
+            password='password', username='SallySmith1')
+        self.session.add(user)
+        blog_post = models.Post(
+            title='This Is A Title', content='This is the content',
+            author_id=user.id, author=user)
+        self.session.add(blog_post)
+        kept, removed, added = [models.Comment(
+            content='This is comment {}'.format(i), author=user)
+            for i in range(3)]
+        kept.post = removed.post = blog_post
+        self.session.add_all([kept, removed, added])
+        self.session.commit()
+        payload = {
+            'data': [{'type': 'comments', 'id': kept.id},
+                     {'type': 'comments', 'id': added.id}]
+        }
+        updated = []
+
+        def before_cursor_execute(conn, cursor, statement, parameters,
+                                  context, executemany):
+            if statement.startswith('UPDATE comments'):
+                updated.extend(parameters if executemany else [parameters])
+
+        event.listen(self.engine, 'before_cursor_execute',
+                     before_cursor_execute)
+        try:
+            models.serializer.patch_relationship(
+                self.session, payload, 'posts', blog_post.id, 'comments')
+        finally:
+            event.remove(self.engine, 'before_cursor_execute',
+                         before_cursor_execute)
+
+        self.assertEqual(2, len(updated))
+        self.assertEqual(
+            sorted([kept.id, added.id]),
+            sorted([comment.id for comment in blog_post.comments]))
+        self.assertIsNone(removed.post)
+
     def test_patch_relationship_on_to_many_set_to_empty_response(self):
         """Patch relationships on many and set to empty returns 200."""
         user = models.User(
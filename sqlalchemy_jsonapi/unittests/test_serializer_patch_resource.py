@@ -1,5 +1,7 @@
 """Test for serializer's patch_resource."""
 
+from sqlalchemy import event
+
 from sqlalchemy_jsonapi import errors
 
 from sqlalchemy_jsonapi.unittests.utils import testcases
@@ -44,6 +46,88 @@ class PatchResource(testcases.SqlalchemyJsonapiTestCase):
         self.assertEqual(blog_post.author.id, user.id)
         self.assertEqual(blog_post.author, user)
 
+    def test_patch_resource_reloads_once_after_commit(self):
+        """Patch resource reloads the expired instance with one SELECT."""
+        user = models.User(
+            first='Sally', last='Smith',
+            password='password', username='SallySmith1')
+        self.session.add(user)
+        self.session.commit()
+        payload = {
+            'data': {
+                'type': 'users',
+                'id': user.id,
+                'attributes': {
+                    'last': 'Jones'
+                }
+            }
+        }
+        statements = []
+
+        def before_cursor_execute(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        event.listen(self.engine, 'before_cursor_execute',
+                     before_cursor_execute)
+        try:
+            response = models.serializer.patch_resource(
+                self.session, payload, 'users', user.id)
+        finally:
+            event.remove(self.engine, 'before_cursor_execute',
+                         before_cursor_execute)
+
+        after_update = statements[[x.startswith('UPDATE')
+                                   for x in statements].index(True) + 1:]
+        self.assertEqual('Jones', response.data['data']['attributes']['last'])
+        self.assertEqual(1, len(after_update))
+        self.assertTrue(after_update[0].startswith('SELECT'))
+
+    def test_patch_resource_commits_once(self):
+        """Patch resource applies relationships and attributes together."""
+        user = models.User(
+            first='Sally', last='Smith',
+            password='password', username='SallySmith1')
+        self.session.add(user)
+        blog_post = models.Post(
+            title='This Is A Title', content='This is the content')
+        self.session.add(blog_post)
+        comment = models.Comment(content='This is a comment', author=user)
+        self.session.add(comment)
+        self.session.commit()
+        payload = {
+            'data': {
+                'type': 'posts',
+                'id': blog_post.id,
+                'attributes': {
+                    'title': 'This is a new title'
+                },
+                'relationships': {
+                    'author': {
+                        'data': {'type': 'users', 'id': user.id}
+                    },
+                    'comments': {
+                        'data': [{'type': 'comments', 'id': comment.id}]
+                    }
+                }
+            }
+        }
+        commits = []
+
+        def after_commit(session):
+            commits.append(session)
+
+        event.listen(self.session, 'after_commit', after_commit)
+        try:
+            models.serializer.patch_resource(
+                self.session, payload, 'posts', blog_post.id)
+        finally:
+            event.remove(self.session, 'after_commit', after_commit)
+
+        self.assertEqual(1, len(commits))
+        self.assertEqual(user, blog_post.author)
+        self.assertEqual([comment], blog_post.comments.all())
+        self.assertEqual('This is a new title', blog_post.title)
+
     @testcases.fragile
     def test_patch_resource_response(self):
         """Patch resource response returns resource and 200."""
@@ -1,5 +1,7 @@
 """Test for serializer's post_collection."""
 
+from sqlalchemy import event
+
 from sqlalchemy_jsonapi import errors
 
 from sqlalchemy_jsonapi.unittests.utils import testcases
@@ -33,6 +35,42 @@ class PostCollection(testcases.SqlalchemyJsonapiTestCase):
         self.assertEqual(user.username, 'SallySmith1')
         self.assertEqual(user.password, 'password')
 
+    def test_add_resource_renders_without_fetching_again(self):
+        """Create resource renders the written instance without a SELECT."""
+        payload = {
+            'data': {
+                'type': 'users',
+                'attributes': {
+                    'first': 'Sally',
+                    'last': 'Smith',
+                    'username': 'SallySmith1',
+                    'password': 'password'
+                }
+            }
+        }
+        statements = []
+
+        def before_cursor_execute(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        models.serializer.expire_on_commit = False
+        event.listen(self.engine, 'before_cursor_execute',
+                     before_cursor_execute)
+        try:
+            response = models.serializer.post_collection(
+                self.session, payload, 'users')
+        finally:
+            event.remove(self.engine, 'before_cursor_execute',
+                         before_cursor_execute)
+            del models.serializer.expire_on_commit
+
+        self.assertEqual(201, response.status_code)
+        self.assertEqual(
+            'Sally', response.data['data']['attributes']['first'])
+        self.assertEqual(
+            [], [x for x in statements if x.startswith('SELECT')])
+        self.assertTrue(self.session.expire_on_commit)
+
     @testcases.fragile
     def test_add_resource_response(self):
         """Create resource returns data response and 201.
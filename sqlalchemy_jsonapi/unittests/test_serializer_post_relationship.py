@@ -1,5 +1,7 @@
 """Test for serializer's post_relationship."""
 
+from sqlalchemy import event
+
 from sqlalchemy_jsonapi import errors
 
 from sqlalchemy_jsonapi.unittests.utils import testcases
@@ -98,6 +100,115 @@ class PostRelationship(testcases.SqlalchemyJsonapiTestCase):
         self.assertEqual(expected, actual)
         self.assertEqual(200, response.status_code)
 
+    def test_post_relationship_on_to_many_skips_existing_members(self):
+        """Post relationship appends each new resource once."""
+        user = models.User(
+            first='Sally', last='Smith',
+            password='password', username='SallySmith1')
+        self.session.add(user)
+        blog_post = models.Post(
+            title='This Is A Title', content='This is the content',
+            author_id=user.id, author=user)
+        self.session.add(blog_post)
+        comment_one = models.Comment(
+            content='This is the first comment',
+            author_id=user.id, author=user, post=blog_post)
+        self.session.add(comment_one)
+        comment_two = models.Comment(
+            content='This is the second comment',
+            author_id=user.id, author=user)
+        self.session.add(comment_two)
+        self.session.commit()
+        payload = {
+            'data': [{
+                'type': 'comments',
+                'id': comment_one.id
+            }, {
+                'type': 'comments',
+                'id': comment_two.id
+            }, {
+                'type': 'comments',
+                'id': comment_two.id
+            }]
+        }
+
+        response = models.serializer.post_relationship(
+            self.session, payload, 'posts', blog_post.id, 'comments')
+
+        ids = sorted([item['id'] for item in response.data['data']])
+        self.assertEqual([comment_one.id, comment_two.id], ids)
+
+    def test_post_relationship_on_to_many_loads_only_new_members(self):
+        """Post relationship sets the foreign keys of the new members.
+
+        The members already in the relationship are never loaded.
+        """
+        user = models.User(
+            first='Sally', last='Smith',
+            password='password', username='SallySmith1')
+        self.session.add(user)
+        blog_post = models.Post(
+            title='This Is A Title', content='This is the content',
+            author_id=user.id, author=user)
+        self.session.add(blog_post)
+        for i in range(20):
+            self.session.add(models.Comment(
+                content='This is comment {}'.format(i), author=user,
+                post=blog_post))
+        comment = models.Comment(
+            content='This is a new comment', author=user)
+        self.session.add(comment)
+        self.session.commit()
+        post_id, comment_id = blog_post.id, comment.id
+        self.session.expunge_all()
+        loaded = []
+
+        def load(target, context):
+            loaded.append(target)
+
+        event.listen(models.Comment, 'load', load)
+        try:
+            models.serializer.post_relationship(
+                self.session,
+                {'data': [{'type': 'comments', 'id': comment_id}]},
+                'posts', post_id, 'comments')
+        finally:
+            event.remove(models.Comment, 'load', load)
+
+        self.assertEqual([comment_id], [x.id for x in loaded])
+        self.assertEqual(post_id, loaded[0].post_id)
+        self.assertEqual(21, self.session.query(models.Comment)
+                         .filter_by(post_id=post_id).count())
+
+    def test_post_relationship_on_to_many_through_collection(self):
+        """Post relationship without bulk writes uses the collection."""
+        user = models.User(
+            first='Sally', last='Smith',
+            password='password', username='SallySmith1')
+        self.session.add(user)
+        blog_post = models.Post(
+            title='This Is A Title', content='This is the content',
+            author_id=user.id, author=user)
+        self.session.add(blog_post)
+        comments = [models.Comment(
+            content='This is comment {}'.format(i), author=user)
+            for i in range(3)]
+        self.session.add_all(comments)
+        self.session.commit()
+        payload = {
+            'data': [{'type': 'comments', 'id': comment.id}
+                     for comment in comments]
+        }
+
+        models.serializer.bulk_relationship_writes = False
+        self.addCleanup(delattr, models.serializer, 'bulk_relationship_writes')
+        models.serializer.post_relationship(
+            self.session, payload, 'posts', blog_post.id, 'comments')
+
+        for comment in comments:
+            self.assertEqual(comment.post, blog_post)
+        self.assertEqual(3, blog_post.comments.count())
+
     def test_post_relationship_with_hash_instead_of_array(self):
         """Post relalationship with a hash instead of an array returns 409.
 